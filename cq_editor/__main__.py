@@ -1,6 +1,7 @@
 # __main__.py负责程序主逻辑
 import sys
 import argparse
+import multiprocessing
 import os
 
 # 设置环境变量来关闭VTK和OCCT的调试输出
@@ -22,25 +23,63 @@ os.environ["PYTHONASYNCIODEBUG"] = "0"
 # 设置日志级别为ERROR，只显示错误信息
 os.environ["LOG_LEVEL"] = "ERROR"
 
-from PySide6.QtWidgets import QApplication
+from .profiling import PROFILER, STARTUP
 
 NAME = "CQ-editor"
-# 必须先创建一个 QApplication 实例，才能使用窗口控件
-app = QApplication(sys.argv, applicationName=NAME)
-app.setStyle("Fusion")
-from .main_window import MainWindow
+STARTUP_PROFILE = "--startup-profile" in sys.argv
+
+# worker processes are spawned and re-import the main module as __mp_main__,
+# they must not create a GUI
+if __name__ != "__mp_main__":
+    if STARTUP_PROFILE:
+        STARTUP.track_imports()
+
+    with STARTUP.stage("import PySide6"):
+        from PySide6.QtCore import QTimer
+        from PySide6.QtWidgets import QApplication
+
+    # 必须先创建一个 QApplication 实例，才能使用窗口控件
+    with STARTUP.stage("QApplication"):
+        app = QApplication(sys.argv, applicationName=NAME)
+        app.setStyle("Fusion")
+
+    with STARTUP.stage("import main_window"):
+        from .main_window import MainWindow
+
+
+def finish_startup(report=False):
+
+    STARTUP.finish()
+
+    # shown in the profiler pane
+    for listener in PROFILER.listeners:
+        listener(STARTUP.run)
+
+    if report:
+        print(STARTUP.report(), flush=True)
 
 
 def main():
+    multiprocessing.freeze_support()
     # 创建一个命令行参数解析器。说明这个程序可以从命令行运行并接收文件名作为参数。
     parser = argparse.ArgumentParser(description=NAME)
     parser.add_argument("filename", nargs="?", default=None)
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="print the time spent in imports and components at start-up",
+    )
     # 实际解析命令行参数。app.arguments() 是 PyQt 提供的方式，用来获取启动参数。
     args = parser.parse_args(app.arguments()[1:])
     # 创建主窗口实例，通常是整个 GUI 的核心类，负责布局和用户交互。
-    win = MainWindow(filename=args.filename if args.filename else None)
+    with STARTUP.stage("MainWindow"):
+        win = MainWindow(filename=args.filename if args.filename else None)
     # 显示窗口（PyQt 中必须调用 .show() 才会把窗口绘制出来）。
-    win.show()
+    with STARTUP.stage("show"):
+        win.show()
+
+    # the report is printed once the first events are processed
+    QTimer.singleShot(0, lambda: finish_startup(args.startup_profile))
     # 运行应用主循环。app.exec() 启动事件循环（GUI必须的），sys.exit 用于安全退出
     sys.exit(app.exec())
 
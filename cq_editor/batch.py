@@ -0,0 +1,214 @@
+"""Headless rendering and export of CQ scripts, e.g. for CI pipelines.
+
+    CQ-editor batch "models/**/*.py" -o out -f step stl -j 8
+
+Every script is executed with the same semantics as a render in the editor
+(show_object, debug, fallback to all CQ objects) and every shown object is
+exported. Scripts run in parallel in a pool of worker processes and a JSON
+manifest with per-script timings is written next to the exported files.
+"""
+
+import argparse
+import json
+import os
+import sys
+from glob import glob
+from pathlib import Path
+from time import perf_counter, sleep
+from traceback import format_exc
+
+FORMATS = ("step", "stl", "brep")
+POLL_INTERVAL = 0.01  # s
+
+
+def expand_scripts(patterns):
+
+    rv = []
+
+    for pattern in patterns:
+        matches = sorted(glob(pattern, recursive=True)) or [pattern]
+        rv.extend(m for m in matches if m not in rv)
+
+    return rv
+
+
+def script_base(scripts):
+    """Common directory of the scripts, mirrored under the output directory."""
+
+    if not scripts:
+        return ""
+
+    try:
+        return os.path.commonpath(
+            [os.path.dirname(os.path.abspath(s)) for s in scripts]
+        )
+    except ValueError:
+        # on different drives on Windows
+        return ""
+
+
+def output_dir(script, out_dir, base):
+
+    if not base:
+        return out_dir
+
+    rel = os.path.relpath(os.path.dirname(os.path.abspath(script)), base)
+
+    return os.path.normpath(os.path.join(out_dir, rel))
+
+
+def export_script(script, out_dir, formats, tolerance=1e-1, base=""):
+    """Run a single script and export its objects; executed in a worker.
+
+    Files are written to the directory of the script relative to base, mirrored
+    under out_dir, so that scripts sharing a name do not overwrite each other.
+    """
+
+    import cadquery as cq
+    from .cq_utils import export, is_obj_empty
+    from .execution import run_script
+    from .utils import safe_name
+
+    rv = dict(script=script, status="ok", error=None, objects=[])
+    t0 = perf_counter()
+
+    try:
+        with open(script, encoding="utf-8") as f:
+            cq_script = f.read()
+
+        cq_objects, _ = run_script(cq_script, os.path.abspath(script))
+        t1 = perf_counter()
+
+        stem = Path(script).stem
+        directory = output_dir(script, out_dir, base)
+        os.makedirs(directory, exist_ok=True)
+
+        for name, obj in cq_objects.items():
+            shape = obj.shape
+
+            if is_obj_empty(shape):
+                continue
+            if isinstance(shape, cq.Assembly):
+                shape = shape.toCompound()
+
+            files = []
+            for fmt in formats:
+                fname = os.path.join(directory, f"{stem}-{safe_name(name)}.{fmt}")
+                export(shape, fmt, fname, tolerance)
+                files.append(fname)
+
+            rv["objects"].append(dict(name=str(name), files=files))
+
+        t2 = perf_counter()
+        rv["timings"] = dict(execute=t1 - t0, export=t2 - t1, total=t2 - t0)
+
+    except Exception:
+        rv["status"] = "error"
+        rv["error"] = format_exc()
+        rv["timings"] = dict(total=perf_counter() - t0)
+
+    return rv
+
+
+def run_batch(scripts, out_dir, formats=FORMATS, tolerance=1e-1, jobs=None):
+
+    from .workers import WorkerPool, JobQueue
+
+    os.makedirs(out_dir, exist_ok=True)
+
+    base = script_base(scripts)
+    results = [None] * len(scripts)
+
+    # a worker crashing in OCCT only fails its own script, the pool replaces it
+    pool = WorkerPool(jobs or os.cpu_count() or 1)
+    queue = JobQueue(
+        pool,
+        [
+            (i, export_script, (s, out_dir, formats, tolerance, base))
+            for i, s in enumerate(scripts)
+        ],
+    )
+
+    try:
+        while not queue.done():
+            for i, ok, res in queue.poll():
+                if not ok:
+                    res = dict(
+                        script=scripts[i],
+                        status="error",
+                        error=f"{res.type_name}: {res}",
+                        objects=[],
+                        timings=dict(total=0.0),
+                    )
+                # in script order, independent of the completion order
+                results[i] = res
+
+                t = res["timings"]["total"]
+                print(f"[{res['status']}] {res['script']} ({t:.2f} s)", flush=True)
+
+            sleep(POLL_INTERVAL)
+    finally:
+        pool.shutdown()
+
+    return results
+
+
+def find_collisions(results):
+    """Files written by more than one object, with the scripts writing them."""
+
+    writers = {}
+    for res in results:
+        for obj in res["objects"]:
+            for fname in obj["files"]:
+                writers.setdefault(fname, []).append(res["script"])
+
+    return {fname: s for fname, s in writers.items() if len(s) > 1}
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+        prog="CQ-editor batch", description="Render and export CQ scripts headless"
+    )
+    parser.add_argument("scripts", nargs="+", help="scripts or glob patterns")
+    parser.add_argument("-o", "--output", default="out", help="output directory")
+    parser.add_argument(
+        "-f", "--format", nargs="+", choices=FORMATS, default=["step"], dest="formats"
+    )
+    parser.add_argument("-t", "--tolerance", type=float, default=1e-1)
+    parser.add_argument("-j", "--jobs", type=int, default=None)
+    parser.add_argument(
+        "-m", "--manifest", default=None, help="defaults to OUTPUT/manifest.json"
+    )
+
+    args = parser.parse_args(argv)
+
+    scripts = expand_scripts(args.scripts)
+    t0 = perf_counter()
+
+    results = run_batch(scripts, args.output, args.formats, args.tolerance, args.jobs)
+
+    collisions = find_collisions(results)
+    for fname, writers in collisions.items():
+        print(f"[collision] {fname} written by {', '.join(writers)}")
+
+    manifest = dict(
+        total_time=perf_counter() - t0,
+        formats=args.formats,
+        tolerance=args.tolerance,
+        scripts=results,
+        collisions=collisions,
+    )
+
+    manifest_path = args.manifest or os.path.join(args.output, "manifest.json")
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    failed = [r for r in results if r["status"] != "ok"]
+    print(f"{len(results) - len(failed)} of {len(results)} scripts succeeded")
+
+    return 1 if failed or collisions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
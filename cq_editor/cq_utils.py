@@ -1,18 +1,27 @@
 import cadquery as cq
 from cadquery.occ_impl.assembly import toCAF
 
+import ast
+import os
+import sys
 from typing import List, Union
 from importlib import reload
 from types import SimpleNamespace
 import OCC
 from OCC.Core.XCAFPrs import XCAFPrs_AISObject
 from OCC.Core.TopoDS import topods, TopoDS_Shape, TopoDS_Compound
-from OCC.Core.AIS import AIS_InteractiveObject, AIS_Shape
+from OCC.Core.AIS import AIS_InteractiveObject, AIS_Shape, AIS_WireFrame
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.BRepBndLib import brepbndlib
+from OCC.Core.BRepPrimAPI import BRepPrimAPI_MakeBox
 from OCC.Core.Quantity import Quantity_Color, Quantity_NOC_GOLD, Quantity_TOC_RGB
 from OCC.Core.Graphic3d import Graphic3d_NOM_JADE, Graphic3d_MaterialAspect
 
 from PySide6.QtGui import QColor
 
+from .import_graph import imported_names
+from .tessellation import TESSELLATION_CACHE, shape_hash
+
 DEFAULT_FACE_COLOR = Quantity_Color(Quantity_NOC_GOLD)
 DEFAULT_MATERIAL = Graphic3d_MaterialAspect(Graphic3d_NOM_JADE)
 
@@ -65,6 +74,19 @@ def to_compound(obj):
     return compound
 
 
+def assembly_parts(assy: cq.Assembly, loc=None, prefix=""):
+    """Yield (path, compound) for every part of an assembly, placed globally."""
+
+    loc = loc * assy.loc if loc else assy.loc
+    name = f"{prefix}/{assy.name}" if prefix else assy.name
+
+    if assy.obj is not None:
+        yield name, to_compound(assy.obj).moved(loc)
+
+    for child in assy.children:
+        yield from assembly_parts(child, loc, name)
+
+
 def to_workplane(obj: cq.Shape):
 
     rv = cq.Workplane("XY")
@@ -87,6 +109,7 @@ def make_AIS(
         AIS_InteractiveObject,
     ],
     options={},
+    mesh=True,
 ):
     shape = None
 
@@ -116,15 +139,41 @@ def make_AIS(
         except Exception as e:
             raise TypeError(f"[make_AIS] Invalid wrapped type after cast: {type(base_shape)}\nError: {e}")
 
+        # reuse the triangulation of identical geometry from previous renders
+        base_shape = TESSELLATION_CACHE.get(shape, base_shape, mesh)
+
         try:
             ais = AIS_Shape(base_shape)
         except Exception as e:
             raise RuntimeError(f"[make_AIS] Failed to create AIS_Shape: {e}")
 
+    apply_options(ais, options)
+
+    return ais, shape
+
+
+def make_placeholder(shape: TopoDS_Shape) -> AIS_Shape:
+    """Wireframe bounding box shown while shape is being meshed."""
+
+    box = Bnd_Box()
+    brepbndlib.Add(shape, box)
+    box.Enlarge(1e-3)  # flat shapes would give a degenerate box
+
+    ais = AIS_Shape(BRepPrimAPI_MakeBox(box.CornerMin(), box.CornerMax()).Shape())
+    ais.SetDisplayMode(AIS_WireFrame)
+
+    return ais
+
+
+def apply_options(ais: AIS_InteractiveObject, options={}, reset=False):
+    """Apply the show_object options, optionally resetting previous ones."""
+
     # 设置属性
     try:
         set_material(ais, DEFAULT_MATERIAL)
         set_color(ais, DEFAULT_FACE_COLOR)
+        if reset:
+            set_transparency(ais, 1.0)
     except Exception as e:
         print("[make_AIS] Warning: Failed to set material or color:", e)
 
@@ -138,7 +187,18 @@ def make_AIS(
         set_color(ais, to_occ_color((r, g, b)))
         set_transparency(ais, a)
 
-    return ais, shape
+    return ais
+
+
+def object_hash(obj) -> Union[str, None]:
+    """Geometric hash of a shown object, None if it cannot be computed."""
+
+    try:
+        if isinstance(obj, cq.Assembly):
+            return shape_hash(obj.toCompound())
+        return shape_hash(to_compound(obj))
+    except Exception:
+        return None
 
 
 def export(
@@ -209,30 +269,163 @@ def set_transparency(ais: AIS_Shape, alpha: float) -> AIS_Shape:
     return ais
 
 
-def reload_cq():
-
-    # NB: order of reloads is important
-    reload(cq.types)
-    reload(cq.occ_impl.geom)
-    reload(cq.occ_impl.shapes)
-    reload(cq.occ_impl.shapes)
-    reload(cq.occ_impl.importers.dxf)
-    reload(cq.occ_impl.importers)
-    reload(cq.occ_impl.solver)
-    reload(cq.occ_impl.assembly)
-    reload(cq.occ_impl.sketch_solver)
-    reload(cq.hull)
-    reload(cq.selectors)
-    reload(cq.sketch)
-    reload(cq.occ_impl.exporters.svg)
-    reload(cq.cq)
-    reload(cq.occ_impl.exporters.dxf)
-    reload(cq.occ_impl.exporters.amf)
-    reload(cq.occ_impl.exporters.json)
-    # reload(cq.occ_impl.exporters.assembly)
-    reload(cq.occ_impl.exporters)
-    reload(cq.assembly)
-    reload(cq)
+def _module_stat(module):
+
+    fname = getattr(module, "__file__", None)
+
+    try:
+        st = os.stat(fname)
+    except (OSError, TypeError):
+        return None
+
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _module_dependencies(module):
+    """Names of the modules imported by the source of module."""
+
+    name = module.__name__
+    fname = getattr(module, "__file__", None)
+
+    if not fname or not fname.endswith(".py"):
+        return set()
+
+    package = name if hasattr(module, "__path__") else name.rpartition(".")[0]
+
+    try:
+        with open(fname, "rb") as f:
+            tree = ast.parse(f.read(), fname)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+
+    # parent packages are imported implicitly, but usually import the module
+    # themselves rather than depend on it
+    return {
+        el
+        for el in imported_names(tree, package)
+        if not (name + ".").startswith(el + ".")
+    }
+
+
+class CQReloader(object):
+    """Reloads the modules of cadquery and its plugins whose source changed.
+
+    Changed modules are reloaded together with the loaded modules depending on
+    them, dependencies first. Modules seen for the first time are assumed to be
+    up to date.
+    """
+
+    def __init__(self, packages=("cadquery",)):
+
+        self.packages = tuple(packages)
+        self._stats = {}
+        self._dependencies = {}  # name -> (stat, imported module names)
+
+        self._snapshot()
+
+    def configure(self, packages=()):
+
+        self.packages = ("cadquery", *(p for p in packages if p != "cadquery"))
+        self._snapshot()
+
+    def modules(self):
+
+        return {
+            name: module
+            for name, module in list(sys.modules.items())
+            if module is not None
+            and any(name == p or name.startswith(p + ".") for p in self.packages)
+        }
+
+    def _snapshot(self):
+
+        for name, module in self.modules().items():
+            self._stats.setdefault(name, _module_stat(module))
+
+    def _module_dependencies(self, name, module, names):
+
+        stat = _module_stat(module)
+        cached = self._dependencies.get(name)
+
+        # sources are parsed again only when modified
+        if cached is None or cached[0] != stat:
+            cached = (stat, _module_dependencies(module))
+            self._dependencies[name] = cached
+
+        return cached[1] & names
+
+    def changed(self) -> List[str]:
+
+        return sorted(
+            name
+            for name, module in self.modules().items()
+            if name in self._stats and _module_stat(module) != self._stats[name]
+        )
+
+    def reload(self) -> List[str]:
+        """Reload the changed modules; returns their names in reload order."""
+
+        changed = self.changed()
+
+        if not changed:
+            self._snapshot()
+            return []
+
+        modules = self.modules()
+        names = set(modules)
+        dependencies = {
+            name: self._module_dependencies(name, module, names)
+            for name, module in modules.items()
+        }
+
+        dependents = {}
+        for name, deps in dependencies.items():
+            for dep in deps:
+                dependents.setdefault(dep, set()).add(name)
+
+        affected = set()
+        stack = list(changed)
+        while stack:
+            name = stack.pop()
+            if name not in affected:
+                affected.add(name)
+                stack.extend(dependents.get(name, ()))
+
+        # dependencies first; cycles are broken arbitrarily but deterministically
+        order = []
+        visited = set()
+
+        def visit(name):
+
+            if name in visited:
+                return
+            visited.add(name)
+
+            for dep in sorted(dependencies[name] & affected):
+                visit(dep)
+            order.append(name)
+
+        for name in sorted(affected):
+            visit(name)
+
+        for name in order:
+            reload(sys.modules[name])
+
+        # recorded only once everything succeeded, so that failures are retried
+        for name in order:
+            self._stats[name] = _module_stat(sys.modules[name])
+        self._snapshot()
+
+        return order
+
+
+CQ_RELOADER = CQReloader()
+
+
+def reload_cq() -> List[str]:
+    """Reload the modified cadquery (and plugin) modules."""
+
+    return CQ_RELOADER.reload()
 
 
 def is_obj_empty(obj: Union[cq.Workplane, cq.Shape]) -> bool:
@@ -12,8 +12,20 @@ if "CASROOT" in os.environ:
 if sys.platform == "win32":
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-# 关键一行：从 __main__.py 中导入 main()
-from cq_editor.__main__ import main
+
+def main():
+    # headless subcommand, must not create a QApplication
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from cq_editor.batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
+
+    # 关键一行：从 __main__.py 中导入 main()
+    # NB: imported lazily so that spawned worker processes do not create a GUI
+    from cq_editor.__main__ import main
+
+    main()
+
 
 # 运行入口
 if __name__ == "__main__":
@@ -0,0 +1,978 @@
+"""Qt independent script execution shared by the debugger, the worker
+processes and the headless batch runner."""
+
+import ast
+import ctypes
+import os
+import pickle
+import reprlib
+import sys
+from array import array
+from collections import OrderedDict, deque
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from hashlib import blake2b
+from inspect import currentframe
+from io import BytesIO
+from pathlib import Path
+from random import randrange as rrr, seed
+from time import perf_counter
+from traceback import extract_tb, FrameSummary
+from types import SimpleNamespace, ModuleType, CodeType
+
+import cadquery as cq
+from logbook import info
+
+from .cq_utils import (
+    find_cq_objects,
+    to_compound,
+    is_obj_empty,
+    reload_cq,
+    CQ_RELOADER,
+    export,
+)
+from .import_graph import ImportGraph
+from .profiling import ImportTimer
+
+DUMMY_FILE = "<cq_editor-string>"
+RANDOM_SEED = 59798267586177
+PREVIEW_LENGTH = 200
+SLOW_PREVIEW = 0.05  # s, types slower to format are not formatted again in a run
+MEMO_BUDGET = 512 * 2**20  # bytes
+
+# shared by the renders, so that only modified modules are parsed again
+IMPORT_GRAPH = ImportGraph()
+
+
+class RemoteError(Exception):
+    """Picklable stand-in for an exception raised in another process."""
+
+    def __init__(self, type_name, message, frames=()):
+
+        super(RemoteError, self).__init__(type_name, message, frames)
+
+        self.type_name = type_name
+        self.message = message
+        self.frames = list(frames)
+
+    def __str__(self):
+
+        return self.message
+
+    def summary(self):
+
+        return [
+            FrameSummary(fname, lineno, name, lookup_line=False, line=line)
+            for fname, lineno, name, line in self.frames
+        ]
+
+    @classmethod
+    def from_exc_info(cls, exc_info):
+
+        t, exc, tb = exc_info
+
+        frames = [(el.filename, el.lineno, el.name, el.line) for el in extract_tb(tb)]
+        if isinstance(exc, SyntaxError):
+            frames.append(
+                (exc.filename, exc.lineno, "", exc.text.strip() if exc.text else "")
+            )
+
+        return cls(t.__name__, str(exc), frames)
+
+
+class ScriptCancelled(BaseException):
+    """Raised asynchronously in a thread running a script to stop it.
+
+    Derives from BaseException so that it is not swallowed by scripts catching
+    Exception.
+    """
+
+
+def interrupt_thread(thread, exc=ScriptCancelled):
+    """Raise exc in thread as soon as it executes Python code again.
+
+    A thread blocked in a single long running OCCT call is only interrupted
+    once the call returns. Returns True if the exception was scheduled.
+    """
+
+    if thread.ident is None or not thread.is_alive():
+        return False
+
+    ident = ctypes.c_ulong(thread.ident)
+    n = ctypes.pythonapi.PyThreadState_SetAsyncExc(ident, ctypes.py_object(exc))
+
+    if n > 1:
+        # more than one thread state was affected, undo
+        ctypes.pythonapi.PyThreadState_SetAsyncExc(ident, None)
+
+    return n == 1
+
+
+class _PreviewRepr(reprlib.Repr):
+
+    def __init__(self):
+
+        super(_PreviewRepr, self).__init__()
+
+        self.maxlevel = 3
+        self.maxstring = self.maxother = PREVIEW_LENGTH
+
+    def repr1(self, x, level):
+
+        summary = _cq_summary(x)
+
+        return super(_PreviewRepr, self).repr1(x, level) if summary is None else summary
+
+
+def _cq_summary(value):
+    """Description of a CQ object built from cheap attributes, None otherwise."""
+
+    if isinstance(value, cq.Workplane):
+        return f"<Workplane: {len(value.objects)} objects>"
+    elif isinstance(value, cq.Assembly):
+        return f"<Assembly {value.name}: {len(value.children)} children>"
+    elif isinstance(value, cq.Sketch):
+        return "<Sketch>"
+    elif isinstance(value, cq.Shape):
+        return f"<{type(value).__name__}>"
+
+    return None
+
+
+_PREVIEW_REPR = _PreviewRepr()
+_slow_types = set()
+
+# formatting of these is bounded by reprlib, one slow value says nothing about
+# the next one of the same type
+_BOUNDED_TYPES = frozenset(
+    (str, bytes, int, tuple, list, set, frozenset, dict, deque, array)
+)
+
+
+def preview(value, limit=PREVIEW_LENGTH):
+    """Short text of a value for display, never longer than limit.
+
+    Containers are abbreviated and CQ objects are summarized without calling
+    repr. Other types whose formatting took longer than SLOW_PREVIEW are not
+    formatted again until the next run.
+    """
+
+    cls = type(value)
+
+    if cls in _slow_types:
+        return f"<{cls.__name__} object>"
+
+    t0 = perf_counter()
+
+    try:
+        text = value if isinstance(value, str) else _PREVIEW_REPR.repr(value)
+    except Exception:
+        text = "<unprintable>"
+
+    if perf_counter() - t0 > SLOW_PREVIEW and cls not in _BOUNDED_TYPES:
+        _slow_types.add(cls)
+
+    return text[:limit]
+
+
+class RemoteValue(object):
+    """Preview of a variable that lives in another process."""
+
+    __slots__ = ("type_name", "text")
+
+    def __init__(self, value):
+
+        self.type_name = type(value).__name__
+        self.text = preview(value)
+
+    def __str__(self):
+
+        return self.text
+
+    __repr__ = __str__
+
+
+def _code_hash(code, h):
+
+    h.update(code.co_code)
+    h.update(repr(code.co_names).encode())
+
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            _code_hash(const, h)
+        else:
+            h.update(repr(const).encode())
+
+
+def _dumps(obj):
+
+    try:
+        return pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    except Exception:
+        # objects without a stable representation never hit the cache
+        return repr(obj).encode()
+
+
+class _MemoEntry(object):
+
+    __slots__ = ("hit", "value")
+
+    def __init__(self, hit, value):
+
+        self.hit = hit
+        self.value = value
+
+
+class Memo(object):
+    """Memoization of expensive sub-builds across renders, injected as cache.
+
+    As a decorator, calls are keyed on the code of the function (not on its
+    identity, as it is redefined by every render) and on the arguments:
+
+        @cache
+        def gear(module, teeth):
+            ...
+
+    As a context manager, the block is keyed on the given arguments and has to
+    fill in the value itself on a miss:
+
+        with cache("tooth", module) as c:
+            if not c.hit:
+                c.value = make_tooth(module)
+
+    Values are kept in memory, evicted in least recently used order once their
+    pickled size exceeds the budget. Cached values are shared between renders,
+    so they must not be modified in place.
+    """
+
+    def __init__(self, budget=MEMO_BUDGET):
+
+        self.budget = budget
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._size = 0
+
+    def __call__(self, *args, **kwargs):
+
+        if len(args) == 1 and not kwargs and callable(args[0]):
+            return self._decorate(args[0])
+
+        return self._block(self._key(None, args, kwargs))
+
+    def _key(self, func, args, kwargs):
+
+        h = blake2b(digest_size=16)
+
+        if func is not None:
+            h.update(func.__qualname__.encode())
+            _code_hash(func.__code__, h)
+            h.update(_dumps(func.__defaults__))
+
+        h.update(_dumps((args, sorted(kwargs.items()))))
+
+        return h.hexdigest()
+
+    def _decorate(self, func):
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+
+            key = self._key(func, args, kwargs)
+
+            if key in self._entries:
+                return self._get(key)
+
+            rv = func(*args, **kwargs)
+            self._put(key, rv)
+
+            return rv
+
+        return wrapper
+
+    @contextmanager
+    def _block(self, key):
+
+        if key in self._entries:
+            yield _MemoEntry(True, self._get(key))
+            return
+
+        entry = _MemoEntry(False, None)
+        yield entry
+
+        self._put(key, entry.value)
+
+    def _get(self, key):
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+
+        return self._entries[key][0]
+
+    def _put(self, key, value):
+
+        self.misses += 1
+
+        size = len(_dumps(value))
+        if size > self.budget:
+            return
+
+        if key in self._entries:
+            self._size -= self._entries.pop(key)[1]
+
+        self._entries[key] = (value, size)
+        self._size += size
+
+        self._evict()
+
+    def configure(self, budget):
+
+        self.budget = budget
+        self._evict()
+
+    def _evict(self):
+
+        while self._size > self.budget:
+            _, (_, size) = self._entries.popitem(last=False)
+            self._size -= size
+
+    def clear(self):
+
+        self._entries.clear()
+        self._size = 0
+
+    def __len__(self):
+
+        return len(self._entries)
+
+
+MEMO = Memo()
+
+
+def rand_color(alpha=0.0, cfloat=False):
+    # helper function to generate a random color dict
+    # for CQ-editor's show_object function
+    lower = 10
+    upper = 100  # not too high to keep color brightness in check
+    if cfloat:  # for two output types depending on need
+        return (
+            (rrr(lower, upper) / 255),
+            (rrr(lower, upper) / 255),
+            (rrr(lower, upper) / 255),
+            alpha,
+        )
+    return {
+        "alpha": alpha,
+        "color": (
+            rrr(lower, upper),
+            rrr(lower, upper),
+            rrr(lower, upper),
+        ),
+    }
+
+
+def inject_locals(module, on_show=None):
+    """Inject show_object and the other helpers into the namespace of a script.
+
+    on_show is called with the name and the object on every show_object call,
+    e.g. to display objects while the script is still running.
+    """
+
+    cq_objects = {}
+
+    def _show_object(obj, name=None, options={}):
+
+        if name:
+            cq_objects.update({name: SimpleNamespace(shape=obj, options=options)})
+        else:
+            # get locals of the enclosing scope
+            d = currentframe().f_back.f_locals
+
+            # try to find the name
+            try:
+                name = list(d.keys())[list(d.values()).index(obj)]
+            except ValueError:
+                # use id if not found
+                name = str(id(obj))
+
+            cq_objects.update({name: SimpleNamespace(shape=obj, options=options)})
+
+        if on_show:
+            on_show(name, cq_objects[name])
+
+    def _debug(obj, name=None):
+
+        _show_object(obj, name, options=dict(color="red", alpha=0.2))
+
+    module.__dict__["show_object"] = _show_object
+    module.__dict__["debug"] = _debug
+    module.__dict__["rand_color"] = rand_color
+    module.__dict__["log"] = lambda x: info(str(x))
+    module.__dict__["cache"] = MEMO
+    module.__dict__["cq"] = cq
+
+    return cq_objects, set(module.__dict__) - {"cq"}
+
+
+def cleanup_locals(module, injected_names):
+
+    for name in injected_names:
+        module.__dict__.pop(name)
+
+
+def compile_script(cq_script, cq_script_path=None):
+
+    # slow previews are remembered for a single run
+    _slow_types.clear()
+
+    module = ModuleType("__cq_main__")
+    if cq_script_path:
+        module.__dict__["__file__"] = cq_script_path
+    cq_code = compile(cq_script, DUMMY_FILE, "exec")
+
+    return cq_code, module
+
+
+@contextmanager
+def script_context(
+    cq_script_path=None,
+    add_to_path=True,
+    change_dir=True,
+    reload_modules=True,
+    reload_all=False,
+    project_roots=(),
+):
+    """Environment in which user scripts are executed
+
+    With reload_all, every module imported by the script is unloaded after
+    the run; otherwise only the local ones are, see ModuleReloader.
+    """
+
+    with ExitStack() as stack:
+        p = Path(cq_script_path or "").absolute().parent
+
+        if add_to_path and p.exists():
+            sys.path.insert(0, p)
+            stack.callback(sys.path.remove, p)
+        if change_dir and p.exists():
+            stack.enter_context(p)
+        if reload_modules and reload_all:
+            stack.enter_context(module_manager())
+        elif reload_modules:
+            MODULE_RELOADER.configure(project_roots)
+            script_dir = str(p) if cq_script_path else None
+            stack.enter_context(
+                MODULE_RELOADER.manage(
+                    script_dir, str(cq_script_path) if cq_script_path else None
+                )
+            )
+
+        yield
+
+
+def run_script(cq_script, cq_script_path=None, **kwargs):
+    """Execute a script with the same semantics as Debugger.render.
+
+    Returns the shown objects (or all CQ objects if show_object was never
+    called) and the module the script was executed in. Exceptions raised by
+    the script are propagated.
+    """
+
+    seed(RANDOM_SEED)
+
+    cq_code, module = compile_script(cq_script, cq_script_path)
+    cq_objects, injected_names = inject_locals(module)
+
+    with script_context(cq_script_path, **kwargs):
+        exec(cq_code, module.__dict__, module.__dict__)
+
+    cleanup_locals(module, injected_names)
+
+    if len(cq_objects) == 0:
+        cq_objects = find_cq_objects(module.__dict__)
+
+    return cq_objects, module
+
+
+def render_remote(
+    cq_script,
+    cq_script_path=None,
+    reload_cadquery=False,
+    reload_packages=(),
+    memo_budget=MEMO_BUDGET,
+    **kwargs,
+):
+    """Worker side of Debugger.render.
+
+    Returns the shown objects serialized as BREP together with their options,
+    previews of the module variables and the error raised by the script, if any.
+    """
+
+    MEMO.configure(memo_budget)
+
+    if reload_cadquery:
+        CQ_RELOADER.configure(reload_packages)
+        # values built by the previous cadquery modules are stale
+        if reload_cq():
+            MEMO.clear()
+
+    try:
+        cq_objects, module = run_script(cq_script, cq_script_path, **kwargs)
+    except Exception:
+        return {}, {}, RemoteError.from_exc_info(sys.exc_info())
+
+    shapes = {}
+    for name, obj in cq_objects.items():
+        if not is_obj_empty(obj.shape):
+            shapes[name] = (to_brep(obj.shape), dict(obj.options))
+
+    variables = {
+        k: RemoteValue(v) for k, v in module.__dict__.items() if not k.startswith("_")
+    }
+
+    return shapes, variables, None
+
+
+def to_brep(obj) -> bytes:
+
+    if isinstance(obj, cq.Assembly):
+        shape = obj.toCompound()
+    else:
+        shape = to_compound(obj)
+
+    buf = BytesIO()
+    shape.exportBrep(buf)
+
+    return buf.getvalue()
+
+
+def from_brep(data: bytes) -> cq.Shape:
+
+    return cq.Shape.importBrep(BytesIO(data))
+
+
+def export_brep(data: bytes, export_type, fname, precision=1e-1):
+    """Export a BREP serialized shape; used by the export worker jobs."""
+
+    export(from_brep(data), export_type, fname, precision)
+
+    return fname
+
+
+def imported_module_paths(cq_script, cq_script_path):
+    """Files of the modules imported from the directory of the script."""
+
+    if not cq_script_path:
+        return []
+
+    IMPORT_GRAPH.update(cq_script_path, cq_script)
+
+    errors = IMPORT_GRAPH.errors()
+    if errors:
+        path, error = next(iter(errors.items()))
+        raise ImportError(f"{error} ({path})")
+
+    return IMPORT_GRAPH.files()
+
+
+@contextmanager
+def module_manager():
+    """unloads any modules loaded while the context manager is active"""
+    loaded_modules = set(sys.modules.keys())
+
+    try:
+        yield
+    finally:
+        new_modules = set(sys.modules.keys()) - loaded_modules
+        for module_name in new_modules:
+            del sys.modules[module_name]
+
+
+def _source_stat(fname):
+
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _module_location(module):
+
+    fname = getattr(module, "__file__", None)
+    if fname:
+        return fname
+
+    # namespace packages
+    path = getattr(module, "__path__", None)
+
+    return next(iter(path), None) if path else None
+
+
+def _is_within(fname, directory):
+
+    try:
+        return os.path.commonpath((fname, directory)) == directory
+    except ValueError:
+        # on different drives on Windows
+        return False
+
+
+class ModuleReloader(object):
+    """Selective replacement of module_manager.
+
+    Modules imported by a script are unloaded after the run only if they were
+    loaded from the script directory or one of the project roots, unless the
+    import graph of the script tracks them. Tracked local modules and any
+    other module, e.g. a heavy third party library, stay resident until their
+    source file changes or is invalidated, in which case they are unloaded
+    together with their submodules and the local modules importing them
+    before the next run.
+    """
+
+    def __init__(self):
+
+        self.roots = []
+        self.graph = ImportGraph()
+        self.last_reloaded = []
+        self.last_cost = 0.0
+
+        self._resident = {}  # module name -> (file, stat)
+        self._local = set()  # resident modules tracked by the import graph
+        self._invalid = set()  # files changed according to the editor
+        self._script_dir = None
+        self._unloaded = set()
+
+    def configure(self, roots=()):
+
+        self.roots = [os.path.abspath(root) for root in roots if root]
+
+    def is_local(self, module, directories):
+
+        fname = _module_location(module)
+
+        if not fname:
+            return False
+
+        fname = os.path.abspath(fname)
+
+        return any(_is_within(fname, d) for d in directories if d)
+
+    def invalidate(self, paths):
+        """Reload the modules of the given files before the next run."""
+
+        self._invalid.update(os.path.abspath(path) for path in paths)
+
+    def stale(self):
+        """Changed resident modules, their submodules and local importers."""
+
+        changed = {
+            name
+            for name, (fname, stat) in self._resident.items()
+            if _source_stat(fname) != stat or os.path.abspath(fname) in self._invalid
+        }
+
+        if changed - self._local:
+            # the graph only covers local modules, any of which may hold on
+            # to objects of the changed library
+            changed |= self._local
+        else:
+            files = [os.path.abspath(self._resident[name][0]) for name in changed]
+            for path in self.graph.dependents(files):
+                name = self.graph.module_name(path)
+                if name in self._resident:
+                    changed.add(name)
+
+        return {
+            name
+            for name in self._resident
+            for c in changed
+            if name == c or name.startswith(c + ".")
+        }
+
+    def _unload(self, names):
+
+        for name in names:
+            sys.modules.pop(name, None)
+            self._resident.pop(name, None)
+            self._local.discard(name)
+
+    @contextmanager
+    def manage(self, script_dir=None, script=None):
+
+        directories = [script_dir, *self.roots]
+
+        if script_dir != self._script_dir:
+            # local modules of another directory may shadow the ones of this one
+            self._unload(list(self._local))
+            self._script_dir = script_dir
+
+        if script and os.path.isfile(script):
+            self.graph.path = [os.path.abspath(d) for d in directories if d]
+            self.graph.update(script)
+        else:
+            self.graph.clear()
+
+        stale = self.stale()
+        self._unload(stale)
+        self._invalid = set()
+
+        loaded_modules = set(sys.modules)
+        timer = ImportTimer()
+
+        try:
+            with timer:
+                yield
+        finally:
+            tracked = set(self.graph.files())
+            new_modules = set(sys.modules) - loaded_modules
+            unloaded = set()
+
+            for name in new_modules:
+                module = sys.modules.get(name)
+                fname = _module_location(module) if module else None
+                local = module is None or self.is_local(module, directories)
+
+                if local and not (fname and os.path.abspath(fname) in tracked):
+                    del sys.modules[name]
+                    unloaded.add(name)
+                elif fname:
+                    self._resident[name] = (fname, _source_stat(fname))
+                    if local:
+                        self._local.add(name)
+
+            # modules imported again, as opposed to imported for the first time
+            reloaded = new_modules & (self._unloaded | stale)
+
+            self.last_reloaded = sorted(reloaded)
+            self.last_cost = timer.cost(reloaded)
+            self._unloaded = unloaded
+
+            if reloaded:
+                info(
+                    f"Reloaded {len(reloaded)} modules in {1e3 * self.last_cost:.1f} ms: "
+                    + ", ".join(self.last_reloaded)
+                )
+
+    def clear(self):
+
+        for name in self._resident:
+            sys.modules.pop(name, None)
+
+        self.graph.clear()
+        self._resident = {}
+        self._local = set()
+        self._invalid = set()
+        self._script_dir = None
+        self._unloaded = set()
+
+
+MODULE_RELOADER = ModuleReloader()
+
+
+def _names(node, ctx):
+
+    return {
+        el.id
+        for el in ast.walk(node)
+        if isinstance(el, ast.Name) and isinstance(el.ctx, ctx)
+    }
+
+
+DEFINITIONS = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+
+def statement_io(stmt):
+    """Names read and written by a top-level statement.
+
+    Reads are over-approximated by every name loaded anywhere in the statement,
+    including function bodies, which makes a def depend on the globals it uses.
+    Writes include names whose objects are modified in place.
+    """
+
+    reads = _names(stmt, ast.Load)
+
+    if isinstance(stmt, DEFINITIONS):
+        writes = {stmt.name}
+    elif isinstance(stmt, (ast.Import, ast.ImportFrom)):
+        writes = {(el.asname or el.name).split(".")[0] for el in stmt.names}
+    else:
+        writes = _names(stmt, (ast.Store, ast.Del))
+
+        # in-place modification of an attribute or an item counts as a write
+        for el in ast.walk(stmt):
+            if isinstance(el, (ast.Attribute, ast.Subscript)) and isinstance(
+                el.ctx, (ast.Store, ast.Del)
+            ):
+                writes |= _names(el.value, ast.Load)
+
+        # so does calling a method, e.g. assy.add(part) or parts.append(part)
+        if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call):
+            node = stmt.value.func
+            while isinstance(node, (ast.Attribute, ast.Subscript, ast.Call)):
+                node = node.func if isinstance(node, ast.Call) else node.value
+            if isinstance(node, ast.Name) and node is not stmt.value.func:
+                writes.add(node.id)
+
+    return reads, writes
+
+
+def statement_binds(stmt):
+    """Names bound to new objects by a top-level statement."""
+
+    if isinstance(stmt, (DEFINITIONS, ast.Import, ast.ImportFrom)):
+        return statement_io(stmt)[1]
+
+    # x += y modifies lists and other mutable objects in place
+    augmented = {
+        el.target.id
+        for el in ast.walk(stmt)
+        if isinstance(el, ast.AugAssign) and isinstance(el.target, ast.Name)
+    }
+
+    return _names(stmt, (ast.Store, ast.Del)) - augmented
+
+
+class IncrementalExecutor(object):
+    """Executes a script statement by statement, reusing an unchanged prefix.
+
+    The results of the top-level statements of the previous run are kept.
+    Statements identical to the ones the previous run started with are not
+    executed again; the names they wrote and the objects they showed are
+    restored from the cache instead. Everything from the first edited
+    statement on is executed. Imports and definitions are always executed,
+    and an import of a module whose file changed ends the reused prefix.
+
+    Cached objects are the ones left at the end of the previous run, so the
+    prefix also ends before the statement that created an object modified in
+    place after the prefix, e.g. by assy.add(part). Modifications through
+    aliases or inside functions are not detected.
+    """
+
+    def __init__(self):
+
+        self._steps = []
+        self.executed = 0
+        self.reused = 0
+
+    def clear(self):
+
+        self._steps = []
+
+    def _reusable(self, dumps):
+        """Number of leading statements whose cached results are valid."""
+
+        steps = self._steps
+
+        n = 0
+        for dump, step in zip(dumps, steps):
+            if dump != step.dump or not _stamp_valid(step.stamp):
+                break
+            n += 1
+
+        # objects created in the prefix and modified after it are stale, and
+        # so are the ones modified by the statements this excludes in turn
+        while True:
+            m = min([n, *(i for step in steps[n:] for i in step.modified)])
+            if m == n:
+                return n
+            n = m
+
+    def run(self, cq_script, module, cq_objects):
+
+        tree = ast.parse(cq_script, DUMMY_FILE)
+
+        namespace = module.__dict__
+        dumps = [ast.dump(stmt) for stmt in tree.body]
+        prefix = self._reusable(dumps)
+
+        steps = []
+        origins = {}  # index of the statement that bound each name
+
+        self.executed = self.reused = 0
+
+        try:
+            for i, (stmt, dump) in enumerate(zip(tree.body, dumps)):
+                _, writes = statement_io(stmt)
+                binds = statement_binds(stmt)
+
+                # recorded up front, a failing statement may have modified
+                # objects as well; it only matches once it succeeded
+                step = SimpleNamespace(
+                    dump=None,
+                    stamp=(),
+                    values={},
+                    shown={},
+                    modified={
+                        origins[n]
+                        for n in writes - binds
+                        if n in origins and not isinstance(namespace.get(n), ModuleType)
+                    },
+                )
+                steps.append(step)
+
+                # imports and definitions are cheap to redo, imported files may
+                # have changed and reused functions would keep the globals of
+                # the previous run, without show_object and friends
+                if i < prefix and not isinstance(
+                    stmt, (DEFINITIONS, ast.Import, ast.ImportFrom)
+                ):
+                    cached = self._steps[i]
+                    step.values, step.shown = cached.values, cached.shown
+                    namespace.update(step.values)
+                    cq_objects.update(step.shown)
+                    self.reused += 1
+                else:
+                    shown_before = dict(cq_objects)
+
+                    exec(self._compile(stmt), namespace, namespace)
+
+                    if isinstance(stmt, (ast.Import, ast.ImportFrom)):
+                        step.stamp = _import_stamp(stmt)
+                    step.values = {n: namespace[n] for n in writes if n in namespace}
+                    step.shown = {
+                        k: v
+                        for k, v in cq_objects.items()
+                        if k not in shown_before or shown_before[k] is not v
+                    }
+                    self.executed += 1
+
+                step.dump = dump
+
+                for name in binds:
+                    origins[name] = i
+        finally:
+            # only the last run is kept to bound the memory use
+            self._steps = steps
+
+    @staticmethod
+    def _compile(stmt):
+
+        return compile(ast.Module(body=[stmt], type_ignores=[]), DUMMY_FILE, "exec")
+
+
+def _import_stamp(stmt):
+
+    if isinstance(stmt, ast.ImportFrom):
+        names = [stmt.module] if stmt.module and stmt.level == 0 else []
+    else:
+        names = [el.name for el in stmt.names]
+
+    rv = []
+    for name in names:
+        fname = getattr(sys.modules.get(name), "__file__", None)
+        if fname and os.path.exists(fname):
+            rv.append((fname, os.stat(fname).st_mtime_ns))
+
+    return tuple(rv)
+
+
+def _stamp_valid(stamp):
+
+    try:
+        return all(os.stat(fname).st_mtime_ns == mtime for fname, mtime in stamp)
+    except OSError:
+        return False
@@ -71,6 +71,11 @@ _icons_specs = {
         },
     ),
     "toggle-comment": (("fa5s.hashtag",), {}),
+    # same glyphs as the spyder icon manager, which is slow to import
+    "debug": (("mdi.step-forward-2",), {}),
+    "arrow-step-over": (("mdi.debug-step-over",), {}),
+    "arrow-step-in": (("mdi.debug-step-into",), {}),
+    "arrow-continue": (("mdi.skip-next",), {}),
 }
 
 
@@ -0,0 +1,240 @@
+"""Incremental index of the local modules imported by a script.
+
+Only modules found next to the script (or in an explicitly given search path)
+are indexed; anything else, e.g. site-packages, is ignored. Every file is
+parsed once and parsed again only when its mtime or size changed, so bringing
+the index up to date after a save costs a stat per indexed file plus a parse
+of the changed ones, instead of a full ModuleFinder scan.
+"""
+
+import ast
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+
+class _Node(object):
+
+    __slots__ = ("name", "stat", "imports", "missing", "error")
+
+    def __init__(self, name):
+
+        self.name = name
+        self.stat = None
+        self.imports = set()
+        self.missing = set()  # names not found, retried on every update
+        self.error = None
+
+
+def _stat(path):
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size)
+
+
+def imported_names(tree, package):
+    """Absolute names of the modules a module may import."""
+
+    rv = set()
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            rv.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                parts = package.split(".") if package else []
+                if node.level - 1 > len(parts) or not package:
+                    continue  # relative import beyond the top-level package
+                base = ".".join(parts[: len(parts) - node.level + 1])
+                base = ".".join(el for el in (base, node.module) if el)
+            else:
+                base = node.module
+            if not base:
+                continue
+            rv.add(base)
+            # from package import submodule
+            rv.update(f"{base}.{alias.name}" for alias in node.names)
+
+    # importing a.b.c imports a and a.b as well
+    return {
+        ".".join(parts[: i + 1])
+        for parts in (name.split(".") for name in rv)
+        for i in range(len(parts))
+    }
+
+
+class ImportGraph(object):
+    """Local import graph of a script.
+
+    The graph is updated with update(); files() and directories() tell what to
+    watch and dependents() which modules are affected by a change.
+    """
+
+    def __init__(self, path: Iterable[str] = ()):
+
+        self.path = [os.path.abspath(p) for p in path]
+        self.root = None
+
+        self._nodes: Dict[str, _Node] = {}
+        self._script_path = []
+
+    def _search_path(self):
+
+        return self.path or self._script_path
+
+    def _find(self, name) -> Optional[str]:
+        """File of a module, None if it is not local."""
+
+        parts = name.split(".")
+
+        for base in self._search_path():
+            directory = base
+            for i, part in enumerate(parts):
+                last = i == len(parts) - 1
+                candidate = os.path.join(directory, part)
+                if os.path.isfile(os.path.join(candidate, "__init__.py")):
+                    if last:
+                        return os.path.join(candidate, "__init__.py")
+                    directory = candidate
+                elif last and os.path.isfile(candidate + ".py"):
+                    return candidate + ".py"
+                else:
+                    # a directory without __init__.py, e.g. a data folder, is
+                    # at most a namespace package whose content cannot be
+                    # tracked; look further along the path as Python does
+                    break
+
+        return None
+
+    def _parse(self, path, node, source=None):
+
+        node.imports = set()
+        node.missing = set()
+        node.error = None
+
+        is_package = os.path.basename(path) == "__init__.py"
+        package = node.name if is_package else node.name.rpartition(".")[0]
+        if node.name == "__main__":
+            package = ""
+
+        try:
+            if source is None:
+                with open(path, "rb") as f:
+                    source = f.read()
+            tree = ast.parse(source, path)
+        except (SyntaxError, ValueError, OSError) as e:
+            node.error = f"{type(e).__name__} {e}"
+            return
+
+        self._resolve(path, node, imported_names(tree, package))
+
+    def _resolve(self, path, node, names):
+
+        node.missing = set()
+
+        for name in sorted(names):
+            fname = self._find(name)
+
+            if fname is None:
+                node.missing.add(name)
+            elif fname != path:
+                node.imports.add(fname)
+                if fname not in self._nodes:
+                    self._nodes[fname] = _Node(name)
+
+    def update(self, script, source=None) -> Set[str]:
+        """Bring the graph of a script up to date.
+
+        source is the current text of the script, read from disk if None.
+        Returns the modified files, empty on the first call for a script.
+        """
+
+        script = os.path.abspath(script)
+
+        if script != self.root:
+            self.clear()
+            self.root = script
+            self._script_path = [os.path.dirname(script)]
+            self._nodes[script] = _Node("__main__")
+
+        changed = set()
+        seen = set()
+        stack = [script]
+
+        while stack:
+            path = stack.pop()
+            if path in seen:
+                continue
+            seen.add(path)
+
+            node = self._nodes[path]
+            stat = _stat(path)
+
+            if stat is None:
+                node.error = "FileNotFoundError"
+            elif path == script and source is not None:
+                self._parse(path, node, source)
+            elif stat != node.stat:
+                if node.stat is not None:
+                    changed.add(path)
+                self._parse(path, node)
+            elif node.missing:
+                # the modules may have been created in the meantime
+                node.error = None
+                self._resolve(path, node, node.missing)
+
+            node.stat = stat
+            stack.extend(node.imports - seen)
+
+        # forget modules that are not imported anymore
+        for path in set(self._nodes) - seen:
+            del self._nodes[path]
+
+        return changed
+
+    def clear(self):
+
+        self.root = None
+        self._nodes = {}
+        self._script_path = []
+
+    def files(self) -> List[str]:
+        """Imported module files, excluding the script itself."""
+
+        return sorted(path for path in self._nodes if path != self.root)
+
+    def directories(self) -> List[str]:
+
+        return sorted({os.path.dirname(path) for path in self._nodes})
+
+    def errors(self) -> Dict[str, str]:
+
+        return {path: node.error for path, node in self._nodes.items() if node.error}
+
+    def module_name(self, path) -> Optional[str]:
+
+        node = self._nodes.get(path)
+
+        return node.name if node else None
+
+    def dependents(self, paths: Iterable[str]) -> Set[str]:
+        """The given files and all the files importing them, transitively."""
+
+        importers = {}
+        for path, node in self._nodes.items():
+            for imported in node.imports:
+                importers.setdefault(imported, set()).add(path)
+
+        rv = set()
+        stack = [p for p in paths if p in self._nodes]
+
+        while stack:
+            path = stack.pop()
+            if path not in rv:
+                rv.add(path)
+                stack.extend(importers.get(path, ()))
+
+        return rv
@@ -1,6 +1,8 @@
 # 负责GUI构造和交互界面
 import sys
 import logging
+import threading
+from collections import deque
 
 # 配置日志，关闭所有调试输出
 logging.basicConfig(level=logging.ERROR)
@@ -10,7 +12,7 @@ logging.getLogger().setLevel(logging.ERROR)
 for logger_name in ['ipykernel', 'jupyter_client', 'qtconsole', 'asyncio', 'tornado', 'zmq']:
     logging.getLogger(logger_name).setLevel(logging.ERROR)
 
-from PySide6.QtCore import QObject, Signal
+from PySide6.QtCore import QObject, Signal, Slot, QTimer
 from PySide6.QtGui import QPalette, QColor, QAction
 from PySide6.QtWidgets import (
     QLabel,
@@ -26,12 +28,13 @@ import cadquery as cq
 # 导入自定义组件
 from .widgets.editor import Editor
 from .widgets.viewer import OCCViewer
-from .widgets.console import ConsoleWidget
 from .widgets.object_tree import ObjectTree
 from .widgets.traceback_viewer import TracebackPane
 from .widgets.debugger import Debugger, LocalsView
 from .widgets.cq_object_inspector import CQObjectInspector
 from .widgets.log import LogViewer
+from .widgets.profiler import ProfilerPane
+from .widgets.console_preferences import ConsolePreferences
 
 from . import __version__
 from .utils import (
@@ -42,7 +45,8 @@ from .utils import (
     check_gtihub_for_updates,
     confirm,
 )
-from .mixins import MainMixin
+from .mixins import MainMixin, LazyComponent
+from .profiling import STARTUP
 from .icons import icon
 from pyqtgraph.parametertree import Parameter
 from .preferences import PreferencesWidget
@@ -54,13 +58,29 @@ class _PrintRedirectorSingleton(QObject):
     它被实例化为.main_window.PRINT_REDIRECTOR，不应该再次实例化。
     这样做的目的是
     将标准输出重定向到GUI界面的日志窗口中。
+
+    写入的文本先进入环形缓冲区，每秒约30次合并为一个信号发出。缓冲区满或
+    输出过多时丢弃最早的行，并插入 "[N lines dropped]" 标记。
     """
 
     sigStdoutWrite = Signal(str)  # 定义信号，用于传递标准输出文本
+    _sigScheduleFlush = Signal()
+
+    FLUSH_INTERVAL = 33  # ms
+    BUFFER_SIZE = 10000  # 两次刷新之间保留的写入次数
+    MAX_LINES = 1000  # 每次刷新最多显示的行数
 
     def __init__(self):
         super().__init__()
 
+        self._buffer = deque(maxlen=self.BUFFER_SIZE)
+        self._dropped = 0
+        self._scheduled = False
+        # 脚本可以在后台线程中打印
+        self._lock = threading.Lock()
+
+        self._sigScheduleFlush.connect(self._schedule_flush)
+
         # 保存原始的stdout.write函数
         original_stdout_write = sys.stdout.write
 
@@ -71,17 +91,66 @@ class _PrintRedirectorSingleton(QObject):
             Returns:
                 调用原始stdout.write的结果
             """
-            self.sigStdoutWrite.emit(text)  # 发出信号
+            self.write(text)  # 写入缓冲区
             return original_stdout_write(text)  # 调用原始函数
 
         # 替换sys.stdout.write
         sys.stdout.write = new_stdout_write
 
+    def write(self, text):
+        """把文本写入环形缓冲区，并在需要时安排一次刷新"""
+        with self._lock:
+            buffer = self._buffer
+            if len(buffer) == buffer.maxlen:
+                self._dropped += buffer[0].count("\n")
+            buffer.append(text)
+
+            schedule = not self._scheduled
+            self._scheduled = True
+
+        # 在GUI线程中启动定时器
+        if schedule:
+            self._sigScheduleFlush.emit()
+
+    @Slot()
+    def _schedule_flush(self):
+        QTimer.singleShot(self.FLUSH_INTERVAL, self.flush)
+
+    @Slot()
+    def flush(self):
+        """把缓冲的文本作为一个块发出"""
+        with self._lock:
+            text = "".join(self._buffer)
+            dropped = self._dropped
+
+            self._buffer.clear()
+            self._dropped = 0
+            self._scheduled = False
+
+        if not text and not dropped:
+            return
+
+        # 限制每次刷新的行数
+        lines = text.split("\n")
+        if len(lines) > self.MAX_LINES + 1:
+            dropped += len(lines) - self.MAX_LINES - 1
+            text = "\n".join(lines[-self.MAX_LINES - 1 :])
+
+        if dropped:
+            text = f"[{dropped} lines dropped]\n{text}"
+
+        self.sigStdoutWrite.emit(text)
+
 
 # 创建全局单例实例
 PRINT_REDIRECTOR = _PrintRedirectorSingleton()
 
 
+def _merge_vars(old, new):
+    """合并延迟的push_vars调用"""
+    return ({**old[0], **new[0]},)
+
+
 class MainWindow(QMainWindow, MainMixin):
     """主窗口类，继承自QMainWindow和MainMixin
     负责整个应用程序的主界面布局和功能组织
@@ -169,7 +238,7 @@ class MainWindow(QMainWindow, MainMixin):
             # 恢复默认浅色主题
             QApplication.instance().setStyleSheet("")
             QApplication.instance().setPalette(QApplication.style().standardPalette())
-            self.components["console"].app_theme_changed("Light")
+            self.components["console"].call("app_theme_changed", "Light")
         elif self.preferences["Light/Dark Theme"] == "Dark":
             # 设置深色主题
             QApplication.instance().setStyle("Fusion")
@@ -197,7 +266,7 @@ class MainWindow(QMainWindow, MainMixin):
             
             # 应用调色板
             QApplication.instance().setPalette(palette)
-            self.components["console"].app_theme_changed("Dark")
+            self.components["console"].call("app_theme_changed", "Dark")
 
         # 调整工具栏颜色
         p = self.toolbar.palette()
@@ -241,57 +310,72 @@ class MainWindow(QMainWindow, MainMixin):
     # 准备和初始化所有面板组件
     def prepare_panes(self):
         # 注册编辑器组件
-        self.registerComponent(
-            "editor",
-            Editor(self),
-            lambda c: dock(c, "Editor", self, defaultArea="left"),
-        )
+        with STARTUP.stage("editor"):
+            self.registerComponent(
+                "editor",
+                Editor(self),
+                lambda c: dock(c, "Editor", self, defaultArea="left"),
+            )
 
         # 注册对象树组件
-        self.registerComponent(
-            "object_tree",
-            ObjectTree(self),
-            lambda c: dock(c, "Objects", self, defaultArea="right"),
-        )
+        with STARTUP.stage("object_tree"):
+            self.registerComponent(
+                "object_tree",
+                ObjectTree(self),
+                lambda c: dock(c, "Objects", self, defaultArea="right"),
+            )
 
         # 注册错误追踪面板
-        self.registerComponent(
-            "traceback_viewer",
-            TracebackPane(self),
-            lambda c: dock(c, "Current traceback", self, defaultArea="bottom"),
-        )
+        with STARTUP.stage("traceback_viewer"):
+            self.registerComponent(
+                "traceback_viewer",
+                TracebackPane(self),
+                lambda c: dock(c, "Current traceback", self, defaultArea="bottom"),
+            )
 
         # 注册调试器
-        self.registerComponent("debugger", Debugger(self))
+        with STARTUP.stage("debugger"):
+            self.registerComponent("debugger", Debugger(self))
 
-        # 注册控制台
-        self.registerComponent(
+        # 注册控制台，qtconsole和内核在面板第一次显示时才加载
+        self.registerLazyComponent(
             "console",
-            ConsoleWidget(self),
-            # 调用dock函数将这个组件添加到主窗口的底部区域，设置停靠窗口的标题为console
+            self._make_console,
             lambda c: dock(c, "Console", self, defaultArea="bottom"),
+            ConsolePreferences,
         )
 
         # 注册变量查看器
-        self.registerComponent(
-            "variables_viewer",
-            LocalsView(self),
-            lambda c: dock(c, "Variables", self, defaultArea="right"),
-        )
+        with STARTUP.stage("variables_viewer"):
+            self.registerComponent(
+                "variables_viewer",
+                LocalsView(self),
+                lambda c: dock(c, "Variables", self, defaultArea="right"),
+            )
 
         # 注册CQ对象检查器
-        self.registerComponent(
+        self.registerLazyComponent(
             "cq_object_inspector",
-            CQObjectInspector(self),
+            lambda: CQObjectInspector(self),
             lambda c: dock(c, "CQ object inspector", self, defaultArea="right"),
+            CQObjectInspector,
         )
 
         # 注册日志查看器
-        self.registerComponent(
-            "log",
-            LogViewer(self),
-            lambda c: dock(c, "Log viewer", self, defaultArea="bottom"),
-        )
+        with STARTUP.stage("log"):
+            self.registerComponent(
+                "log",
+                LogViewer(self),
+                lambda c: dock(c, "Log viewer", self, defaultArea="bottom"),
+            )
+
+        # 注册性能分析面板
+        with STARTUP.stage("profiler"):
+            self.registerComponent(
+                "profiler",
+                ProfilerPane(self),
+                lambda c: dock(c, "Profiler", self, defaultArea="bottom"),
+            )
 
         # 显示所有面板
         for d in self.docks.values():
@@ -329,6 +413,11 @@ class MainWindow(QMainWindow, MainMixin):
         for comp in self.components.values():
             self.prepare_menubar_component(menus, comp.menuActions())
 
+        self._menus = menus
+        for comp in self.components.values():
+            if isinstance(comp, LazyComponent) and not comp.built():
+                comp.when_built(self._add_component_actions)
+
         # 添加视图菜单项
         menu_view.addSeparator()
         for d in self.findChildren(QDockWidget):
@@ -371,6 +460,18 @@ class MainWindow(QMainWindow, MainMixin):
             )
         )
 
+    def _make_console(self):
+
+        from .widgets.console import ConsoleWidget
+
+        return ConsoleWidget(self)
+
+    def _add_component_actions(self, component):
+        """Add the actions of a component built after the menus."""
+
+        self.prepare_menubar_component(self._menus, component.menuActions())
+        add_actions(self.toolbar, component.toolbarActions())
+
     def prepare_menubar_component(self, menus, comp_menu_dict):
         """为组件准备菜单项
             menus: 菜单字典
@@ -406,14 +507,17 @@ class MainWindow(QMainWindow, MainMixin):
         self.components["debugger"].sigRendered.connect(
             self.components["object_tree"].addObjects
         )
+        self.components["debugger"].sigStreamed.connect(
+            self.components["object_tree"].streamObjects
+        )
         self.components["debugger"].sigTraceback.connect(
             self.components["traceback_viewer"].addTraceback
         )
         self.components["debugger"].sigLocals.connect(
             self.components["variables_viewer"].update_frame
         )
-        self.components["debugger"].sigLocals.connect(
-            self.components["console"].push_vars
+        self.components["debugger"].sigLocalsModified.connect(
+            self.components["console"].slot("push_vars", merge=_merge_vars)
         )
 
         # 连接对象树信号
@@ -430,7 +534,7 @@ class MainWindow(QMainWindow, MainMixin):
             self.components["viewer"].remove_items
         )
         self.components["object_tree"].sigCQObjectSelected.connect(
-            self.components["cq_object_inspector"].setObject
+            self.components["cq_object_inspector"].slot("setObject")
         )
         self.components["object_tree"].sigObjectPropertiesChanged.connect(
             self.components["viewer"].redraw
@@ -450,20 +554,8 @@ class MainWindow(QMainWindow, MainMixin):
         )
 
         # 连接CQ对象检查器信号
-        self.components["cq_object_inspector"].sigDisplayObjects.connect(
-            self.components["viewer"].display_many
-        )
-        self.components["cq_object_inspector"].sigRemoveObjects.connect(
-            self.components["viewer"].remove_items
-        )
-        self.components["cq_object_inspector"].sigShowPlane.connect(
-            self.components["viewer"].toggle_grid
-        )
-        self.components["cq_object_inspector"].sigShowPlane.connect(
-            lambda visible, scale: self.components["viewer"].toggle_grid(visible, scale)
-        )
-        self.components["cq_object_inspector"].sigChangePlane.connect(
-            self.components["viewer"].set_grid_orientation
+        self.components["cq_object_inspector"].when_built(
+            self.prepare_actions_inspector
         )
 
         # 连接调试器信号
@@ -490,6 +582,22 @@ class MainWindow(QMainWindow, MainMixin):
         self.components["editor"].sigFilenameChanged.connect(
             self.handle_filename_change
         )
+        self.components["editor"].sigCancelRender.connect(
+            self.components["debugger"].cancel
+        )
+        self.components["debugger"].sigTraceback.connect(
+            self.components["editor"].render_finished
+        )
+
+    def prepare_actions_inspector(self, inspector):
+        """连接CQ对象检查器信号，检查器创建后调用"""
+        inspector.sigDisplayObjects.connect(self.components["viewer"].display_many)
+        inspector.sigRemoveObjects.connect(self.components["viewer"].remove_items)
+        inspector.sigShowPlane.connect(self.components["viewer"].toggle_grid)
+        inspector.sigShowPlane.connect(
+            lambda visible, scale: self.components["viewer"].toggle_grid(visible, scale)
+        )
+        inspector.sigChangePlane.connect(self.components["viewer"].set_grid_orientation)
 
     def prepare_console(self):
         """准备控制台
@@ -499,17 +607,19 @@ class MainWindow(QMainWindow, MainMixin):
         obj_tree = self.components["object_tree"]
 
         # 添加应用程序相关变量
-        console.push_vars({"self": self})
+        console.call("push_vars", {"self": self}, merge=_merge_vars)
 
         # 添加CQ相关变量
-        console.push_vars(
+        console.call(
+            "push_vars",
             {
                 "show": obj_tree.addObject,
                 "show_object": obj_tree.addObject,
                 "rand_color": self.components["debugger"]._rand_color,
                 "cq": cq,
                 "log": Logger(self.name).info,
-            }
+            },
+            merge=_merge_vars,
         )
 
     def fill_dummy(self):
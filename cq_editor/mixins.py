@@ -10,6 +10,9 @@ from operator import add
 from logbook import Logger
 
 from PySide6.QtCore import Slot, QSettings
+from PySide6.QtWidgets import QWidget
+
+from .profiling import STARTUP
 
 
 class MainMixin(object):
@@ -32,6 +35,27 @@ class MainMixin(object):
         if dock:
             self.docks[name] = dock(component)
 
+    def registerLazyComponent(self, name, factory, dock, cls=None):
+        """Register a component built only when its dock is first shown.
+
+        Until then the dock holds a placeholder and the component is stood in
+        for by a LazyComponent.
+        """
+
+        component = LazyComponent(name, factory, cls)
+        self.components[name] = component
+
+        d = self.docks[name] = dock(QWidget())
+        component.when_built(d.setWidget)
+        if cls is None:
+            # the preferences of the component are not known before
+            component.when_built(self.restoreComponentPreferences)
+        d.visibilityChanged.connect(
+            lambda visible: component.instance() if visible else None
+        )
+
+        return component
+
     def saveWindow(self):
 
         self.settings.setValue("geometry", self.saveGeometry())
@@ -69,10 +93,14 @@ class MainMixin(object):
         #     self.preferences.restoreState(general_state, removeChildren=False)
 
         for comp in (c for c in self.components.values() if c.preferences):
-            comp_state = settings.value(comp.name)
-            #if comp_state is not None:
-            if isinstance(comp_state, (bytes, bytearray)):
-                comp.preferences.restoreState(comp_state, removeChildren=False)
+            self.restoreComponentPreferences(comp)
+
+    def restoreComponentPreferences(self, comp):
+
+        comp_state = self.settings.value(comp.name)
+        #if comp_state is not None:
+        if comp.preferences and isinstance(comp_state, (bytes, bytearray)):
+            comp.preferences.restoreState(comp_state, removeChildren=False)
 
     def saveComponentState(self):
 
@@ -125,3 +153,104 @@ class ComponentMixin(object):
 
     def restoreComponentState(self, settings):
         pass
+
+
+class LazyComponent(object):
+    """Stand-in for a component that is expensive to build.
+
+    Attribute access builds the component. Calls made through call() or slot()
+    are deferred instead and replayed once it is built; merge combines the
+    arguments of successive deferred calls of a method, by default the last
+    call wins.
+
+    cls provides the name and the preferences before the component is built,
+    so they are restored and editable from the start. It only needs these two
+    attributes and can be a light stand-in sharing the component's preferences
+    when importing the component itself is expensive.
+    """
+
+    def __init__(self, name, factory, cls=None):
+
+        self.key = name
+        self.cls = cls
+
+        self._factory = factory
+        self._instance = None
+        self._pending = {}
+        self._callbacks = []
+
+    @property
+    def name(self):
+
+        target = self.cls if self._instance is None else self._instance
+
+        return self.key if target is None else target.name
+
+    @property
+    def preferences(self):
+
+        target = self.cls if self._instance is None else self._instance
+
+        return None if target is None else target.preferences
+
+    def built(self):
+
+        return self._instance is not None
+
+    def instance(self):
+
+        if self._instance is None:
+            with STARTUP.stage(self.key):
+                self._instance = self._factory()
+
+            for method, args in self._pending.items():
+                getattr(self._instance, method)(*args)
+            self._pending = {}
+
+            for callback in self._callbacks:
+                callback(self._instance)
+            self._callbacks = []
+
+        return self._instance
+
+    def when_built(self, callback):
+
+        if self._instance is None:
+            self._callbacks.append(callback)
+        else:
+            callback(self._instance)
+
+    def call(self, method, *args, merge=None):
+
+        if self._instance is not None:
+            return getattr(self._instance, method)(*args)
+
+        if merge and method in self._pending:
+            args = merge(self._pending[method], args)
+
+        self._pending[method] = args
+
+    def slot(self, method, merge=None):
+
+        return lambda *args: self.call(method, *args, merge=merge)
+
+    def menuActions(self):
+
+        return self._instance.menuActions() if self._instance else {}
+
+    def toolbarActions(self):
+
+        return self._instance.toolbarActions() if self._instance else []
+
+    def saveComponentState(self, settings):
+
+        if self._instance is not None:
+            self._instance.saveComponentState(settings)
+
+    def restoreComponentState(self, settings):
+
+        self.call("restoreComponentState", settings)
+
+    def __getattr__(self, name):
+
+        return getattr(self.instance(), name)
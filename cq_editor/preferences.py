@@ -80,6 +80,9 @@ class PreferencesWidget(QDialog):
                             "OverUnder",
                         ]
                     )
+                # Fill the script execution backend
+                elif child.name() == "Execution backend":
+                    child.setLimits(["In-process", "Background thread", "Worker pool"])
                 # Fill the light/dark theme in the general settings
                 elif child.name() == "Light/Dark Theme":
                     child.setLimits(["Light", "Dark"])
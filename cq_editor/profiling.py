@@ -0,0 +1,260 @@
+"""Timing of the render pipeline stages, displayed by the profiler pane, and
+of the application start-up.
+
+Stages are recorded only while a run is active, so the instrumentation is a
+pair of perf_counter calls otherwise. Stages may nest, e.g. tessellation is
+part of make_AIS.
+
+This module is imported first thing at start-up and must stay light.
+"""
+
+import builtins
+import cProfile
+import os
+import pstats
+import sys
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+STATS_LIMIT = 500  # rows kept from a cProfile profile
+REPORT_THRESHOLD = 0.005  # s, shorter imports are left out of the report
+REPORT_DEPTH = 3  # levels of nested imports in the report
+
+
+class RunProfile(object):
+    """Stages of a single run as (name, offset, duration) in seconds."""
+
+    def __init__(self, label):
+
+        self.label = label
+        self.started = perf_counter()
+        self.total = 0.0
+        self.stages = []
+        self.stats = []  # (function, ncalls, tottime, cumtime)
+
+    def totals(self):
+
+        rv = {}
+        for name, _, duration in self.stages:
+            rv[name] = rv.get(name, 0.0) + duration
+
+        return rv
+
+
+class Profiler(object):
+
+    def __init__(self):
+
+        self.capture = False  # collect a cProfile profile of the user script
+        self.current = None
+        self.listeners = []
+
+        self._count = 0
+
+    def begin(self, label=None):
+
+        self._count += 1
+        self.current = RunProfile(label or f"Run {self._count}")
+
+    def end(self):
+
+        run, self.current = self.current, None
+
+        if run is None:
+            return
+
+        run.total = perf_counter() - run.started
+
+        for listener in self.listeners:
+            listener(run)
+
+    @contextmanager
+    def stage(self, name):
+
+        run = self.current
+
+        if run is None:
+            yield
+            return
+
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            run.stages.append((name, t0 - run.started, perf_counter() - t0))
+
+    def add(self, name, duration):
+        """Record a stage that ended now, e.g. measured in another process."""
+
+        run = self.current
+
+        if run is not None:
+            offset = max(0.0, perf_counter() - run.started - duration)
+            run.stages.append((name, offset, duration))
+
+    @contextmanager
+    def script(self):
+        """Profile the enclosed code with cProfile if capturing is enabled."""
+
+        run = self.current
+
+        if run is None or not self.capture:
+            yield
+            return
+
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            run.stats = profile_rows(prof)
+
+
+def profile_rows(prof, limit=STATS_LIMIT):
+
+    stats = pstats.Stats(prof).stats
+
+    rows = [
+        (f"{func} ({os.path.basename(fname)}:{lineno})", nc, tt, ct)
+        for (fname, lineno, func), (_, nc, tt, ct, _) in stats.items()
+    ]
+    rows.sort(key=lambda row: row[3], reverse=True)
+
+    return rows[:limit]
+
+
+class _Import(object):
+
+    __slots__ = ("name", "depth", "modules", "duration")
+
+    def __init__(self, name, depth):
+
+        self.name = name
+        self.depth = depth
+        self.modules = ()
+        self.duration = 0.0
+
+
+class ImportTimer(object):
+    """Times the import statements executed by the current thread.
+
+    imports lists the statements that loaded at least one module in execution
+    order, with the names of the new modules and the duration including nested
+    imports. Unless nested is set only the outermost statements are timed.
+    """
+
+    def __init__(self, nested=False):
+
+        self.nested = nested
+        self.imports = []
+
+        self._import = None
+        self._thread = None
+        self._depth = 0
+
+    def __enter__(self):
+
+        self._thread = threading.get_ident()
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+        return self
+
+    def __exit__(self, *args):
+
+        builtins.__import__ = self._import
+
+    def _timed_import(self, name, *args, **kwargs):
+
+        if threading.get_ident() != self._thread or (self._depth and not self.nested):
+            return self._import(name, *args, **kwargs)
+
+        entry = _Import(name, self._depth)
+        index = len(self.imports)
+        self.imports.append(entry)
+
+        # new modules are appended to sys.modules
+        count = len(sys.modules)
+        t0 = perf_counter()
+        self._depth += 1
+        try:
+            return self._import(name, *args, **kwargs)
+        finally:
+            self._depth -= 1
+            entry.duration = perf_counter() - t0
+            new = len(sys.modules) - count
+            if new > 0:
+                entry.modules = list(sys.modules)[-new:]
+            else:
+                # keep statements that imported something only
+                del self.imports[index]
+
+    def cost(self, names):
+        """Time spent in the outermost imports that loaded any of the modules."""
+
+        return sum(
+            el.duration
+            for el in self.imports
+            if el.depth == 0 and not names.isdisjoint(el.modules)
+        )
+
+
+class StartupProfile(object):
+    """Time spent in the imports and the components at start-up."""
+
+    def __init__(self):
+
+        self.run = RunProfile("Startup")
+        self.finished = False
+
+        self._timer = None
+
+    def track_imports(self):
+
+        self._timer = ImportTimer(nested=True).__enter__()
+
+    @contextmanager
+    def stage(self, name):
+
+        if self.finished:
+            yield
+            return
+
+        run = self.run
+        t0 = perf_counter()
+        try:
+            yield
+        finally:
+            run.stages.append((name, t0 - run.started, perf_counter() - t0))
+
+    def finish(self):
+
+        if self._timer:
+            self._timer.__exit__()
+
+        self.run.total = perf_counter() - self.run.started
+        self.finished = True
+
+    def report(self):
+
+        lines = [f"Startup: {1e3 * self.run.total:.1f} ms", "", "Stages:"]
+        lines.extend(
+            f"{1e3 * duration:10.1f} ms  {name}"
+            for name, _, duration in self.run.stages
+        )
+
+        if self._timer:
+            lines.extend(("", "Imports:"))
+            lines.extend(
+                f"{1e3 * el.duration:10.1f} ms  {'  ' * el.depth}{el.name}"
+                for el in self._timer.imports
+                if el.duration >= REPORT_THRESHOLD and el.depth < REPORT_DEPTH
+            )
+
+        return "\n".join(lines)
+
+
+PROFILER = Profiler()
+STARTUP = StartupProfile()
@@ -0,0 +1,155 @@
+"""On-disk cache of render results.
+
+Results are keyed on the script source, the content of the local modules it
+imports and the cadquery version. Every entry is a directory holding one BREP
+file per shown object and an index with the names and options. The BREP files
+include the triangulation of the shapes, which serves as mesh sidecar: cached
+objects are displayed without meshing them again.
+
+Entries are evicted in least recently used order, based on their mtime, once
+the total size exceeds the budget.
+"""
+
+import os
+import pickle
+import shutil
+from hashlib import blake2b
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Optional
+
+import cadquery as cq
+
+from .execution import to_brep, from_brep, imported_module_paths
+
+FORMAT_VERSION = 1
+INDEX = "index.pickle"
+
+
+def script_key(cq_script, cq_script_path=None) -> Optional[str]:
+    """Cache key of a script, None if its imports cannot be determined."""
+
+    try:
+        paths = imported_module_paths(cq_script, cq_script_path)
+    except Exception:
+        return None
+
+    h = blake2b(digest_size=16)
+
+    h.update(f"{FORMAT_VERSION} {cq.__version__}\0".encode())
+    h.update(cq_script.encode("utf-8"))
+
+    for path in paths:
+        h.update(f"\0{path}\0".encode())
+        h.update(Path(path).read_bytes())
+
+    return h.hexdigest()
+
+
+class ResultCache(object):
+
+    def __init__(self, directory, budget=1_000_000_000):
+
+        self.directory = Path(directory)
+        self.budget = budget  # bytes
+
+    def load(self, key):
+        """Cached objects as returned by show_object, None on a miss."""
+
+        entry = self.directory / key
+
+        try:
+            with open(entry / INDEX, "rb") as f:
+                index = pickle.load(f)
+
+            rv = {
+                name: SimpleNamespace(
+                    shape=from_brep((entry / fname).read_bytes()), options=options
+                )
+                for name, fname, options in index
+            }
+        except Exception:
+            return None
+
+        # mark as recently used
+        os.utime(entry)
+
+        return rv
+
+    def __contains__(self, key):
+        """True if a complete entry is stored for key."""
+
+        entry = self.directory / key
+
+        try:
+            with open(entry / INDEX, "rb") as f:
+                index = pickle.load(f)
+        except Exception:
+            return False
+
+        return all((entry / fname).is_file() for _, fname, _ in index)
+
+    def store(self, key, cq_objects):
+        """Store the objects; returns False if they cannot be serialized."""
+
+        entry = self.directory / key
+        tmp = self.directory / f"{key}.tmp"
+
+        try:
+            index = []
+            data = {}
+            for i, (name, obj) in enumerate(cq_objects.items()):
+                data[f"{i}.brep"] = to_brep(obj.shape)
+                index.append((name, f"{i}.brep", dict(obj.options)))
+
+            index_data = pickle.dumps(index)
+        except Exception:
+            # e.g. AIS objects or unpicklable options
+            return False
+
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        for fname, brep in data.items():
+            (tmp / fname).write_bytes(brep)
+        (tmp / INDEX).write_bytes(index_data)
+
+        # entries appear atomically for concurrent editor instances
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp, entry)
+
+        self._evict()
+
+        return True
+
+    def purge(self):
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def size(self):
+
+        return sum(size for _, size in self._entries())
+
+    def _entries(self):
+
+        if not self.directory.is_dir():
+            return []
+
+        rv = []
+        for entry in self.directory.iterdir():
+            if entry.is_dir() and not entry.name.endswith(".tmp"):
+                size = sum(f.stat().st_size for f in entry.iterdir())
+                rv.append((entry, size))
+
+        return rv
+
+    def _evict(self):
+
+        entries = sorted(self._entries(), key=lambda el: el[0].stat().st_mtime)
+        total = sum(size for _, size in entries)
+
+        # always keep the most recent entry
+        while total > self.budget and len(entries) > 1:
+            entry, size = entries.pop(0)
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
@@ -0,0 +1,283 @@
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import blake2b
+from io import BytesIO
+
+from OCC.Core.Bnd import Bnd_Box
+from OCC.Core.BRep import BRep_Tool
+from OCC.Core.BRepBndLib import brepbndlib
+from OCC.Core.BRepBuilderAPI import BRepBuilderAPI_Copy
+from OCC.Core.BRepMesh import BRepMesh_IncrementalMesh
+from OCC.Core.BRepTools import breptools
+from OCC.Core.TopAbs import TopAbs_FACE
+from OCC.Core.TopExp import TopExp_Explorer
+from OCC.Core.TopLoc import TopLoc_Location
+from OCC.Core.TopoDS import topods
+
+from .profiling import PROFILER
+
+DEFAULT_BUDGET = 10_000_000  # triangles
+
+# multiples of the deviation used by the progressive levels, coarse to fine
+LOD_FACTORS = (16.0, 4.0, 1.0)
+MAX_ANGULAR_DEVIATION = 0.5
+MAX_PENDING = 1024
+
+_executor = None
+
+
+def shape_hash(shape) -> str:
+    """Content hash of a cq.Shape based on its BREP serialization.
+
+    Unlike TopoDS_Shape.__hash__ it does not depend on the TShape addresses,
+    so identical geometry built by two different runs hashes identically.
+    The hash is computed on a copy without triangulation, meshing a shape does
+    not change its hash.
+    """
+
+    buf = BytesIO()
+    shape.copy(mesh=False).exportBrep(buf)
+
+    return blake2b(buf.getvalue(), digest_size=16).hexdigest()
+
+
+def absolute_deflection(shape, deviation: float) -> float:
+    """Mirror of Prs3d::GetDeflection used by AIS for relative deviations."""
+
+    box = Bnd_Box()
+    brepbndlib.Add(shape, box)
+
+    if box.IsVoid():
+        return deviation
+
+    xmin, ymin, zmin, xmax, ymax, zmax = box.Get()
+
+    return max(xmax - xmin, ymax - ymin, zmax - zmin) * deviation * 4.0
+
+
+def triangle_count(shape) -> int:
+
+    rv = 0
+    loc = TopLoc_Location()
+
+    exp = TopExp_Explorer(shape, TopAbs_FACE)
+    while exp.More():
+        tri = BRep_Tool.Triangulation(topods.Face(exp.Current()), loc)
+        if tri is not None:
+            rv += tri.NbTriangles()
+        exp.Next()
+
+    return rv
+
+
+def mesh_shape(shape, deviation: float, angular_deviation: float, parallel=False):
+    """Tessellate shape in place with the same tolerances AIS would use."""
+
+    BRepMesh_IncrementalMesh(
+        shape,
+        absolute_deflection(shape, deviation),
+        False,
+        angular_deviation,
+        parallel,
+    )
+
+    return triangle_count(shape)
+
+
+def is_meshed(shape, deviation: float) -> bool:
+    """True if all faces carry a triangulation at least as fine as requested."""
+
+    return breptools.Triangulation(shape, absolute_deflection(shape, deviation))
+
+
+def bounding_size(shape) -> float:
+
+    box = Bnd_Box()
+    brepbndlib.Add(shape, box)
+
+    if box.IsVoid():
+        return 0.0
+
+    return box.CornerMin().Distance(box.CornerMax())
+
+
+def lod_tolerances(level: int, deviation: float, angular_deviation: float):
+    """Deviation and angular deviation of a progressive level."""
+
+    f = LOD_FACTORS[level]
+
+    return deviation * f, min(angular_deviation * f, MAX_ANGULAR_DEVIATION)
+
+
+def lod_level(size: float, view_size: float) -> int:
+    """Finest level worth computing for an object of the given on-screen size.
+
+    Both sizes are in model units, view_size being the extent of the view at
+    the distance of the object.
+    """
+
+    fraction = size / view_size if view_size > 0 else 1.0
+
+    if fraction < 0.05:
+        return 0
+    elif fraction < 0.25:
+        return 1
+
+    return len(LOD_FACTORS) - 1
+
+
+def copy_geometry(shape):
+    """Copy of shape without triangulation that can be meshed independently."""
+
+    return BRepBuilderAPI_Copy(shape, True, False).Shape()
+
+
+def executor() -> ThreadPoolExecutor:
+    """Thread pool used for background tessellation."""
+
+    global _executor
+
+    if _executor is None:
+        configure_executor()
+
+    return _executor
+
+
+def configure_executor(threads=0):
+    """(Re)create the tessellation thread pool, 0 meaning one thread per core."""
+
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+
+    _executor = ThreadPoolExecutor(
+        max_workers=threads or os.cpu_count() or 1, thread_name_prefix="tessellation"
+    )
+
+
+class TessellationCache(object):
+    """LRU cache of meshed TopoDS_Shapes keyed on geometry and tolerances.
+
+    The triangulation is stored on the TopoDS_Shape itself, so handing a cached
+    shape to a new AIS_Shape skips BRepMesh entirely. Entries are evicted in
+    least recently used order once the total triangle count exceeds the budget.
+    """
+
+    def __init__(self, budget=DEFAULT_BUDGET):
+
+        self.enabled = True
+        self.progressive = False
+        self.background = False
+        self.budget = budget
+        self.deviation = 1e-5
+        self.angular_deviation = 0.1
+
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._triangles = 0
+
+        # keys of shapes handed out unmeshed in progressive mode
+        self._pending = OrderedDict()
+
+    def configure(
+        self,
+        enabled,
+        budget,
+        deviation,
+        angular_deviation,
+        progressive=False,
+        background=False,
+    ):
+
+        self.enabled = enabled
+        self.progressive = progressive
+        self.background = background
+        self.budget = budget
+        self.deviation = deviation
+        self.angular_deviation = angular_deviation
+
+        if not enabled:
+            self.clear()
+        else:
+            self._evict()
+
+    def key(self, shape):
+
+        return (shape_hash(shape), self.deviation, self.angular_deviation)
+
+    def get(self, shape, base_shape, mesh=True):
+        """Return a meshed TopoDS_Shape equivalent to base_shape.
+
+        shape is the cq.Shape wrapping base_shape and is only used for hashing.
+        With mesh=False a miss returns base_shape unmeshed; the caller is
+        expected to mesh it and to hand it back with finish.
+        """
+
+        if not self.enabled:
+            return base_shape
+
+        key = self.key(shape)
+
+        if key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+        self.misses += 1
+
+        # the viewer shows a coarse mesh first and caches the refined one
+        if self.progressive or not mesh:
+            self._pending[base_shape] = key
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)
+        else:
+            with PROFILER.stage("tessellation"):
+                self.put(key, base_shape, mesh_shape(base_shape, *key[1:]))
+
+        return base_shape
+
+    def put(self, key, base_shape, ntriangles):
+
+        if key in self._entries:
+            self._triangles -= self._entries.pop(key)[1]
+
+        self._entries[key] = (base_shape, ntriangles)
+        self._triangles += ntriangles
+
+        self._evict()
+
+    def finish(self, base_shape, meshed_shape, ntriangles):
+        """Cache the full quality mesh of a shape handed out unmeshed by get."""
+
+        key = self._pending.pop(base_shape, None)
+
+        if self.enabled and key is not None:
+            self.put(key, meshed_shape, ntriangles)
+
+    def stats(self):
+
+        return self.hits, self.misses
+
+    def clear(self):
+
+        self._entries.clear()
+        self._pending.clear()
+        self._triangles = 0
+
+    def _evict(self):
+
+        # always keep the most recent entry, even if it alone exceeds the budget
+        while self._triangles > self.budget and len(self._entries) > 1:
+            _, (_, ntriangles) = self._entries.popitem(last=False)
+            self._triangles -= ntriangles
+
+    def __len__(self):
+
+        return len(self._entries)
+
+
+TESSELLATION_CACHE = TessellationCache()
@@ -1,3 +1,4 @@
+import re
 import requests
 
 from pkg_resources import parse_version
@@ -161,3 +162,9 @@ def confirm(parent, title, msg):
     rv = QMessageBox.question(parent, title, msg, QMessageBox.Yes, QMessageBox.No)
 
     return True if rv == QMessageBox.Yes else False
+
+
+def safe_name(name):
+    """Name usable as part of a file name"""
+
+    return re.sub(r"[^\w.-]+", "_", str(name))
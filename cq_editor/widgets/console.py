@@ -1,12 +1,16 @@
 # 控制台组件
+import os
+import pickle
+from tempfile import mkstemp
+
 from PySide6.QtWidgets import QApplication  # 应用程序和动作
-from PySide6.QtCore import Slot  # 信号和槽机制
+from PySide6.QtCore import Slot, QEvent  # 信号和槽机制
 from PySide6.QtGui import QAction
 
 from qtconsole.rich_jupyter_widget import RichJupyterWidget  # Jupyter小部件
-from qtconsole.inprocess import QtInProcessKernelManager  # 内核管理器
 
 from ..mixins import ComponentMixin  # 组件混合
+from .console_preferences import ConsolePreferences  # 控制台首选项
 
 from ..icons import icon  # 图标
 
@@ -17,14 +21,34 @@ logging.getLogger('jupyter_client').setLevel(logging.ERROR)
 logging.getLogger('qtconsole').setLevel(logging.ERROR)
 logging.getLogger('asyncio').setLevel(logging.ERROR)
 
+# 在进程外的内核中读取推送的变量并删除临时文件
+PUSH_SOURCE = """\
+def __push(path):
+    import os, pickle
+    with open(path, "rb") as f:
+        while True:
+            try:
+                name, value = pickle.load(f)
+            except EOFError:
+                break
+            globals()[name] = value
+    os.remove(path)
+__push({path!r})
+del __push
+"""
+
 
 class ConsoleWidget(RichJupyterWidget, ComponentMixin):  
 
-    name = "Console"
+    name = ConsolePreferences.name
+
+    # 与面板构建前注册的首选项是同一个对象
+    preferences = ConsolePreferences.preferences
 
     def __init__(self, customBanner=None, namespace=dict(), *args, **kwargs):
         # 调用父类的构造函数，传递剩余的位置参数和关键字参数
         super(ConsoleWidget, self).__init__(*args, **kwargs)
+        ComponentMixin.__init__(self)
 
         # 定义控制台的操作列表，这里包含一个清除控制台的操作
         self._actions = {
@@ -65,49 +89,155 @@ class ConsoleWidget(RichJupyterWidget, ComponentMixin):
         # 设置控制台的语法高亮样式
         self.syntax_style = "zenburn"
 
-        # 创建一个 Qt 进程内的内核管理器实例，那么和editor区域有什么区别
-        self.kernel_manager = kernel_manager = QtInProcessKernelManager()
-        # 启动内核，并且不显示默认的欢迎信息
-        kernel_manager.start_kernel(show_banner=False)
+        # 内核在第一次获得焦点或执行命令时才启动，避免在启动时导入IPython
+        self.kernel_manager = None
+        self.kernel_client = None
+        self._out_of_process = False
+        # 内核（重新）启动时推送的变量
+        self._namespace = {}
+        # 推送到进程内内核的变量名，其值只由内核持有
+        self._pushed = set()
+
+        # 当控制台发出退出请求信号时，调用 stop 函数
+        self.exit_requested.connect(self._exit)
+
+        # 清除控制台的内容
+        self.clear()
 
+        # 将命名空间中的变量推送到 Jupyter 控制台
+        self.push_vars(namespace)
 
-        # 设置内核的 GUI 类型为 Qt
-        kernel_manager.kernel.gui = "qt"
-        # 设置内核 shell 的 banner 为空字符串
-        kernel_manager.kernel.shell.banner1 = ""
+    def updatePreferences(self, *args):
+
+        # 切换内核类型，新的内核在下次使用时启动
+        if self.kernel_started() and (
+            self._out_of_process != self.preferences["Out-of-process kernel"]
+        ):
+            self.shutdown_kernel()
+
+    def kernel_started(self):
+
+        return self.kernel_manager is not None
+
+    def start_kernel(self):
+        """启动内核并推送排队的变量"""
+
+        if self.kernel_started():
+            return
+
+        self._out_of_process = self.preferences["Out-of-process kernel"]
+
+        if self._out_of_process:
+            from qtconsole.manager import QtKernelManager
+
+            kernel_manager = QtKernelManager(kernel_name="python3")
+            kernel_manager.start_kernel()
+            self._logger.info(
+                "Started an out-of-process kernel, show_object is not available"
+            )
+        else:
+            from qtconsole.inprocess import QtInProcessKernelManager
+
+            # 创建一个 Qt 进程内的内核管理器实例，那么和editor区域有什么区别
+            kernel_manager = QtInProcessKernelManager()
+            # 启动内核，并且不显示默认的欢迎信息
+            kernel_manager.start_kernel(show_banner=False)
+
+            # 设置内核的 GUI 类型为 Qt
+            kernel_manager.kernel.gui = "qt"
+            # 设置内核 shell 的 banner 为空字符串
+            kernel_manager.kernel.shell.banner1 = ""
+
+        self.kernel_manager = kernel_manager
 
         # 创建内核客户端实例
-        self.kernel_client = kernel_client = self._kernel_manager.client()
+        self.kernel_client = kernel_client = kernel_manager.client()
         # 启动内核客户端的通道
         kernel_client.start_channels()
 
-        def stop():
+        namespace, self._namespace = self._namespace, {}
+        self._push(namespace)
+
+    def shutdown_kernel(self):
+
+        if self.kernel_started():
+            if not self._out_of_process:
+                # 取回变量的当前值，用户重新绑定或删除的名称不再保留旧值
+                user_ns = self.kernel_manager.kernel.shell.user_ns
+                self._namespace.update(
+                    {name: user_ns[name] for name in self._pushed if name in user_ns}
+                )
             # 停止内核客户端的通道
-            kernel_client.stop_channels()
+            self.kernel_client.stop_channels()
             # 关闭内核管理器的内核
-            kernel_manager.shutdown_kernel()
-            # 退出当前的 Qt 应用程序
-            QApplication.instance().exit()
+            self.kernel_manager.shutdown_kernel()
 
-        # 当控制台发出退出请求信号时，调用 stop 函数
-        self.exit_requested.connect(stop)
+        self.kernel_manager = None
+        self.kernel_client = None
+        self._pushed = set()
 
-        # 清除控制台的内容
-        self.clear()
+    def _exit(self):
 
-        # 将命名空间中的变量推送到 Jupyter 控制台
-        self.push_vars(namespace)
+        self.shutdown_kernel()
+        # 退出当前的 Qt 应用程序
+        QApplication.instance().exit()
 
     @Slot(dict)
     def push_vars(self, variableDict):
         """
         给定一个包含名称 / 值对的字典，将这些变量推送到 Jupyter 控制台小部件中。
+        内核启动前变量只是排队。
 
         Args:
             variableDict (dict): 包含要推送到 Jupyter 控制台的变量名称和对应值的字典。
         """
-        # 调用内核 shell 的 push 方法，将变量字典中的变量推送到 Jupyter 控制台
-        self.kernel_manager.kernel.shell.push(variableDict)
+        if self.kernel_started():
+            self._push(variableDict)
+        else:
+            self._namespace.update(variableDict)
+
+    def _push(self, variableDict):
+
+        if not self._out_of_process:
+            # 调用内核 shell 的 push 方法，将变量字典中的变量推送到 Jupyter 控制台
+            self.kernel_manager.kernel.shell.push(variableDict)
+            self._pushed.update(variableDict)
+            return
+
+        # 进程外内核中的变量无法取回，保留它们以便重启时推送
+        self._namespace.update(variableDict)
+
+        # 进程外的内核只能接收可以pickle的变量，每个变量只pickle一次，
+        # 通过临时文件传递，而不是嵌入到执行的代码中
+        fd, path = mkstemp(suffix=".pickle")
+        pushed = False
+
+        with os.fdopen(fd, "wb") as f:
+            for name, value in variableDict.items():
+                try:
+                    data = pickle.dumps((name, value))
+                except Exception:
+                    continue
+                f.write(data)
+                pushed = True
+
+        if pushed:
+            self.kernel_client.execute(PUSH_SOURCE.format(path=path), silent=True)
+        else:
+            os.remove(path)
+
+    def eventFilter(self, obj, event):
+
+        if event.type() == QEvent.FocusIn and obj is self._control:
+            self.start_kernel()
+
+        return super(ConsoleWidget, self).eventFilter(obj, event)
+
+    def _execute(self, source, hidden):
+
+        self.start_kernel()
+
+        return super(ConsoleWidget, self)._execute(source, hidden)
 
     def clear(self):  # 清除控制台
         """
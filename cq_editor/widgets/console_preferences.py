@@ -0,0 +1,21 @@
+# 控制台的名称和首选项，导入时不需要加载qtconsole
+from pyqtgraph.parametertree import Parameter
+
+
+class ConsolePreferences(object):
+    """Name and preferences of the console, known before it is built."""
+
+    name = "Console"
+
+    preferences = Parameter.create(
+        name="Preferences",
+        children=[
+            {
+                "name": "Out-of-process kernel",
+                "type": "bool",
+                "value": False,
+                "tip": "Long computations do not block the GUI, but only picklable "
+                "variables are available and show_object is not",
+            },
+        ],
+    )
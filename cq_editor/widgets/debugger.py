@@ -1,11 +1,11 @@
 # 调试器组件
+import os
 import sys
-from contextlib import ExitStack, contextmanager
+import threading
 from enum import Enum, auto
-from types import SimpleNamespace, FrameType, ModuleType
+from types import SimpleNamespace, FrameType
 from typing import List
 from bdb import BdbQuit
-from inspect import currentframe
 
 import cadquery as cq
 from PySide6 import QtCore
@@ -16,20 +16,47 @@ from PySide6.QtCore import (
     Signal,
     QEventLoop,
     QAbstractTableModel,
+    QTimer,
+    QStandardPaths,
 )
 from PySide6.QtWidgets import QTableView
 from PySide6.QtGui import QAction
 
-from logbook import info
+from logbook import info, warning
 from pathlib import Path
 from pyqtgraph.parametertree import Parameter
-from spyder.utils.icon_manager import icon
-from random import randrange as rrr, seed
-
-from ..cq_utils import find_cq_objects, reload_cq
+from random import seed
+import qtawesome as qta
+
+from ..cq_utils import find_cq_objects, reload_cq, CQ_RELOADER
+from ..execution import (
+    DUMMY_FILE,
+    RANDOM_SEED,
+    RemoteError,
+    RemoteValue,
+    compile_script,
+    inject_locals,
+    cleanup_locals,
+    script_context,
+    render_remote,
+    rand_color,
+    from_brep,
+    module_manager,
+    IncrementalExecutor,
+    MEMO,
+    ScriptCancelled,
+    interrupt_thread,
+    preview,
+)
+from ..icons import icon
 from ..mixins import ComponentMixin
+from ..profiling import PROFILER
+from ..result_cache import ResultCache, script_key
+from ..workers import WorkerPool
 
-DUMMY_FILE = "<cq_editor-string>"
+EXECUTION_BACKENDS = ["In-process", "Background thread", "Worker pool"]
+STREAM_INTERVAL = 100  # ms, streamed objects are displayed in batches
+THREAD_WAIT_INTERVAL = 50  # ms, polling of a cancelled thread still running
 
 
 class DbgState(Enum):
@@ -54,15 +81,30 @@ class LocalsModel(QAbstractTableModel):
     def __init__(self, parent):
 
         super(LocalsModel, self).__init__(parent)
-        self.frame = None
+        self.frame = None  # (name, value) pairs
+        self._text = {}  # row -> (type name, preview), filled on demand
 
     def update_frame(self, frame):
+        """Update in place; values are only formatted once displayed."""
+
+        rows = [(k, v) for k, v in frame.items() if not k.startswith("_")]
+        old = self.frame or []
+
+        if [k for k, _ in rows] != [k for k, _ in old]:
+            self.beginResetModel()
+            self.frame = rows
+            self._text = {}
+            self.endResetModel()
+            return
+
+        self.frame = rows
+        changed = [i for i, ((_, v), (_, w)) in enumerate(zip(rows, old)) if v is not w]
 
-        self.frame = [
-            (k, type(v).__name__, str(v))
-            for k, v in frame.items()
-            if not k.startswith("_")
-        ]
+        for i in changed:
+            self._text.pop(i, None)
+
+        if changed:
+            self.dataChanged.emit(self.index(changed[0], 1), self.index(changed[-1], 2))
 
     def rowCount(self, parent=QtCore.QModelIndex()):
 
@@ -84,7 +126,19 @@ class LocalsModel(QAbstractTableModel):
         if role == QtCore.Qt.DisplayRole:
             i = index.row()
             j = index.column()
-            return self.frame[i][j]
+            name, value = self.frame[i]
+
+            if j == 0:
+                return name
+
+            if i not in self._text:
+                if isinstance(value, RemoteValue):
+                    type_name = value.type_name
+                else:
+                    type_name = type(value).__name__
+                self._text[i] = (type_name, preview(value))
+
+            return self._text[i][j - 1]
         else:
             # return QtCore.QVariant()
             return None
@@ -105,13 +159,12 @@ class LocalsView(QTableView, ComponentMixin):
         vheader = self.verticalHeader()
         vheader.setVisible(False)
 
+        self.setModel(LocalsModel(self))
+
     @Slot(dict)
     def update_frame(self, frame):
 
-        model = LocalsModel(self)
-        model.update_frame(frame)
-
-        self.setModel(model)
+        self.model().update_frame(frame)
 
 
 class Debugger(QObject, ComponentMixin):
@@ -122,14 +175,66 @@ class Debugger(QObject, ComponentMixin):
         name="Preferences",
         children=[
             {"name": "Reload CQ", "type": "bool", "value": False},
+            {
+                "name": "Reload CQ: plugin packages",
+                "type": "str",
+                "value": "",
+                "tip": "Comma separated packages reloaded along with cadquery",
+            },
             {"name": "Add script dir to path", "type": "bool", "value": True},
             {"name": "Change working dir to script dir", "type": "bool", "value": True},
             {"name": "Reload imported modules", "type": "bool", "value": True},
+            {
+                "name": "Reload all imported modules",
+                "type": "bool",
+                "value": False,
+                "tip": "Otherwise modules outside of the script directory and "
+                "the project roots stay loaded until their source changes",
+            },
+            {
+                "name": "Project roots",
+                "type": "str",
+                "value": "",
+                "tip": f"Directories with modules reloaded on every run, "
+                f"separated by '{os.pathsep}'",
+            },
+            {
+                "name": "Execution backend",
+                "type": "list",
+                "value": "In-process",
+                "values": EXECUTION_BACKENDS,
+            },
+            {
+                "name": "Stream shown objects",
+                "type": "bool",
+                "value": False,
+                "tip": "Display objects as soon as show_object is called, "
+                "with the background thread backend",
+            },
+            {"name": "Worker pool size", "type": "int", "value": 2, "limits": (1, 64)},
+            {"name": "Worker timeout (s)", "type": "int", "value": 0},
+            {"name": "Incremental execution", "type": "bool", "value": False},
+            {
+                "name": "Script cache size (MB)",
+                "type": "int",
+                "value": 512,
+                "limits": (0, 1_000_000),
+                "tip": "Memory used by the cache decorator available in scripts",
+            },
+            {"name": "Result cache", "type": "bool", "value": False},
+            {
+                "name": "Result cache size (MB)",
+                "type": "int",
+                "value": 1000,
+                "limits": (1, 1_000_000),
+            },
         ],
     )
 
     sigRendered = Signal(dict)
+    sigStreamed = Signal(dict, bool, bool)  # objects, first, last
     sigLocals = Signal(dict)
+    sigLocalsModified = Signal(dict)  # only the names bound to a new value
     sigTraceback = Signal(object, str)
 
     sigFrameChanged = Signal(object)
@@ -137,6 +242,8 @@ class Debugger(QObject, ComponentMixin):
     sigLocalsChanged = Signal(dict)
     sigCQChanged = Signal(dict, bool)
     sigDebugging = Signal(bool)
+    sigThreadFinished = Signal(object)
+    sigObjectStreamed = Signal(object, str, object)
 
     _frames: List[FrameType]
     _stop_debugging: bool
@@ -182,12 +289,96 @@ class Debugger(QObject, ComponentMixin):
                     shortcut="ctrl+F12",
                     triggered=lambda: self.debug_cmd(DbgState.CONT),
                 ),
-            ]
+                QAction(
+                    qta.icon("fa5s.stop"),
+                    "Stop",
+                    self,
+                    shortcut="shift+F5",
+                    enabled=False,
+                    triggered=self.cancel,
+                ),
+            ],
+            "Tools": [
+                QAction(
+                    qta.icon("fa5s.trash"),
+                    "Purge result cache",
+                    self,
+                    triggered=self.purge_result_cache,
+                ),
+                QAction(
+                    qta.icon("fa5s.eraser"),
+                    "Clear script cache",
+                    self,
+                    triggered=self.clear_script_cache,
+                ),
+            ],
         }
 
         self._frames = []
         self._stop_debugging = False
 
+        self._pool = None
+        self._job = None
+        self._job_script = None
+
+        self._job_timer = QTimer(self, interval=20)
+        self._job_timer.timeout.connect(self._poll_job)
+
+        self._incremental = IncrementalExecutor()
+        self._incremental_path = None
+
+        self._result_cache = ResultCache(
+            Path(QStandardPaths.writableLocation(QStandardPaths.CacheLocation))
+            / "results"
+        )
+        self._job_key = None
+
+        self._thread_run = None
+        self._stopping_thread = None  # cancelled, but possibly still running
+        self._waiting_render = None  # arguments of a render waiting for it
+        self._last_locals = {}
+        self.sigThreadFinished.connect(self._thread_finished)
+        self.sigObjectStreamed.connect(self._object_streamed)
+
+        self._stream_timer = QTimer(self, singleShot=True, interval=STREAM_INTERVAL)
+        self._stream_timer.timeout.connect(self._flush_stream)
+
+        self._thread_wait_timer = QTimer(
+            self, singleShot=True, interval=THREAD_WAIT_INTERVAL
+        )
+        self._thread_wait_timer.timeout.connect(self._start_waiting_render)
+
+        self.updatePreferences()
+
+    def updatePreferences(self, *args):
+
+        use_pool = self.preferences["Execution backend"] == "Worker pool"
+        size = self.preferences["Worker pool size"]
+
+        if self._pool and (not use_pool or self._pool.size != size):
+            self.cancel()
+            self._pool.shutdown()
+            self._pool = None
+
+        # start the workers right away so that they are warm for the first render
+        if use_pool and self._pool is None:
+            self._pool = WorkerPool(size)
+            self._pool.start()
+
+        self._result_cache.budget = self.preferences["Result cache size (MB)"] * 2**20
+        MEMO.configure(self.preferences["Script cache size (MB)"] * 2**20)
+        CQ_RELOADER.configure(self._reload_packages())
+
+    def _reload_packages(self):
+
+        packages = self.preferences["Reload CQ: plugin packages"].split(",")
+
+        return [p.strip() for p in packages if p.strip()]
+
+    def toolbarActions(self):
+
+        return self._actions["Run"]
+
     def get_current_script(self):
 
         return self.parent().components["editor"].get_text_with_eol()
@@ -205,122 +396,463 @@ class Debugger(QObject, ComponentMixin):
     def compile_code(self, cq_script, cq_script_path=None):
 
         try:
-            module = ModuleType("__cq_main__")
-            if cq_script_path:
-                module.__dict__["__file__"] = cq_script_path
-            cq_code = compile(cq_script, DUMMY_FILE, "exec")
-            return cq_code, module
+            with PROFILER.stage("compile_code"):
+                return compile_script(cq_script, cq_script_path)
         except Exception:
             self.sigTraceback.emit(sys.exc_info(), cq_script)
             return None, None
 
-    def _exec(self, code, locals_dict, globals_dict):
+    def _script_options(self):
 
-        with ExitStack() as stack:
-            p = (self.get_current_script_path() or Path("")).absolute().parent
-
-            if self.preferences["Add script dir to path"] and p.exists():
-                sys.path.insert(0, p)
-                stack.callback(sys.path.remove, p)
-            if self.preferences["Change working dir to script dir"] and p.exists():
-                stack.enter_context(p)
-            if self.preferences["Reload imported modules"]:
-                stack.enter_context(module_manager())
-
-            exec(code, locals_dict, globals_dict)
-
-    @staticmethod
-    def _rand_color(alpha=0.0, cfloat=False):
-        # helper function to generate a random color dict
-        # for CQ-editor's show_object function
-        lower = 10
-        upper = 100  # not too high to keep color brightness in check
-        if cfloat:  # for two output types depending on need
-            return (
-                (rrr(lower, upper) / 255),
-                (rrr(lower, upper) / 255),
-                (rrr(lower, upper) / 255),
-                alpha,
-            )
-        return {
-            "alpha": alpha,
-            "color": (
-                rrr(lower, upper),
-                rrr(lower, upper),
-                rrr(lower, upper),
-            ),
-        }
+        return dict(
+            add_to_path=self.preferences["Add script dir to path"],
+            change_dir=self.preferences["Change working dir to script dir"],
+            reload_modules=self.preferences["Reload imported modules"],
+            reload_all=self.preferences["Reload all imported modules"],
+            project_roots=self.preferences["Project roots"].split(os.pathsep),
+        )
 
-    def _inject_locals(self, module):
+    def _exec(self, code, locals_dict, globals_dict):
 
-        cq_objects = {}
+        with script_context(self.get_current_script_path(), **self._script_options()):
+            with PROFILER.stage("_exec"), PROFILER.script():
+                exec(code, locals_dict, globals_dict)
 
-        def _show_object(obj, name=None, options={}):
+    def _exec_incremental(self, cq_script, module, cq_objects):
 
-            if name:
-                cq_objects.update({name: SimpleNamespace(shape=obj, options=options)})
-            else:
-                # get locals of the enclosing scope
-                d = currentframe().f_back.f_locals
+        cq_script_path = self.get_current_script_path()
 
-                # try to find the name
-                try:
-                    name = list(d.keys())[list(d.values()).index(obj)]
-                except ValueError:
-                    # use id if not found
-                    name = str(id(obj))
+        # cached values are only valid for the same script
+        if cq_script_path != self._incremental_path:
+            self._incremental.clear()
+            self._incremental_path = cq_script_path
 
-                cq_objects.update({name: SimpleNamespace(shape=obj, options=options)})
+        with script_context(cq_script_path, **self._script_options()):
+            with PROFILER.stage("_exec"), PROFILER.script():
+                self._incremental.run(cq_script, module, cq_objects)
 
-        def _debug(obj, name=None):
+        info(
+            f"Incremental execution: {self._incremental.executed} statements "
+            f"executed, {self._incremental.reused} reused"
+        )
 
-            _show_object(obj, name, options=dict(color="red", alpha=0.2))
+    _rand_color = staticmethod(rand_color)
 
-        module.__dict__["show_object"] = _show_object
-        module.__dict__["debug"] = _debug
-        module.__dict__["rand_color"] = self._rand_color
-        module.__dict__["log"] = lambda x: info(str(x))
-        module.__dict__["cq"] = cq
+    def _inject_locals(self, module, on_show=None):
 
-        return cq_objects, set(module.__dict__) - {"cq"}
+        return inject_locals(module, on_show)
 
     def _cleanup_locals(self, module, injected_names):
 
-        for name in injected_names:
-            module.__dict__.pop(name)
+        cleanup_locals(module, injected_names)
+
+    def is_running(self):
+
+        return (
+            self._job is not None
+            or self._thread_run is not None
+            or self._waiting_render is not None
+        )
+
+    @Slot()
+    def cancel(self):
+
+        if self._job:
+            self._job.cancel()
+            self._finish_job()
+            PROFILER.end()
+            info("Render cancelled")
+        elif self._cancel_thread():
+            PROFILER.end()
+            info("Render cancelled")
+        elif self._waiting_render:
+            self._waiting_render = None
+            self._thread_wait_timer.stop()
+            self._actions["Run"][-1].setEnabled(False)
+            info("Render cancelled")
+
+    def _render_in_worker(self, cq_script, cq_script_path, key=None):
+
+        # a newer render supersedes the one in flight
+        if self._job:
+            self._job.cancel()
+
+        self._job = self._pool.submit(
+            render_remote,
+            cq_script,
+            str(cq_script_path) if cq_script_path else None,
+            reload_cadquery=self.preferences["Reload CQ"],
+            reload_packages=self._reload_packages(),
+            memo_budget=MEMO.budget,
+            **self._script_options(),
+        )
+        self._job_script = cq_script
+        self._job_key = key
+
+        self._actions["Run"][-1].setEnabled(True)
+        self._job_timer.start()
+
+    @Slot()
+    def _poll_job(self):
+
+        job = self._job
+        timeout = self.preferences["Worker timeout (s)"]
+
+        if job.done():
+            self._finish_job()
+            PROFILER.add("worker", job.elapsed())
+            try:
+                shapes, variables, error = job.result()
+            except RemoteError as e:
+                shapes, variables, error = {}, {}, e
+        elif timeout and job.elapsed() > timeout:
+            job.cancel()
+            self._finish_job()
+            shapes, variables = {}, {}
+            error = RemoteError("TimeoutError", f"Script exceeded {timeout} s")
+        else:
+            return
+
+        try:
+            self._show_remote(shapes, variables, error)
+        finally:
+            PROFILER.end()
+
+    def _show_remote(self, shapes, variables, error):
+
+        if error:
+            self.sigTraceback.emit((RemoteError, error, None), self._job_script)
+            return
+
+        with PROFILER.stage("from_brep"):
+            cq_objects = {
+                name: SimpleNamespace(shape=from_brep(data), options=options)
+                for name, (data, options) in shapes.items()
+            }
+
+        self.sigRendered.emit(cq_objects)
+        self.sigTraceback.emit(None, self._job_script)
+        self._emit_locals(variables)
+
+        self._store_result(self._job_key, cq_objects)
+
+    def _finish_job(self):
+
+        self._job = None
+        self._job_timer.stop()
+        self._actions["Run"][-1].setEnabled(False)
 
     @Slot(bool)
     def render(self):
 
-        seed(59798267586177)
-        if self.preferences["Reload CQ"]:
-            reload_cq()
-
         cq_script = self.get_current_script()
         cq_script_path = self.get_current_script_path()
+
+        key = None
+
+        if self.preferences["Result cache"]:
+            key = script_key(cq_script, cq_script_path)
+            cached = self._result_cache.load(key) if key else None
+
+            if cached is not None:
+                background = self.preferences["Execution backend"] != "In-process"
+
+                info(
+                    "Showing cached results, revalidating"
+                    if background
+                    else "Showing cached results"
+                )
+                self.sigRendered.emit(cached)
+                self.sigTraceback.emit(None, cq_script)
+
+                # revalidate once the cached objects are on screen, unless that
+                # would block the GUI for the full render time
+                if background:
+                    QTimer.singleShot(
+                        0, lambda: self._run(cq_script, cq_script_path, key)
+                    )
+                return
+
+        self._run(cq_script, cq_script_path, key)
+
+    def _run(self, cq_script, cq_script_path, key=None):
+
+        if not self._pool:
+            # a newer render supersedes the one in flight, but it only starts
+            # once that thread is gone: runs share the incremental executor,
+            # the profiler, sys.path, sys.modules and the import hook
+            self._cancel_thread()
+
+            if self._stopping_thread and self._stopping_thread.is_alive():
+                if self._waiting_render is None:
+                    info("Waiting for the previous render to stop")
+                self._waiting_render = (cq_script, cq_script_path, key)
+                self._actions["Run"][-1].setEnabled(True)
+                self._thread_wait_timer.start()
+                return
+
+            self._stopping_thread = None
+
+        PROFILER.begin()
+
+        if self._pool:
+            self._render_in_worker(cq_script, cq_script_path, key)
+            return
+        elif self.preferences["Execution backend"] == "Background thread":
+            self._render_in_thread(cq_script, cq_script_path, key)
+            return
+
+        try:
+            self._render(cq_script, cq_script_path, key)
+        finally:
+            PROFILER.end()
+
+    def _store_result(self, key, cq_objects):
+
+        # the key covers the script and its imports, a stored entry is still valid
+        if not key or key in self._result_cache:
+            return
+
+        if not self._result_cache.store(key, cq_objects):
+            info("Results cannot be cached")
+
+    @Slot()
+    def purge_result_cache(self):
+
+        self._result_cache.purge()
+        info("Result cache purged")
+
+    @Slot()
+    def clear_script_cache(self):
+
+        MEMO.clear()
+
+        # worker processes hold their own cache
+        if self._pool:
+            self.cancel()
+            self._pool.shutdown()
+            self._pool.start()
+
+        info("Script cache cleared")
+
+    def _prepare(self, cq_script, cq_script_path, key=None):
+
+        seed(RANDOM_SEED)
+        if self.preferences["Reload CQ"]:
+            with PROFILER.stage("reload_cq"):
+                reloaded = reload_cq()
+            if reloaded:
+                info(f"Reloaded {len(reloaded)} modules: {', '.join(reloaded)}")
+                # objects created by the previous cadquery modules are stale
+                self._incremental.clear()
+                MEMO.clear()
+
         cq_code, module = self.compile_code(cq_script, cq_script_path)
 
         if cq_code is None:
-            return
+            return None
 
-        cq_objects, injected_names = self._inject_locals(module)
+        run = SimpleNamespace(
+            cq_script=cq_script,
+            cq_code=cq_code,
+            module=module,
+            key=key,
+            shown=None,
+            pending={},
+        )
 
-        try:
-            self._exec(cq_code, module.__dict__, module.__dict__)
+        on_show = None
+        if self._streaming():
+            run.shown = {}
+            # called on the script thread, queued to the GUI thread
+            on_show = lambda name, obj: self.sigObjectStreamed.emit(run, name, obj)
+
+        run.cq_objects, run.injected_names = self._inject_locals(module, on_show)
+
+        return run
+
+    def _streaming(self):
 
-            # remove the special methods
-            self._cleanup_locals(module, injected_names)
+        return (
+            self.preferences["Stream shown objects"]
+            and self.preferences["Execution backend"] == "Background thread"
+        )
 
-            # collect all CQ objects if no explicit show_object was called
-            if len(cq_objects) == 0:
+    def _execute(self, run):
+
+        if self.preferences["Incremental execution"]:
+            self._exec_incremental(run.cq_script, run.module, run.cq_objects)
+        else:
+            self._exec(run.cq_code, run.module.__dict__, run.module.__dict__)
+
+    def _show_results(self, run):
+
+        module = run.module
+        cq_objects = run.cq_objects
+
+        # remove the special methods
+        self._cleanup_locals(module, run.injected_names)
+
+        # collect all CQ objects if no explicit show_object was called
+        if len(cq_objects) == 0:
+            with PROFILER.stage("find_cq_objects"):
                 cq_objects = find_cq_objects(module.__dict__)
+
+        if run.shown is None:
             self.sigRendered.emit(cq_objects)
-            self.sigTraceback.emit(None, cq_script)
-            self.sigLocals.emit(module.__dict__)
+        else:
+            self._finish_stream(run, cq_objects)
+        self.sigTraceback.emit(None, run.cq_script)
+        self._emit_locals(module.__dict__)
+
+        # stored after displaying so that the triangulation is included
+        self._store_result(run.key, cq_objects)
+
+    def _emit_locals(self, namespace):
+
+        self.sigLocals.emit(namespace)
+
+        last = self._last_locals
+        modified = {
+            k: v for k, v in namespace.items() if k not in last or last[k] is not v
+        }
+        self._last_locals = dict(namespace)
+
+        if modified:
+            self.sigLocalsModified.emit(modified)
+
+    def _show_error(self, exc_info, cq_script):
+
+        sys.last_traceback = exc_info[-1]
+        self.sigTraceback.emit(exc_info, cq_script)
+
+    def _render(self, cq_script, cq_script_path, key=None):
+
+        run = self._prepare(cq_script, cq_script_path, key)
+
+        if run is None:
+            return
+
+        try:
+            self._execute(run)
+            self._show_results(run)
         except Exception:
-            exc_info = sys.exc_info()
-            sys.last_traceback = exc_info[-1]
-            self.sigTraceback.emit(exc_info, cq_script)
+            self._show_error(sys.exc_info(), cq_script)
+
+    def _render_in_thread(self, cq_script, cq_script_path, key=None):
+
+        run = self._prepare(cq_script, cq_script_path, key)
+
+        if run is None:
+            PROFILER.end()
+            return
+
+        run.exc_info = None
+        run.thread = threading.Thread(
+            target=self._thread_main, args=(run,), name="cq-script", daemon=True
+        )
+
+        self._thread_run = run
+        self._actions["Run"][-1].setEnabled(True)
+
+        run.thread.start()
+
+    def _thread_main(self, run):
+
+        try:
+            try:
+                self._execute(run)
+            except Exception:
+                run.exc_info = sys.exc_info()
+
+            # queued to the GUI thread
+            self.sigThreadFinished.emit(run)
+        except ScriptCancelled:
+            pass
+
+    @Slot(object, str, object)
+    def _object_streamed(self, run, name, obj):
+
+        # cancelled or superseded
+        if run is not self._thread_run:
+            return
+
+        run.pending[name] = obj
+
+        # objects shown in quick succession are displayed together
+        if not self._stream_timer.isActive():
+            self._stream_timer.start()
+
+    @Slot()
+    def _flush_stream(self):
+
+        run = self._thread_run
+
+        if run is None or not run.pending:
+            return
+
+        first = not run.shown
+        objects, run.pending = run.pending, {}
+        run.shown.update(objects)
+
+        self.sigStreamed.emit(objects, first, False)
+
+    def _finish_stream(self, run, cq_objects):
+        """Display the objects that were not streamed yet and fit the view."""
+
+        self._stream_timer.stop()
+
+        remaining = {
+            name: obj
+            for name, obj in cq_objects.items()
+            if run.shown.get(name) is not obj
+        }
+
+        self.sigStreamed.emit(remaining, not run.shown, True)
+
+    @Slot(object)
+    def _thread_finished(self, run):
+
+        # cancelled or superseded
+        if run is not self._thread_run:
+            return
+
+        self._thread_run = None
+        self._actions["Run"][-1].setEnabled(False)
+
+        try:
+            if run.exc_info:
+                # objects shown before the error stay displayed
+                if run.shown or run.pending:
+                    self._finish_stream(run, run.pending)
+                self._show_error(run.exc_info, run.cq_script)
+            else:
+                self._show_results(run)
+        except Exception:
+            self._show_error(sys.exc_info(), run.cq_script)
+        finally:
+            PROFILER.end()
+
+    @Slot()
+    def _start_waiting_render(self):
+
+        args, self._waiting_render = self._waiting_render, None
+
+        if args:
+            self._run(*args)
+
+    def _cancel_thread(self):
+
+        run, self._thread_run = self._thread_run, None
+
+        if run:
+            if not interrupt_thread(run.thread) and run.thread.is_alive():
+                warning("The render thread could not be interrupted")
+
+            self._stopping_thread = run.thread
+            self._actions["Run"][-1].setEnabled(False)
+
+        return run is not None
 
     @property
     def breakpoints(self):
@@ -371,7 +903,7 @@ class Debugger(QObject, ComponentMixin):
                 self.sigRendered.emit(cq_objects)
 
                 self._cleanup_locals(module, injected_names)
-                self.sigLocals.emit(module.__dict__)
+                self._emit_locals(module.__dict__)
 
                 self._frames = []
                 self.inner_event_loop.exit(0)
@@ -431,16 +963,3 @@ class Debugger(QObject, ComponentMixin):
 
         if self._stop_debugging:
             raise BdbQuit  # stop debugging if requested
-
-
-@contextmanager
-def module_manager():
-    """unloads any modules loaded while the context manager is active"""
-    loaded_modules = set(sys.modules.keys())
-
-    try:
-        yield
-    finally:
-        new_modules = set(sys.modules.keys()) - loaded_modules
-        for module_name in new_modules:
-            del sys.modules[module_name]
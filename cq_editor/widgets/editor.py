@@ -1,17 +1,165 @@
 # 代码编辑器组件
 import os
-from modulefinder import ModuleFinder
-from .simple_code_editor import SimpleCodeEditor
-from PySide6.QtCore import Signal, QFileSystemWatcher, QTimer
+from hashlib import blake2b
+from time import perf_counter
+from .simple_code_editor import SimpleCodeEditor, LARGE_FILE_LINES
+from PySide6.QtCore import QObject, Signal, Slot, QFileSystemWatcher, QTimer
 from PySide6.QtWidgets import QFileDialog, QApplication
 from PySide6.QtGui import QFontDatabase, QTextCursor, QAction
 from pathlib import Path
 import sys
 from pyqtgraph.parametertree import Parameter
 from ..mixins import ComponentMixin
+from ..execution import MODULE_RELOADER
+from ..import_graph import ImportGraph
 from ..utils import get_save_filename, get_open_filename, confirm
 from ..icons import icon
 
+# fraction of the last render time used as delay after a change
+AUTORELOAD_BACKOFF = 0.25
+
+
+def file_hash(path):
+
+    try:
+        with open(path, "rb") as f:
+            return blake2b(f.read(), digest_size=16).digest()
+    except OSError:
+        return None
+
+
+def file_stat(path):
+
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+
+    return (st.st_mtime_ns, st.st_size)
+
+
+class AutoreloadScheduler(QObject):
+    """Turns file change events into rerender requests.
+
+    Events are coalesced until no new one arrived for the current delay, which
+    grows with the duration of the last render. Files whose content hash did
+    not change are ignored. A change arriving while a render is in flight
+    requests its cancellation.
+    """
+
+    sigReload = Signal(list)
+    sigCancel = Signal()
+
+    def __init__(self, parent, delay=50, max_delay=2000):
+
+        super(AutoreloadScheduler, self).__init__(parent)
+
+        self.delay = delay  # ms
+        self.max_delay = max_delay  # ms
+        self.last_duration = 0.0  # s
+
+        self._hashes = {}
+        self._stats = {}
+        self._changed = set()
+        self._render_started = None
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_changed)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+
+        self._timer = QTimer(self, singleShot=True)
+        self._timer.timeout.connect(self._flush)
+
+    def files(self):
+
+        return self._watcher.files()
+
+    def watch(self, paths, directories=()):
+        """Replace the set of watched files and directories.
+
+        Directories catch files replaced by a rename, as done by many editors
+        when saving, which drops them from the file watches.
+        """
+
+        paths = {str(p) for p in paths}
+        current = set(self._watcher.files())
+
+        self._update_watches(current, paths)
+        self._update_watches(set(self._watcher.directories()), set(directories))
+
+        self._hashes = {
+            p: self._hashes[p] if p in self._hashes else file_hash(p) for p in paths
+        }
+        self._stats = {p: self._stats.get(p) or file_stat(p) for p in paths}
+
+    def _update_watches(self, current, paths):
+
+        if current - paths:
+            self._watcher.removePaths(list(current - paths))
+        if paths - current:
+            self._watcher.addPaths([p for p in paths - current if os.path.exists(p)])
+
+    def update_hash(self, path):
+        """Record the current content of a file, e.g. after saving it."""
+
+        self._hashes[str(path)] = file_hash(path)
+
+    def interval(self):
+
+        backoff = 1e3 * AUTORELOAD_BACKOFF * self.last_duration
+
+        return int(min(self.max_delay, max(self.delay, backoff)))
+
+    @Slot(str)
+    def _on_changed(self, path):
+
+        # editors saving through rename or delete drop the file from the watcher
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+
+        self._changed.add(path)
+
+        if self._render_started is not None:
+            self._render_started = None
+            self.sigCancel.emit()
+
+        self._timer.start(self.interval())
+
+    @Slot(str)
+    def _on_directory_changed(self, directory):
+
+        for path, stat in self._stats.items():
+            if os.path.dirname(path) == directory and file_stat(path) != stat:
+                self._on_changed(path)
+
+    @Slot()
+    def _flush(self):
+
+        changed = []
+
+        for path in sorted(self._changed):
+            self._stats[path] = file_stat(path)
+            h = file_hash(path)
+            if h is not None and h != self._hashes.get(path):
+                self._hashes[path] = h
+                changed.append(path)
+
+        self._changed.clear()
+
+        if changed:
+            self.sigReload.emit(changed)
+
+    def render_started(self):
+
+        self._render_started = perf_counter()
+
+    def render_finished(self):
+
+        if self._render_started is not None:
+            self.last_duration = perf_counter() - self._render_started
+            self._render_started = None
+
+
 class Editor(SimpleCodeEditor, ComponentMixin):
     """
     编辑器组件类
@@ -19,6 +167,7 @@ class Editor(SimpleCodeEditor, ComponentMixin):
     """
     name = "Code Editor"
     triggerRerender = Signal(bool)
+    sigCancelRender = Signal()
     sigFilenameChanged = Signal(str)
     preferences = Parameter.create(
         name="Preferences",
@@ -26,8 +175,15 @@ class Editor(SimpleCodeEditor, ComponentMixin):
             {"name": "Font size", "type": "int", "value": 12},
             {"name": "Autoreload", "type": "bool", "value": False},
             {"name": "Autoreload delay", "type": "int", "value": 50},
+            {"name": "Autoreload: maximum delay", "type": "int", "value": 2000},
             {"name": "Autoreload: watch imported modules", "type": "bool", "value": False},
             {"name": "Line wrap", "type": "bool", "value": False},
+            {
+                "name": "Large file mode: lines",
+                "type": "int",
+                "value": LARGE_FILE_LINES,
+                "tip": "Only the visible lines are highlighted in longer files",
+            },
             {
                 "name": "Color scheme",
                 "type": "list",
@@ -44,21 +200,81 @@ class Editor(SimpleCodeEditor, ComponentMixin):
         super().__init__(parent)
         ComponentMixin.__init__(self)
         # 文件监视器
-        self._file_watcher = QFileSystemWatcher(self)
-        self._file_watch_timer = QTimer(self)
-        self._file_watch_timer.setInterval(self.preferences["Autoreload delay"])
-        self._file_watch_timer.setSingleShot(True)
-        self._file_watcher.fileChanged.connect(lambda val: self._file_watch_timer.start())
-        self._file_watch_timer.timeout.connect(self._file_changed)
+        self._import_graph = ImportGraph()
+        self._autoreload = AutoreloadScheduler(self)
+        self._autoreload.sigReload.connect(self._file_changed)
+        self._autoreload.sigCancel.connect(self.sigCancelRender)
         self.updatePreferences()
     def updatePreferences(self, *args):
         font = self.font()
         font.setPointSize(self.preferences["Font size"])
         self.setFont(font)
         self.toggle_wrap_mode(self.preferences["Line wrap"])
-    def _file_changed(self):
-        # 文件变动处理逻辑
-        pass
+        self.large_file_lines = self.preferences["Large file mode: lines"]
+        self.update_large_file_mode()
+        self._autoreload.delay = self.preferences["Autoreload delay"]
+        self._autoreload.max_delay = self.preferences["Autoreload: maximum delay"]
+        self._update_filewatcher()
+
+    def autoreload(self, enabled):
+
+        self.preferences["Autoreload"] = enabled
+
+    def get_imported_module_paths(self, module_path):
+
+        graph = self._import_graph
+
+        # only the modified modules are parsed again
+        graph.update(module_path)
+
+        for path, err in graph.errors().items():
+            self._logger.warning(f"Cannot determine imported modules in {path}: {err}")
+
+        return graph.files()
+
+    def _update_filewatcher(self):
+
+        paths = []
+        directories = []
+
+        if self.preferences["Autoreload"] and self.filename:
+            paths.append(os.path.abspath(self.filename))
+            if self.preferences["Autoreload: watch imported modules"]:
+                paths.extend(self.get_imported_module_paths(self.filename))
+                directories = self._import_graph.directories()
+            else:
+                directories = [os.path.dirname(paths[0])]
+
+        self._autoreload.watch(paths, directories)
+
+    @Slot(list)
+    def _file_changed(self, paths):
+
+        fname = os.path.abspath(self.filename) if self.filename else None
+
+        if fname in paths:
+            with open(fname, "r", encoding="utf-8") as f:
+                self.set_text(f.read())
+            self.reset_modified()
+
+        # reload the changed modules and the ones importing them, even if
+        # their stat did not change
+        MODULE_RELOADER.invalidate(p for p in paths if p != fname)
+
+        # the imports may have changed
+        self._update_filewatcher()
+        self._rerender()
+
+    def _rerender(self):
+
+        self._autoreload.render_started()
+        self.triggerRerender.emit(True)
+
+    @Slot()
+    def render_finished(self):
+        """Called at the end of every render to adapt the autoreload delay."""
+
+        self._autoreload.render_finished()
     def new(self):
         if self.modified:
             rv = confirm(self, "请确认", "当前文档未保存，确定要新建吗？")
@@ -67,6 +283,7 @@ class Editor(SimpleCodeEditor, ComponentMixin):
         self.set_text("")
         self.filename = ""
         self.reset_modified()
+        self._update_filewatcher()
     def open(self):
         fname = get_open_filename(self, "打开文件", filter="*.py")
         if fname:
@@ -74,12 +291,18 @@ class Editor(SimpleCodeEditor, ComponentMixin):
                 self.set_text(f.read())
             self.filename = fname
             self.reset_modified()
+            self._update_filewatcher()
     def save(self):
         if not self.filename:
             return self.save_as()
         with open(self.filename, "w", encoding="utf-8") as f:
             f.write(self.get_text_with_eol())
         self.reset_modified()
+        if self.preferences["Autoreload"]:
+            # our own write must not trigger a second render
+            self._autoreload.update_hash(os.path.abspath(self.filename))
+            self._update_filewatcher()
+            self._rerender()
     def save_as(self):
         fname = get_save_filename(self, "另存为", filter="*.py")
         if fname:
@@ -90,6 +313,7 @@ class Editor(SimpleCodeEditor, ComponentMixin):
             self.set_text(f.read())
         self.filename = fname
         self.reset_modified()
+        self._update_filewatcher()
 
 
 if __name__ == "__main__":
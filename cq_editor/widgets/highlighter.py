@@ -0,0 +1,165 @@
+"""Python syntax highlighter of the code editor.
+
+All token types are matched by one precompiled pattern in a single pass over
+a line. Triple-quoted strings spanning several lines are tracked in the block
+state, so that QSyntaxHighlighter highlights the changed lines only and moves
+on to the following ones only while their state changes.
+"""
+
+import keyword
+import re
+
+from PySide6.QtGui import QColor, QFont, QSyntaxHighlighter, QTextCharFormat
+
+# block states
+NORMAL = 0
+IN_SINGLE_TRIPLE = 1  # inside '''
+IN_DOUBLE_TRIPLE = 2  # inside """
+STATE_MASK = 0xFF
+HIGHLIGHTED = 0x100  # formatted block in lazy mode
+
+_PREFIX = r"(?:\b[rRbBuUfF]{1,2})?"
+
+TOKENS = re.compile(
+    r"(?P<comment>#.*)"
+    rf"|(?P<triple>{_PREFIX}(?:'''|\"\"\"))"
+    rf"|(?P<string>{_PREFIX}(?:'[^'\\]*(?:\\.[^'\\]*)*'?|\"[^\"\\]*(?:\\.[^\"\\]*)*\"?))"
+    rf"|(?P<keyword>\b(?:{'|'.join(keyword.kwlist)})\b)"
+)
+
+# remainder of a triple-quoted string, up to and including the closing quotes
+STRING_END = {
+    IN_SINGLE_TRIPLE: re.compile(r"(?:[^'\\]|\\.|'(?!''))*'''"),
+    IN_DOUBLE_TRIPLE: re.compile(r'(?:[^"\\]|\\.|"(?!""))*"""'),
+}
+
+
+def _format(color, bold=False):
+
+    rv = QTextCharFormat()
+    rv.setForeground(QColor(color))
+    if bold:
+        rv.setFontWeight(QFont.Bold)
+
+    return rv
+
+
+class PythonHighlighter(QSyntaxHighlighter):
+    """Highlighter of Python code.
+
+    When lazy is set only the blocks in the visible range of block numbers are
+    formatted. The other ones are scanned for their state only and formatted by
+    highlight_blocks() once they are scrolled into view; formatted blocks are
+    marked with the HIGHLIGHTED bit of their state.
+    """
+
+    def __init__(self, document):
+
+        super().__init__(document)
+
+        self.formats = {
+            "keyword": _format("#0077aa", True),
+            "string": _format("#bb6600"),
+            "comment": _format("#888888"),
+        }
+
+        self.lazy = False
+        self.visible = (0, -1)
+
+        self._formatting = True
+        self._flag = 0
+
+    def set_lazy(self, lazy):
+
+        if lazy != self.lazy:
+            self.lazy = lazy
+            if not lazy:
+                self.rehighlight()
+
+    def highlight_blocks(self, first, last):
+        """Format the blocks first to last (block numbers) if not done yet."""
+
+        self.visible = (first, last)
+
+        block = self.document().findBlockByNumber(first)
+        while block.isValid() and block.blockNumber() <= last:
+            state = block.userState()
+            if state < 0 or not state & HIGHLIGHTED:
+                self.rehighlightBlock(block)
+            block = block.next()
+
+    def _set_format(self, start, count, fmt):
+
+        if self._formatting:
+            self.setFormat(start, count, fmt)
+
+    def _set_state(self, state):
+
+        self.setCurrentBlockState(state | self._flag)
+
+    def _string_end(self, text, start, state):
+        """Highlight a triple-quoted string from start; returns the end or None."""
+
+        fmt = self.formats["string"]
+        match = STRING_END[state].match(text, start)
+
+        if match is None:
+            self._set_format(start, len(text) - start, fmt)
+            self._set_state(state)
+            return None
+
+        self._set_format(start, match.end() - start, fmt)
+
+        return match.end()
+
+    def highlightBlock(self, text):
+
+        state = self.previousBlockState()
+        state = state & STATE_MASK if state > 0 else NORMAL
+
+        if self.lazy:
+            first, last = self.visible
+            self._formatting = first <= self.currentBlock().blockNumber() <= last
+            self._flag = HIGHLIGHTED if self._formatting else 0
+        else:
+            self._formatting = True
+            self._flag = 0
+
+        self._set_state(NORMAL)
+
+        if not self._formatting and state == NORMAL:
+            # lines without triple quotes cannot change the state
+            if "'''" not in text and '"""' not in text:
+                return
+
+        pos = 0
+
+        if state in STRING_END:
+            # continuation of a multi-line string
+            pos = self._string_end(text, 0, state)
+            if pos is None:
+                return
+
+        formats = self.formats
+
+        while True:
+            match = TOKENS.search(text, pos)
+            if match is None:
+                break
+
+            kind = match.lastgroup
+            start = match.start()
+
+            if kind == "triple":
+                state = (
+                    IN_SINGLE_TRIPLE
+                    if text[match.end() - 1] == "'"
+                    else IN_DOUBLE_TRIPLE
+                )
+                self._set_format(start, match.end() - start, formats["string"])
+                pos = self._string_end(text, match.end(), state)
+                if pos is None:
+                    return
+            else:
+                self._set_format(start, match.end() - start, formats[kind])
+                pos = match.end()
@@ -1,29 +1,341 @@
 # 日志查看器
 import logbook as logging
+import os
 import re
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
 
 from PySide6 import QtGui
-from PySide6.QtCore import QObject, Signal
-from PySide6.QtWidgets import QPlainTextEdit
-from PySide6.QtGui import QAction
+from PySide6.QtCore import (
+    Qt,
+    QAbstractListModel,
+    QModelIndex,
+    QStandardPaths,
+    QTimer,
+    Signal,
+    Slot,
+)
+from PySide6.QtWidgets import QWidget, QListView, QComboBox, QLineEdit, QHBoxLayout
+from PySide6.QtGui import QAction, QKeySequence
+from pyqtgraph.parametertree import Parameter
 
 from ..mixins import ComponentMixin
+from ..utils import layout
 
 from ..icons import icon
 
+# Regular expression pattern to match ANSI escape codes
+ESCAPE_PATTERN = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
+
+FLUSH_INTERVAL = 33  # ms
+FILTER_DELAY = 200  # ms
+
+LEVELS = {
+    "All": logging.NOTSET,
+    "Debug": logging.DEBUG,
+    "Info": logging.INFO,
+    "Warning": logging.WARNING,
+    "Error": logging.ERROR,
+}
+
 
 def strip_escape_sequences(input_string):
-    # Regular expression pattern to match ANSI escape codes
-    escape_pattern = re.compile(r"\x1B\[[0-?]*[ -/]*[@-~]")
 
     # Use re.sub to replace escape codes with an empty string
-    clean_string = re.sub(escape_pattern, "", input_string)
+    return ESCAPE_PATTERN.sub("", input_string)
+
+
+class LogStore(object):
+    """Append-only store of log lines.
+
+    Lines are kept in a list and their levels in a parallel byte array. Lines
+    are addressed by sequence numbers, which do not change when the oldest
+    lines are dropped by flush(). Appending is thread safe and reads take the
+    lock too, since lines and levels are extended one after the other;
+    everything else is meant for the GUI thread.
+    """
+
+    def __init__(self, capacity=1_000_000):
+
+        self.capacity = capacity
+        self.first = 0  # sequence number of the oldest line
+        self.log_file = None
+
+        self._lines = []
+        self._levels = array("B")
+        self._open = False  # the last line is not terminated yet
+        self._dirty = False
+        self._unwritten = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+
+        with self._lock:
+            return len(self._levels)
+
+    @property
+    def end(self):
+        """Sequence number of the next line."""
+
+        with self._lock:
+            return self.first + len(self._levels)
+
+    def append(self, text, level=logging.INFO, new_line=False):
+        """Append text, which may continue the last line unless new_line is set.
+
+        Returns True if the store was flushed since the last append.
+        """
+
+        if not text:
+            return False
+
+        pieces = text.split("\n")
+
+        with self._lock:
+            if self.log_file:
+                if new_line and self._open:
+                    self._unwritten.append("\n")
+                self._unwritten.append(text)
+
+            if self._open and not new_line:
+                self._lines[-1] += pieces.pop(0)
+
+            if pieces:
+                last = pieces.pop()
+                if last:
+                    pieces.append(last)
+
+                self._lines.extend(pieces)
+                self._levels.extend([level] * len(pieces))
+                self._open = bool(last)
+
+            rv = not self._dirty
+            self._dirty = True
+
+        return rv
+
+    def lines(self, start, end):
+        """(sequence number, level, text) of the given lines."""
+
+        with self._lock:
+            i, j = start - self.first, end - self.first
+            levels, lines = self._levels[i:j], self._lines[i:j]
+
+        return zip(range(start, end), levels, lines)
+
+    def line(self, seq):
+        """(level, text) of a line, None if it is not stored."""
+
+        with self._lock:
+            i = seq - self.first
+            if not 0 <= i < len(self._levels):
+                return None
+
+            return self._levels[i], self._lines[i]
+
+    def flush(self):
+        """Drop the oldest lines if needed and write the new ones to the file."""
+
+        with self._lock:
+            self._dirty = False
+            text, self._unwritten = "".join(self._unwritten), []
+
+            # drop a tenth more than needed, so that trimming stays rare
+            excess = len(self._lines) - self.capacity
+            if excess > 0:
+                excess += self.capacity // 10
+                del self._lines[:excess]
+                del self._levels[:excess]
+                self.first += excess
+
+        if text and self.log_file:
+            self.log_file.write(text)
+
+    def clear(self):
+
+        with self._lock:
+            self.first += len(self._levels)
+            self._lines = []
+            self._levels = array("B")
+            self._open = False
+
+    def text(self):
+
+        with self._lock:
+            if not self._lines:
+                return ""
+
+            return "\n".join(self._lines) + ("" if self._open else "\n")
+
+
+class RotatingLogFile(object):
+    """Log file moved to path.1, path.2, ... once it exceeds max_bytes."""
+
+    def __init__(self, path, max_bytes=10_000_000, backups=3):
+
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+        self._file = None
+
+    def write(self, text):
+
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+
+        if self._file.tell() and self._file.tell() + len(text) > self.max_bytes:
+            self.rotate()
+
+        self._file.write(text)
+        self._file.flush()
+
+    def rotate(self):
+
+        self.close()
+
+        for i in range(self.backups - 1, 0, -1):
+            src = self.path.with_name(f"{self.path.name}.{i}")
+            if src.exists():
+                os.replace(src, self.path.with_name(f"{self.path.name}.{i + 1}"))
+
+        if self.path.exists():
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LogModel(QAbstractListModel):
+    """Filtered list of the lines of a LogStore.
+
+    Without a filter rows map directly to lines. With a filter the sequence
+    numbers of the matching lines are kept in an array, which is extended by
+    sync() as lines come in and rebuilt only when the filter changes.
+    """
 
-    return clean_string
+    COLORS = {
+        logging.WARNING: QtGui.QColor(230, 140, 0),
+        logging.ERROR: QtGui.QColor(220, 50, 47),
+        logging.CRITICAL: QtGui.QColor(220, 50, 47),
+    }
 
+    def __init__(self, store, parent=None):
 
-class _QtLogHandlerQObject(QObject):
-    sigRecordEmit = Signal(str)
+        super(LogModel, self).__init__(parent)
+
+        self.store = store
+        self.level = logging.NOTSET
+        self.text = ""
+
+        self._rows = None  # sequence numbers of the shown lines when filtering
+        self._count = 0  # rows known to the views
+        self._first = store.first
+        self._seen = store.first  # next line to be considered
+
+    def _accept(self, level, line):
+
+        return level >= self.level and (not self.text or self.text in line.lower())
+
+    def set_filter(self, level=logging.NOTSET, text=""):
+
+        self.beginResetModel()
+
+        store = self.store
+        self.level = level
+        self.text = text.lower()
+        self._first = store.first
+        self._seen = store.end
+
+        if level or text:
+            self._rows = array(
+                "Q",
+                (
+                    seq
+                    for seq, level, line in store.lines(store.first, store.end)
+                    if self._accept(level, line)
+                ),
+            )
+            self._count = len(self._rows)
+        else:
+            self._rows = None
+            self._count = self._seen - self._first
+
+        self.endResetModel()
+
+    def sync(self):
+        """Show the lines appended since the last call."""
+
+        store = self.store
+        rows = self._rows
+
+        if store.first != self._first:
+            # trimmed or cleared
+            self.beginResetModel()
+            self._first = store.first
+            self._seen = max(self._seen, store.first)
+            if rows is None:
+                self._count = self._seen - self._first
+            else:
+                del rows[: bisect_left(rows, self._first)]
+                self._count = len(rows)
+            self.endResetModel()
+        elif self._count:
+            # the last line may have been continued
+            index = self.index(self._count - 1)
+            self.dataChanged.emit(index, index)
+
+        start, end = self._seen, store.end
+        self._seen = end
+
+        if rows is None:
+            new = end - start
+        else:
+            matching = [
+                seq
+                for seq, level, line in store.lines(start, end)
+                if self._accept(level, line)
+            ]
+            new = len(matching)
+
+        if new:
+            self.beginInsertRows(QModelIndex(), self._count, self._count + new - 1)
+            if rows is not None:
+                rows.extend(matching)
+            self._count += new
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+
+        return 0 if parent.isValid() else self._count
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        row = index.row()
+        if not index.isValid() or row >= self._count:
+            return None
+
+        seq = self._rows[row] if self._rows is not None else self._first + row
+        item = self.store.line(seq)
+        if item is None:
+            return None
+
+        level, line = item
+
+        if role == Qt.DisplayRole:
+            return line
+        elif role == Qt.ForegroundRole:
+            return self.COLORS.get(level)
+
+        return None
 
 
 class QtLogHandler(logging.Handler, logging.StringFormatterHandlerMixin):
@@ -38,24 +350,85 @@ class QtLogHandler(logging.Handler, logging.StringFormatterHandlerMixin):
 
         logging.StringFormatterHandlerMixin.__init__(self, log_format_string)
 
-        self._qobject = _QtLogHandlerQObject()
-        # self._qobject.sigRecordEmit.connect(log_widget.append)
-        # print("[DEBUG]", type(self._qobject), type(log_widget))
-        # self._qobject.sigRecordEmit.connect(lambda val: log_widget.append(val))
-        self._qobject.sigRecordEmit.connect(lambda val: log_widget.append_log(val))
+        self._log_widget = log_widget
 
     def emit(self, record):
-        self._qobject.sigRecordEmit.emit(self.format(record) + "\n")
+        # appending is thread safe, the view is updated on the GUI thread
+        self._log_widget.append_log(self.format(record) + "\n", record.level, True)
 
 
-class LogViewer(QPlainTextEdit, ComponentMixin):
+class LogViewer(QWidget, ComponentMixin):
 
     name = "Log viewer"
 
+    preferences = Parameter.create(
+        name="Preferences",
+        children=[
+            {
+                "name": "Maximum lines",
+                "type": "int",
+                "value": 1_000_000,
+                "limits": (1000, 100_000_000),
+            },
+            {"name": "Log to file", "type": "bool", "value": False},
+            {
+                "name": "Log file",
+                "type": "str",
+                "value": "",
+                "tip": "cq-editor.log in the application data directory if empty",
+            },
+            {
+                "name": "Log file size [MB]",
+                "type": "int",
+                "value": 10,
+                "limits": (1, 10000),
+            },
+            {"name": "Log file backups", "type": "int", "value": 3, "limits": (1, 100)},
+        ],
+    )
+
+    _sigScheduleFlush = Signal()
+
     def __init__(self, *args, **kwargs):
 
         super(LogViewer, self).__init__(*args, **kwargs)
-        self._MAX_ROWS = 500
+        ComponentMixin.__init__(self)
+
+        self.store = LogStore()
+        self.model = LogModel(self.store, self)
+
+        self.view = QListView(self)
+        self.view.setModel(self.model)
+        self.view.setUniformItemSizes(True)
+        self.view.setSelectionMode(QListView.ExtendedSelection)
+
+        self.level = QComboBox(self)
+        self.level.addItems(list(LEVELS))
+
+        self.filter = QLineEdit(self)
+        self.filter.setPlaceholderText("Filter")
+        self.filter.setClearButtonEnabled(True)
+
+        self._filter_timer = QTimer(self, singleShot=True, interval=FILTER_DELAY)
+        self._filter_timer.timeout.connect(self._update_filter)
+
+        layout(
+            self,
+            (
+                layout(
+                    self,
+                    (self.level, self.filter),
+                    layout_type=QHBoxLayout,
+                ),
+                self.view,
+            ),
+            top_widget=self,
+        )
+
+        copy = QAction("Copy", self.view, triggered=self.copy)
+        copy.setShortcut(QKeySequence.Copy)
+        copy.setShortcutContext(Qt.WidgetShortcut)
+        self.view.addAction(copy)
 
         self._actions = {
             "Run": [
@@ -63,16 +436,88 @@ class LogViewer(QPlainTextEdit, ComponentMixin):
             ]
         }
 
-        self.setReadOnly(True)
-        self.setMaximumBlockCount(self._MAX_ROWS)
-        self.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.level.currentIndexChanged.connect(self._update_filter)
+        self.filter.textChanged.connect(self._filter_timer.start)
+        self._sigScheduleFlush.connect(self._schedule_flush)
 
         self.handler = QtLogHandler(self)
 
-    def append_log(self, msg):
-        """Append text to the panel with ANSI escape sequences stipped."""
-        self.moveCursor(QtGui.QTextCursor.End)
-        self.insertPlainText(strip_escape_sequences(msg))
+        self.updatePreferences()
+
+    @Slot(object, object)
+    def updatePreferences(self, *args):
+
+        prefs = self.preferences
+
+        self.store.capacity = prefs["Maximum lines"]
+
+        if self.store.log_file:
+            self.store.log_file.close()
+            self.store.log_file = None
+
+        if prefs["Log to file"]:
+            path = prefs["Log file"] or (
+                Path(QStandardPaths.writableLocation(QStandardPaths.AppDataLocation))
+                / "cq-editor.log"
+            )
+            self.store.log_file = RotatingLogFile(
+                path,
+                prefs["Log file size [MB]"] * 1_000_000,
+                prefs["Log file backups"],
+            )
+
+    def append_log(self, msg, level=logging.INFO, new_line=False):
+        """Append text to the panel with ANSI escape sequences stipped.
+
+        Can be called from any thread, the view is updated up to ~30 times per
+        second.
+        """
+        if self.store.append(strip_escape_sequences(msg), level, new_line):
+            self._sigScheduleFlush.emit()
+
+    @Slot()
+    def _schedule_flush(self):
+
+        QTimer.singleShot(FLUSH_INTERVAL, self.flush)
+
+    @Slot()
+    def flush(self):
+
+        scrollbar = self.view.verticalScrollBar()
+        at_bottom = scrollbar.value() == scrollbar.maximum()
+
+        self.store.flush()
+        self.model.sync()
+
+        if at_bottom:
+            self.view.scrollToBottom()
+
+    @Slot()
+    def _update_filter(self):
+
+        self.model.set_filter(LEVELS[self.level.currentText()], self.filter.text())
+        self.view.scrollToBottom()
+
+    @Slot()
+    def copy(self):
+
+        rows = sorted(index.row() for index in self.view.selectedIndexes())
+        lines = (self.model.data(self.model.index(row)) for row in rows)
+
+        QtGui.QGuiApplication.clipboard().setText(
+            "\n".join(line for line in lines if line is not None)
+        )
+
+    def toPlainText(self):
+        """Text of the whole log, regardless of the filters."""
+
+        return self.store.text()
+
+    @Slot()
+    def clear(self):
+
+        self.store.clear()
+        self.model.sync()
 
     def clear_log(self):
         """
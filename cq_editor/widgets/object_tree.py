@@ -1,16 +1,22 @@
 # 对象树组件？
+import os
+
+import cadquery as cq
 from PySide6.QtWidgets import (
     QTreeWidget,
     QTreeWidgetItem,
     QMenu,
     QWidget,
     QAbstractItemView,
+    QFileDialog,
+    QProgressDialog,
 )
 from PySide6.QtGui import QAction
-from PySide6.QtCore import Qt, Slot, Signal
+from PySide6.QtCore import Qt, Slot, Signal, QTimer
+from logbook import info, error
 from pyqtgraph.parametertree import Parameter, ParameterTree
 
-from OCC.Core.AIS import AIS_Line
+from OCC.Core.AIS import AIS_Line, AIS_Shape, AIS_ColoredShape
 from OCC.Core.Geom import Geom_Line
 from OCC.Core.gp import gp_Dir, gp_Pnt, gp_Ax1
 from OCC.Core.Quantity import Quantity_Color
@@ -24,10 +30,24 @@ from ..cq_utils import (
     is_obj_empty,
     get_occ_color,
     set_color,
+    assembly_parts,
+    apply_options,
+    object_hash,
+    make_placeholder,
 )
 # from .viewer import DEFAULT_FACE_COLOR
 from ..cq_utils import DEFAULT_FACE_COLOR
-from ..utils import splitter, layout, get_save_filename
+from ..tessellation import (
+    TESSELLATION_CACHE,
+    copy_geometry,
+    executor,
+    is_meshed,
+    mesh_shape,
+)
+from ..profiling import PROFILER
+from ..execution import to_brep, export_brep
+from ..workers import WorkerPool, JobQueue
+from ..utils import splitter, layout, get_save_filename, safe_name
 
 
 class TopTreeItem(QTreeWidgetItem):
@@ -44,6 +64,14 @@ class ObjectTreeItem(QTreeWidgetItem):
         # {"name": "Color", "type": "color", "value": "#f4a824"},
         # {"name": "Alpha", "type": "float", "value": 0, "limits": (0, 1), "step": 1e-1},
         {"name": "Visible", "type": "bool", "value": True},
+        {
+            "name": "STL tolerance",
+            "type": "float",
+            "value": 0.0,
+            "dec": True,
+            "step": 1,
+            "tip": "Used by per-object STL export, 0 means the STL precision preference",
+        },
     ]
 
     def __init__(
@@ -55,6 +83,8 @@ class ObjectTreeItem(QTreeWidgetItem):
         sig=None,
         alpha=0.0,
         color="#f4a824",
+        options=None,
+        shape_hash=None,
         **kwargs,
     ):
 
@@ -64,6 +94,8 @@ class ObjectTreeItem(QTreeWidgetItem):
 
         self.ais = ais
         self.shape = shape
+        self.options = options if options is not None else {}
+        self.shape_hash = shape_hash
         self.shape_display = shape_display
         self.sig = sig
 
@@ -133,7 +165,9 @@ class ObjectTree(QWidget, ComponentMixin):
         children=[
             {"name": "Preserve properties on reload", "type": "bool", "value": False},
             {"name": "Clear all before each run", "type": "bool", "value": True},
+            {"name": "Reconcile objects on rerun", "type": "bool", "value": False},
             {"name": "STL precision", "type": "float", "value": 0.1},
+            {"name": "Export workers", "type": "int", "value": 4, "limits": (1, 64)},
         ],
     )
 
@@ -143,6 +177,7 @@ class ObjectTree(QWidget, ComponentMixin):
     sigAISObjectsSelected = Signal(list)
     sigItemChanged = Signal(QTreeWidgetItem, int)
     sigObjectPropertiesChanged = Signal()
+    sigMeshReady = Signal(object, object)
 
     def __init__(self, parent):
 
@@ -159,7 +194,7 @@ class ObjectTree(QWidget, ComponentMixin):
         tree.setContextMenuPolicy(Qt.ActionsContextMenu)
 
         # forward itemChanged singal
-        tree.itemChanged.connect(lambda item, col: self.sigItemChanged.emit(item, col))
+        tree.itemChanged.connect(self._forward_item_changed)
         # handle visibility changes form tree
         tree.itemChanged.connect(self.handleChecked)
 
@@ -183,6 +218,39 @@ class ObjectTree(QWidget, ComponentMixin):
             "Export as STEP", self, enabled=False, triggered=lambda: self.export("step")
         )
 
+        self._export_each_STL_action = QAction(
+            "Export objects as STL files",
+            self,
+            enabled=False,
+            triggered=lambda: self.export_each("stl"),
+        )
+
+        self._export_each_STEP_action = QAction(
+            "Export objects as STEP files",
+            self,
+            enabled=False,
+            triggered=lambda: self.export_each("step"),
+        )
+
+        self._export_actions = (
+            self._export_STL_action,
+            self._export_STEP_action,
+            self._export_each_STL_action,
+            self._export_each_STEP_action,
+        )
+
+        self._export_pool = None
+        self._export_queue = None
+        self._export_progress = None
+        self._export_timer = QTimer(self, interval=50)
+        self._export_timer.timeout.connect(self._poll_export)
+
+        # AIS objects meshed in the background -> (item, placeholder)
+        self._meshing = {}
+        self.sigMeshReady.connect(self._mesh_ready)
+
+        self._fit_stream = False
+
         self._clear_current_action = QAction(
             icon("delete"),
             "Clear current",
@@ -211,9 +279,7 @@ class ObjectTree(QWidget, ComponentMixin):
 
         self._context_menu = QMenu(self)
         self._context_menu.addActions(self._toolbar_actions)
-        self._context_menu.addActions(
-            (self._export_STL_action, self._export_STEP_action)
-        )
+        self._context_menu.addActions(self._export_actions)
 
     def prepareLayout(self):
 
@@ -232,7 +298,7 @@ class ObjectTree(QWidget, ComponentMixin):
 
     def menuActions(self):
 
-        return {"Tools": [self._export_STL_action, self._export_STEP_action]}
+        return {"Tools": list(self._export_actions)}
 
     def toolbarActions(self):
 
@@ -277,29 +343,51 @@ class ObjectTree(QWidget, ComponentMixin):
 
     @Slot(dict, bool)
     @Slot(dict)
-    def addObjects(self, objects, clean=False, root=None):
+    def addObjects(self, objects, clean=False, root=None, append=False):
 
         if root is None:
             root = self.CQ
 
-        request_fit_view = True if root.childCount() == 0 else False
+        # appended objects are part of a stream, fitted once it is complete
+        request_fit_view = root.childCount() == 0 and not append
         preserve_props = self.preferences["Preserve properties on reload"]
 
         if preserve_props:
             current_props = self._current_properties()
 
-        if clean or self.preferences["Clear all before each run"]:
-            self.removeObjects()
+        # remove empty objects
+        objects_f = {k: v for k, v in objects.items() if not is_obj_empty(v.shape)}
+
+        reconcile = (
+            self.preferences["Reconcile objects on rerun"]
+            and root is self.CQ
+            and not clean
+            and not append
+        )
+
+        if reconcile:
+            kept, hashes = self._reconcile(objects_f)
+        else:
+            kept, hashes = {}, {}
+            if not append and (clean or self.preferences["Clear all before each run"]):
+                self.removeObjects()
 
         ais_list = []
+        background = TESSELLATION_CACHE.background
+        hits0, misses0 = TESSELLATION_CACHE.stats()
 
-        # remove empty objects
-        objects_f = {k: v for k, v in objects.items() if not is_obj_empty(v.shape)}
+        for i, (name, obj) in enumerate(objects_f.items()):
+            # unchanged objects stay displayed, only their position is updated
+            if name in kept:
+                child = kept[name]
+                if root.indexOfChild(child) != i:
+                    root.insertChild(i, root.takeChild(root.indexOfChild(child)))
+                continue
 
-        for name, obj in objects_f.items():
             print("[DEBUG] obj.shape:", obj.shape)
             print("[DEBUG] type(obj.shape):", type(obj.shape))
-            ais, shape_display = make_AIS(obj.shape, obj.options)
+            with PROFILER.stage("make_AIS"):
+                ais, shape_display = make_AIS(obj.shape, obj.options, not background)
 
             child = ObjectTreeItem(
                 name,
@@ -307,21 +395,192 @@ class ObjectTree(QWidget, ComponentMixin):
                 shape_display=shape_display,
                 ais=ais,
                 sig=self.sigObjectPropertiesChanged,
+                options=obj.options,
+                shape_hash=hashes.get(name),
             )
 
             if preserve_props and name in current_props:
                 self._restore_properties(child, current_props)
 
+            if background and self._mesh_in_background(child):
+                ais = self._meshing[ais][1]
+
             if child.properties["Visible"]:
                 ais_list.append(ais)
 
-            root.addChild(child)
+            if reconcile:
+                root.insertChild(i, child)
+            else:
+                root.addChild(child)
+
+        hits, misses = TESSELLATION_CACHE.stats()
+        if TESSELLATION_CACHE.enabled and objects_f:
+            info(
+                f"Tessellation cache: {hits - hits0} hits, {misses - misses0} misses "
+                f"({len(TESSELLATION_CACHE)} shapes cached)"
+            )
 
         if request_fit_view:
             self.sigObjectsAdded.emit(ais_list, True)
         else:
             self.sigObjectsAdded.emit(ais_list,False)
 
+    @Slot(dict, bool, bool)
+    def streamObjects(self, objects, first=False, last=False):
+        """Add objects shown by a script that is still running.
+
+        The first batch of a run replaces the current objects and objects shown
+        again under the same name replace the previous ones. The view is fitted
+        after the last batch only.
+        """
+
+        CQ = self.CQ
+
+        if first:
+            # reconciling needs all the objects, so they are replaced instead
+            if (
+                self.preferences["Clear all before each run"]
+                or self.preferences["Reconcile objects on rerun"]
+            ):
+                self.removeObjects()
+            self._fit_stream = CQ.childCount() == 0
+
+        replaced = [
+            i
+            for i in range(CQ.childCount())
+            if CQ.child(i).properties["Name"] in objects
+        ]
+        if replaced:
+            self.removeObjects(replaced)
+
+        if objects:
+            self.addObjects(objects, append=True)
+
+        if last and self._fit_stream:
+            self.sigObjectsAdded.emit([], True)
+
+    def _mesh_in_background(self, item):
+        """Mesh the shape of item on the tessellation pool.
+
+        Returns True if meshing was started, a placeholder is then registered
+        in place of the AIS object until the mesh is ready.
+        """
+
+        ais = item.ais
+
+        # colored shapes (assemblies) are meshed by AIS
+        if not isinstance(ais, AIS_Shape) or isinstance(ais, AIS_ColoredShape):
+            return False
+
+        shape = ais.Shape()
+        cache = TESSELLATION_CACHE
+
+        if is_meshed(shape, cache.deviation):
+            return False
+
+        self._meshing[ais] = (item, make_placeholder(shape))
+
+        # the displayed shape shares its faces with item.shape, which the GUI
+        # thread may export or hash meanwhile; a copy is meshed instead
+        copy = copy_geometry(shape)
+
+        # the pool is already as wide as the CPU count
+        future = executor().submit(
+            mesh_shape, copy, cache.deviation, cache.angular_deviation, False
+        )
+        future.add_done_callback(
+            lambda f, ais=ais, copy=copy: self.sigMeshReady.emit(ais, (copy, f))
+        )
+
+        return True
+
+    @Slot(object, object)
+    def _mesh_ready(self, ais, result):
+
+        # removed in the meantime
+        if ais not in self._meshing:
+            return
+
+        item, placeholder = self._meshing.pop(ais)
+        self.sigObjectsRemoved.emit([placeholder])
+
+        copy, future = result
+
+        try:
+            ntriangles = future.result()
+            TESSELLATION_CACHE.finish(ais.Shape(), copy, ntriangles)
+            ais.SetShape(copy)
+        except Exception as e:
+            # AIS meshes the shape itself on display
+            error(f"Background tessellation of {item.properties['Name']} failed: {e}")
+
+        if item.properties["Visible"]:
+            self.sigObjectsAdded.emit([ais], False)
+
+    def _with_placeholders(self, ais_list):
+        """Add the placeholders of removed objects that are still being meshed."""
+
+        return ais_list + [
+            self._meshing.pop(ais)[1] for ais in ais_list if ais in self._meshing
+        ]
+
+    @Slot(QTreeWidgetItem, int)
+    def _forward_item_changed(self, item, col):
+
+        # the visibility of objects being meshed is applied once they are ready
+        if getattr(item, "ais", None) not in self._meshing:
+            self.sigItemChanged.emit(item, col)
+
+    def _reconcile(self, objects):
+        """Remove the CQ items that do not match the new objects.
+
+        Items match if both the name and the geometric hash are equal. Matching
+        items keep their AIS object, options are updated in place if needed.
+        Returns the kept items and the hashes of the new objects, both by name.
+        """
+
+        hashes = {name: object_hash(obj.shape) for name, obj in objects.items()}
+
+        CQ = self.CQ
+        kept = {}
+        removed = []
+        options_changed = False
+
+        for i in reversed(range(CQ.childCount())):
+            item = CQ.child(i)
+            name = item.properties["Name"]
+            obj = objects.get(name)
+
+            if (
+                obj is not None
+                and name not in kept
+                and hashes[name] is not None
+                and item.shape_hash == hashes[name]
+            ):
+                item.shape = obj.shape
+
+                if item.options != obj.options:
+                    apply_options(item.ais, obj.options, reset=True)
+                    item.ais.SynchronizeAspects()
+                    item.options = obj.options
+                    options_changed = True
+
+                kept[name] = item
+            else:
+                CQ.takeChild(i)
+                try:
+                    item.properties.sigTreeStateChanged.disconnect()
+                except Exception:
+                    pass
+                removed.append(item.ais)
+
+        if removed:
+            self.sigObjectsRemoved.emit(self._with_placeholders(removed))
+        if options_changed:
+            self.sigObjectPropertiesChanged.emit()
+
+        return kept, hashes
+
     @Slot(object, str, object)
     def addObject(self, obj, name="", options=None):
 
@@ -349,7 +608,10 @@ class ObjectTree(QWidget, ComponentMixin):
     def removeObjects(self, objects=None):
 
         if objects:
-            removed_items_ais = [self.CQ.takeChild(i).ais for i in objects]
+            # later rows first, so that the indices stay valid
+            removed_items_ais = [
+                self.CQ.takeChild(i).ais for i in sorted(objects, reverse=True)
+            ]
         else:
             # removed_items_ais = [ch.ais for ch in self.CQ.takeChildren()]
             removed_items_ais = []
@@ -360,7 +622,7 @@ class ObjectTree(QWidget, ComponentMixin):
                     except Exception:
                         pass
                 removed_items_ais.append(ch.ais)
-        self.sigObjectsRemoved.emit(removed_items_ais)
+        self.sigObjectsRemoved.emit(self._with_placeholders(removed_items_ais))
 
     @Slot(bool)
     def stashObjects(self, action: bool):
@@ -368,7 +630,7 @@ class ObjectTree(QWidget, ComponentMixin):
         if action:
             self._stash = self.CQ.takeChildren()
             removed_items_ais = [ch.ais for ch in self._stash]
-            self.sigObjectsRemoved.emit(removed_items_ais)
+            self.sigObjectsRemoved.emit(self._with_placeholders(removed_items_ais))
         else:
             self.removeObjects()
             self.CQ.addChildren(self._stash)
@@ -383,29 +645,153 @@ class ObjectTree(QWidget, ComponentMixin):
 
         self.removeObjects(rows)
 
-    def export(self, export_type, precision=None):
+    def _selected_items(self):
 
         items = self.tree.selectedItems()
 
         # if CQ models is selected get all children
         if [item for item in items if item is self.CQ]:
             CQ = self.CQ
-            shapes = [CQ.child(i).shape for i in range(CQ.childCount())]
+            return [CQ.child(i) for i in range(CQ.childCount())]
         # otherwise collect all selected children of CQ
         else:
-            shapes = [item.shape for item in items if item.parent() is self.CQ]
+            return [item for item in items if item.parent() is self.CQ]
+
+    def export(self, export_type, precision=None):
+
+        shapes = [item.shape for item in self._selected_items()]
 
         fname = get_save_filename(export_type)
         if fname != "":
             export(shapes, export_type, fname, precision)
 
+    def _export_parts(self, items, export_type, directory):
+        """(name, shape, file name, precision) of every file to export"""
+
+        rv = []
+        used = set()
+
+        for item in items:
+            name = item.properties["Name"]
+            precision = (
+                item.properties["STL tolerance"] or self.preferences["STL precision"]
+            )
+
+            # one file per assembly child
+            if isinstance(item.shape, cq.Assembly):
+                parts = assembly_parts(item.shape)
+            else:
+                parts = [(name, item.shape)]
+
+            for part_name, shape in parts:
+                # names mapped to the same file get a numeric suffix
+                stem = safe_name(part_name)
+                fname = os.path.join(directory, f"{stem}.{export_type}")
+                n = 1
+                while os.path.normcase(fname) in used:
+                    n += 1
+                    fname = os.path.join(directory, f"{stem}_{n}.{export_type}")
+                used.add(os.path.normcase(fname))
+
+                rv.append((part_name, shape, fname, precision))
+
+        return rv
+
+    def export_each(self, export_type, directory=None):
+        """Export every selected object to its own file in worker processes"""
+
+        if self._export_queue:
+            return
+
+        if directory is None:
+            directory = QFileDialog.getExistingDirectory(self, "Export directory")
+        if not directory:
+            return
+
+        items = self._selected_items()
+        if not items:
+            return
+
+        size = self.preferences["Export workers"]
+        if self._export_pool is None or self._export_pool.size != size:
+            if self._export_pool:
+                self._export_pool.shutdown()
+            self._export_pool = WorkerPool(size)
+
+        parts = self._export_parts(items, export_type, directory)
+
+        # shapes are serialized as their jobs are submitted, a few per poll,
+        # instead of all at once before the export starts
+        jobs = (
+            (name, export_brep, (to_brep(shape), export_type, fname, precision))
+            for name, shape, fname, precision in parts
+        )
+
+        self._export_queue = queue = JobQueue(self._export_pool, jobs, len(parts))
+
+        # non-modal, the viewer stays usable while exporting
+        self._export_progress = progress = QProgressDialog(
+            f"Exporting {queue.total} {export_type.upper()} files",
+            "Cancel",
+            0,
+            queue.total,
+            self,
+        )
+        progress.setWindowModality(Qt.NonModal)
+        progress.setMinimumDuration(0)
+        progress.canceled.connect(self.cancel_export)
+        progress.setValue(0)
+
+        self._export_timer.start()
+
+    @Slot()
+    def cancel_export(self):
+
+        if self._export_queue:
+            self._export_queue.cancel()
+            info("Export cancelled")
+            self._finish_export()
+
+    def _poll_export(self):
+
+        queue = self._export_queue
+
+        try:
+            finished = queue.poll()
+        except Exception as e:
+            # building a job failed, e.g. a shape that cannot be serialized
+            queue.cancel()
+            self._finish_export()
+            error(f"Export failed: {type(e).__name__}: {e}")
+            return
+
+        for name, ok, rv in finished:
+            if not ok:
+                error(f"Export of {name} failed: {rv.type_name}: {rv}")
+
+        self._export_progress.setValue(queue.finished)
+
+        if queue.done():
+            info(f"Exported {queue.finished} files")
+            self._finish_export()
+
+    def _finish_export(self):
+
+        self._export_timer.stop()
+        self._export_queue = None
+
+        progress, self._export_progress = self._export_progress, None
+        if progress:
+            progress.canceled.disconnect(self.cancel_export)
+            progress.close()
+
     @Slot()
     def handleSelection(self):
 
         items = self.tree.selectedItems()
         if len(items) == 0:
-            self._export_STL_action.setEnabled(False)
-            self._export_STEP_action.setEnabled(False)
+            for action in self._export_actions:
+                action.setEnabled(False)
             return
 
         # emit list of all selected ais objects (might be empty)
@@ -415,8 +801,8 @@ class ObjectTree(QWidget, ComponentMixin):
         # handle context menu and emit last selected CQ  object (if present)
         item = items[-1]
         if item.parent() is self.CQ:
-            self._export_STL_action.setEnabled(True)
-            self._export_STEP_action.setEnabled(True)
+            for action in self._export_actions:
+                action.setEnabled(True)
             self._clear_current_action.setEnabled(True)
             self.sigCQObjectSelected.emit(item.shape)
             # self.properties_editor.setParameters(item.properties, showTop=False)
@@ -424,11 +810,11 @@ class ObjectTree(QWidget, ComponentMixin):
             self.properties_editor.setParameters(item.properties, showTop=False)
             self.properties_editor.setEnabled(True)
         elif item is self.CQ and item.childCount() > 0:
-            self._export_STL_action.setEnabled(True)
-            self._export_STEP_action.setEnabled(True)
+            for action in self._export_actions:
+                action.setEnabled(True)
         else:
-            self._export_STL_action.setEnabled(False)
-            self._export_STEP_action.setEnabled(False)
+            for action in self._export_actions:
+                action.setEnabled(False)
             self._clear_current_action.setEnabled(False)
             self.properties_editor.setEnabled(False)
             self.properties_editor.clear()
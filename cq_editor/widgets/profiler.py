@@ -0,0 +1,245 @@
+# 渲染流程性能分析面板
+from PySide6.QtCore import Qt, Slot, QRectF
+from PySide6.QtGui import QAction, QColor, QPainter
+from PySide6.QtWidgets import (
+    QWidget,
+    QTableWidget,
+    QTableWidgetItem,
+    QAbstractItemView,
+    QHeaderView,
+)
+from pyqtgraph.parametertree import Parameter
+import qtawesome as qta
+
+from ..mixins import ComponentMixin
+from ..profiling import PROFILER
+from ..utils import layout, splitter
+
+STAGES = (
+    "reload_cq",
+    "compile_code",
+    "_exec",
+    "find_cq_objects",
+    "worker",
+    "from_brep",
+    "make_AIS",
+    "tessellation",
+    "display_many",
+    "fit/redraw",
+)
+
+
+class _NumberItem(QTableWidgetItem):
+
+    def __lt__(self, other):
+
+        return self.data(Qt.UserRole) < other.data(Qt.UserRole)
+
+
+def number_item(value, fmt="{:.1f}"):
+
+    item = _NumberItem(fmt.format(value))
+    item.setData(Qt.UserRole, value)
+    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+
+    return item
+
+
+class Timeline(QWidget):
+    """Gantt-like chart of the stages of a run, one row per stage."""
+
+    ROW_HEIGHT = 18
+
+    def __init__(self, parent):
+
+        super(Timeline, self).__init__(parent)
+
+        self.run = None
+        self.setMinimumHeight(self.ROW_HEIGHT * 4)
+
+    def set_run(self, run):
+
+        self.run = run
+
+        rows = len({name for name, _, _ in run.stages}) if run else 3
+        self.setMinimumHeight(self.ROW_HEIGHT * (rows + 1))
+        self.update()
+
+    def paintEvent(self, event):
+
+        painter = QPainter(self)
+        painter.fillRect(self.rect(), self.palette().base())
+
+        run = self.run
+        if run is None or run.total <= 0:
+            return
+
+        names = list(dict.fromkeys(name for name, _, _ in run.stages))
+        label_width = 110
+        width = max(1, self.width() - label_width - 4)
+        scale = width / run.total
+
+        painter.setPen(self.palette().text().color())
+        for i, name in enumerate(names):
+            painter.drawText(
+                QRectF(2, i * self.ROW_HEIGHT, label_width - 4, self.ROW_HEIGHT),
+                Qt.AlignVCenter | Qt.AlignLeft,
+                name,
+            )
+
+        color = QColor(244, 168, 36)
+        for name, offset, duration in run.stages:
+            i = names.index(name)
+            painter.fillRect(
+                QRectF(
+                    label_width + offset * scale,
+                    i * self.ROW_HEIGHT + 3,
+                    max(1.0, duration * scale),
+                    self.ROW_HEIGHT - 6,
+                ),
+                color,
+            )
+
+        painter.drawText(
+            QRectF(label_width, len(names) * self.ROW_HEIGHT, width, self.ROW_HEIGHT),
+            Qt.AlignVCenter | Qt.AlignRight,
+            f"{1e3 * run.total:.1f} ms",
+        )
+
+
+class ProfilerPane(QWidget, ComponentMixin):
+
+    name = "Profiler"
+
+    preferences = Parameter.create(
+        name="Preferences",
+        children=[
+            {"name": "Profile user script (cProfile)", "type": "bool", "value": False},
+            {
+                "name": "History length",
+                "type": "int",
+                "value": 50,
+                "limits": (1, 10000),
+            },
+        ],
+    )
+
+    def __init__(self, parent):
+
+        super(ProfilerPane, self).__init__(parent)
+        ComponentMixin.__init__(self)
+
+        self.runs = []
+
+        self.history = QTableWidget(0, len(STAGES) + 2, self)
+        self.history.setHorizontalHeaderLabels(["Run", "Total [ms]", *STAGES])
+        self.history.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.history.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.history.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.history.verticalHeader().setVisible(False)
+
+        self.timeline = Timeline(self)
+
+        self.stats = QTableWidget(0, 4, self)
+        self.stats.setHorizontalHeaderLabels(
+            ["Function", "Calls", "Own [ms]", "Cumulative [ms]"]
+        )
+        self.stats.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.stats.verticalHeader().setVisible(False)
+        self.stats.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+
+        layout(
+            self,
+            (
+                splitter(
+                    (self.history, self.timeline, self.stats),
+                    stretch_factors=(2, 1, 2),
+                    orientation=Qt.Vertical,
+                ),
+            ),
+            top_widget=self,
+        )
+
+        self._actions = {
+            "Tools": [
+                QAction(
+                    qta.icon("fa5s.trash"),
+                    "Clear profiles",
+                    self,
+                    triggered=self.clear,
+                )
+            ]
+        }
+
+        self.history.itemSelectionChanged.connect(self.handleSelection)
+        PROFILER.listeners.append(self.addRun)
+
+        self.updatePreferences()
+
+    def updatePreferences(self, *args):
+
+        PROFILER.capture = self.preferences["Profile user script (cProfile)"]
+
+        self._trim()
+
+    def toolbarActions(self):
+
+        return []
+
+    def addRun(self, run):
+
+        self.runs.append(run)
+
+        row = self.history.rowCount()
+        self.history.insertRow(row)
+        self.history.setItem(row, 0, QTableWidgetItem(run.label))
+        self.history.setItem(row, 1, number_item(1e3 * run.total))
+
+        totals = run.totals()
+        for col, name in enumerate(STAGES, 2):
+            if name in totals:
+                self.history.setItem(row, col, number_item(1e3 * totals[name]))
+
+        self._trim()
+        self.history.selectRow(self.history.rowCount() - 1)
+
+    @Slot()
+    def clear(self):
+
+        self.runs = []
+        self.history.setRowCount(0)
+        self.timeline.set_run(None)
+        self.stats.setRowCount(0)
+
+    @Slot()
+    def handleSelection(self):
+
+        rows = self.history.selectionModel().selectedRows()
+        run = self.runs[rows[0].row()] if rows else None
+
+        self.timeline.set_run(run)
+        self.show_stats(run.stats if run else [])
+
+    def show_stats(self, rows):
+
+        stats = self.stats
+
+        stats.setSortingEnabled(False)
+        stats.setRowCount(len(rows))
+
+        for i, (function, ncalls, tottime, cumtime) in enumerate(rows):
+            stats.setItem(i, 0, QTableWidgetItem(function))
+            stats.setItem(i, 1, number_item(ncalls, "{}"))
+            stats.setItem(i, 2, number_item(1e3 * tottime, "{:.2f}"))
+            stats.setItem(i, 3, number_item(1e3 * cumtime, "{:.2f}"))
+
+        stats.setSortingEnabled(True)
+        stats.sortByColumn(3, Qt.DescendingOrder)
+
+    def _trim(self):
+
+        excess = len(self.runs) - self.preferences["History length"]
+
+        for _ in range(max(0, excess)):
+            self.runs.pop(0)
+            self.history.removeRow(0)
@@ -1,37 +1,10 @@
 from PySide6.QtWidgets import QPlainTextEdit, QWidget, QVBoxLayout, QTextEdit, QHBoxLayout, QFrame
-from PySide6.QtGui import QColor, QPainter, QTextFormat, QFont, QSyntaxHighlighter, QTextCharFormat
+from PySide6.QtGui import QColor, QPainter, QTextFormat, QFont
 from PySide6.QtCore import Qt, QRect, QSize, Signal
 
-class PythonHighlighter(QSyntaxHighlighter):
-    def __init__(self, document):
-        super().__init__(document)
-        self._highlighting_rules = []
-        keyword_format = QTextCharFormat()
-        keyword_format.setForeground(QColor("#0077aa"))
-        keyword_format.setFontWeight(QFont.Bold)
-        keywords = [
-            "and", "as", "assert", "break", "class", "continue", "def", "del", "elif", "else",
-            "except", "False", "finally", "for", "from", "global", "if", "import", "in", "is", "lambda",
-            "None", "nonlocal", "not", "or", "pass", "raise", "return", "True", "try", "while", "with", "yield"
-        ]
-        for word in keywords:
-            self._highlighting_rules.append((rf"\\b{word}\\b", keyword_format))
-        # 字符串
-        string_format = QTextCharFormat()
-        string_format.setForeground(QColor("#bb6600"))
-        self._highlighting_rules.append((r'".*?"', string_format))
-        self._highlighting_rules.append((r"'.*?'", string_format))
-        # 注释
-        comment_format = QTextCharFormat()
-        comment_format.setForeground(QColor("#888888"))
-        self._highlighting_rules.append((r"#.*", comment_format))
+from .highlighter import PythonHighlighter
 
-    def highlightBlock(self, text):
-        import re
-        for pattern, fmt in self._highlighting_rules:
-            for match in re.finditer(pattern, text):
-                start, end = match.span()
-                self.setFormat(start, end - start, fmt)
+LARGE_FILE_LINES = 20000  # large-file mode above this number of lines
 
 class LineNumberArea(QWidget):
     def __init__(self, editor):
@@ -43,49 +16,91 @@ class LineNumberArea(QWidget):
         self.code_editor.line_number_area_paint_event(event)
 
 class SimpleCodeEditor(QPlainTextEdit):
+    """纯文本代码编辑器
+
+    超过 large_file_lines 行时自动进入大文件模式：只高亮可见的行，
+    行号区域只在滚动或整体刷新时重绘。
+    """
+    large_file_lines = LARGE_FILE_LINES
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setFont(QFont("Monaco", 12))
+        self.large_file = False
+        self._margin = None
+        self._current_line = None
+        self._text = None  # 缓存的文档文本，文档修改时失效
         self.line_number_area = LineNumberArea(self)
         self.blockCountChanged.connect(self.update_line_number_area_width)
         self.updateRequest.connect(self.update_line_number_area)
         self.cursorPositionChanged.connect(self.highlight_current_line)
+        self.document().contentsChanged.connect(self._invalidate_text)
+        self.verticalScrollBar().valueChanged.connect(self.highlight_viewport)
+        self.highlighter = PythonHighlighter(self.document())
         self.update_line_number_area_width(0)
         self.highlight_current_line()
-        self.highlighter = PythonHighlighter(self.document())
     def line_number_area_width(self):
         digits = len(str(max(1, self.blockCount())))
         return 10 + self.fontMetrics().horizontalAdvance("9") * digits
     def update_line_number_area_width(self, _):
-        self.setViewportMargins(self.line_number_area_width(), 0, 0, 0)
+        width = self.line_number_area_width()
+        if width != self._margin:
+            self._margin = width
+            self.setViewportMargins(width, 0, 0, 0)
+        self.update_large_file_mode()
     def update_line_number_area(self, rect, dy):
         if dy:
             self.line_number_area.scroll(0, dy)
-        else:
+        elif not self.large_file or rect.width() >= self.viewport().width():
+            # 大文件模式下忽略光标闪烁等局部刷新
             self.line_number_area.update(0, rect.y(), self.line_number_area.width(), rect.height())
         if rect.contains(self.viewport().rect()):
             self.update_line_number_area_width(0)
+    def update_large_file_mode(self, blocks=None):
+        """根据行数开启或关闭大文件模式"""
+        if blocks is None:
+            blocks = self.blockCount()
+        large_file = blocks > self.large_file_lines
+        if large_file != self.large_file:
+            self.large_file = large_file
+            self.highlighter.set_lazy(large_file)
+            self.highlight_viewport()
+    def highlight_viewport(self, *args):
+        """大文件模式下只高亮可见的行"""
+        if not self.large_file:
+            return
+        block = self.firstVisibleBlock()
+        first = block.blockNumber()
+        lines = self.viewport().height() // max(1, self.fontMetrics().height())
+        self.highlighter.highlight_blocks(first, first + lines + 1)
     def resizeEvent(self, event):
         super().resizeEvent(event)
         cr = self.contentsRect()
         self.line_number_area.setGeometry(QRect(cr.left(), cr.top(), self.line_number_area_width(), cr.height()))
+        self.highlight_viewport()
     def line_number_area_paint_event(self, event):
         painter = QPainter(self.line_number_area)
         painter.fillRect(event.rect(), QColor("#f0f0f0"))
+        painter.setPen(QColor("#888888"))
+        width = self.line_number_area.width() - 2
+        height = self.fontMetrics().height()
+        rect = event.rect()
         block = self.firstVisibleBlock()
         block_number = block.blockNumber()
         top = int(self.blockBoundingGeometry(block).translated(self.contentOffset()).top())
         bottom = top + int(self.blockBoundingRect(block).height())
-        while block.isValid() and top <= event.rect().bottom():
-            if block.isVisible() and bottom >= event.rect().top():
-                number = str(block_number + 1)
-                painter.setPen(QColor("#888888"))
-                painter.drawText(0, top, self.line_number_area.width() - 2, self.fontMetrics().height(), Qt.AlignRight, number)
+        while block.isValid() and top <= rect.bottom():
+            if block.isVisible() and bottom >= rect.top():
+                painter.drawText(0, top, width, height, Qt.AlignRight, str(block_number + 1))
             block = block.next()
             top = bottom
             bottom = top + int(self.blockBoundingRect(block).height())
             block_number += 1
     def highlight_current_line(self):
+        # 整行高亮只在光标换行时需要更新
+        line = self.textCursor().blockNumber()
+        if line == self._current_line and self.extraSelections():
+            return
+        self._current_line = line
         extra_selections = []
         if not self.isReadOnly():
             selection = QTextEdit.ExtraSelection()
@@ -96,10 +111,18 @@ class SimpleCodeEditor(QPlainTextEdit):
             selection.cursor.clearSelection()
             extra_selections.append(selection)
         self.setExtraSelections(extra_selections)
+    def _invalidate_text(self):
+        self._text = None
     def get_text_with_eol(self):
-        return self.toPlainText()
+        """文档文本，文档未修改时不会重新复制"""
+        if self._text is None:
+            self._text = self.toPlainText()
+        return self._text
     def set_text(self, text):
+        # 在设置文本前切换模式，避免高亮整个大文件
+        self.update_large_file_mode(text.count("\n") + 1)
         self.setPlainText(text)
+        self.highlight_viewport()
     def get_selected_text(self):
         return self.textCursor().selectedText()
     def get_cursor_line_number(self):
@@ -6,6 +6,7 @@ from PySide6.QtWidgets import QWidget, QTreeWidget, QTreeWidgetItem, QLabel
 from PySide6.QtCore import Qt, Slot, Signal
 from PySide6.QtGui import QFontMetrics, QAction
 
+from ..execution import RemoteError
 from ..mixins import ComponentMixin
 from ..utils import layout
 
@@ -66,9 +67,13 @@ class TracebackPane(QWidget, ComponentMixin):
             root = self.tree.root
             code = code.splitlines()
 
-            for el in dropwhile(
-                lambda el: "string>" not in el.filename, extract_tb(tb)
-            ):
+            # errors raised in worker processes carry their own frame summaries
+            if isinstance(exc, RemoteError):
+                frames = exc.summary()
+            else:
+                frames = extract_tb(tb)
+
+            for el in dropwhile(lambda el: "string>" not in el.filename, frames):
                 # workaround of the traceback module
                 if el.line == "":
                     line = code[el.lineno - 1].strip()
@@ -77,7 +82,7 @@ class TracebackPane(QWidget, ComponentMixin):
 
                 root.addChild(QTreeWidgetItem([el.filename, str(el.lineno), line]))
 
-            exc_name = t.__name__
+            exc_name = exc.type_name if isinstance(exc, RemoteError) else t.__name__
             exc_msg = str(exc)
             exc_msg = exc_msg.replace("<", "&lt;").replace(">", "&gt;")  # replace <>
 
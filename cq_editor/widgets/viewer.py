@@ -1,5 +1,8 @@
+from time import perf_counter
+from types import SimpleNamespace
+
 from OCC.Display.backend import load_backend
-from PySide6.QtCore import Signal
+from PySide6.QtCore import Signal, QTimer
 from PySide6.QtGui import QIcon
 from OCC.Core.Graphic3d import (
     Graphic3d_MaterialAspect,
@@ -14,6 +17,20 @@ from OCC.Core.AIS import AIS_Shaded, AIS_WireFrame, AIS_ColoredShape, AIS_Axis,
 from OCC.Core.Geom import Geom_Axis1Placement
 from OCC.Core.gp import gp_Ax3, gp_Dir, gp_Pnt, gp_Ax1
 from ..cq_utils import to_occ_color, make_AIS
+from ..tessellation import (
+    TESSELLATION_CACHE,
+    DEFAULT_BUDGET,
+    LOD_FACTORS,
+    bounding_size,
+    configure_executor,
+    copy_geometry,
+    executor,
+    is_meshed,
+    lod_level,
+    lod_tolerances,
+    mesh_shape,
+)
+from ..profiling import PROFILER
 from ..utils import layout, get_save_filename
 from ..icons import icon
 load_backend("pyside6")
@@ -55,6 +72,21 @@ class OCCViewer(qtViewer3d, ComponentMixin):
                 "dec": True,
                 "step": 1,
             },
+            {"name": "Progressive tessellation", "type": "bool", "value": False},
+            {"name": "Background tessellation", "type": "bool", "value": False},
+            {
+                "name": "Tessellation threads",
+                "type": "int",
+                "value": 0,
+                "limits": (0, 256),
+                "tip": "0 means one thread per core",
+            },
+            {"name": "Tessellation cache", "type": "bool", "value": True},
+            {
+                "name": "Tessellation cache size (triangles)",
+                "type": "int",
+                "value": DEFAULT_BUDGET,
+            },
             {
                 "name": "Projection Type",
                 "type": "list",
@@ -86,6 +118,7 @@ class OCCViewer(qtViewer3d, ComponentMixin):
     IMAGE_EXTENSIONS = "png"
 
     sigObjectSelected = Signal(list)
+    sigMeshReady = Signal(object, object, int, object)
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -101,10 +134,19 @@ class OCCViewer(qtViewer3d, ComponentMixin):
         # self.layout_ = layout(self, [self], top_widget=self, margin=0)
         # 4、初始化默认显示参数（必须在context初始化之后）
         self.setup_default_drawer()
+        self._tessellation_threads = None
         self.updatePreferences()
         self.displayed_shapes = []
         self.displayed_ais = []
-        
+
+        self._update_timer = QTimer(self, singleShot=True, interval=0)
+        self._update_timer.timeout.connect(self._flush_update)
+
+        # progressive tessellation state of the displayed AIS_Shapes
+        self._lod = {}
+        self._lod_timer = QTimer(self, singleShot=True, interval=250)
+        self._lod_timer.timeout.connect(self._refine_visible)
+        self.sigMeshReady.connect(self._mesh_ready)
 
         # self._display.create_windows()
         
@@ -146,6 +188,19 @@ class OCCViewer(qtViewer3d, ComponentMixin):
         ctx.SetDeviationCoefficient(self.preferences["Deviation"])
         ctx.SetDeviationAngle(self.preferences["Angular deviation"])
 
+        TESSELLATION_CACHE.configure(
+            self.preferences["Tessellation cache"],
+            self.preferences["Tessellation cache size (triangles)"],
+            self.preferences["Deviation"],
+            self.preferences["Angular deviation"],
+            self.preferences["Progressive tessellation"],
+            self.preferences["Background tessellation"],
+        )
+
+        if self.preferences["Tessellation threads"] != self._tessellation_threads:
+            self._tessellation_threads = self.preferences["Tessellation threads"]
+            configure_executor(self._tessellation_threads)
+
         v = self._get_view()
         camera = v.Camera()
         projection_type = self.preferences["Projection Type"]
@@ -255,6 +310,7 @@ class OCCViewer(qtViewer3d, ComponentMixin):
     
     def clear(self):
 
+        self._lod.clear()
         self.displayed_shapes = []
         self.displayed_ais = []
         self.context.EraseAll(True)
@@ -285,66 +341,191 @@ class OCCViewer(qtViewer3d, ComponentMixin):
     @Slot(list)
     @Slot(list, bool)
     def display_many(self, ais_list, fit=None):
-        print("[DEBUG] Received in display_many:", ais_list)
-        print("[DEBUG] ais_list type:", type(ais_list))
-        print("[DEBUG] ais_list length:", len(ais_list) if ais_list else 0)
-        print("[DEBUG] view object:", self.view)
-        print("[DEBUG] view.IsEmpty():", self.view.IsEmpty())
-        
+        """Display a batch of objects with a single redraw at the end."""
+
         if not ais_list:
-            print("[DEBUG] ais_list is empty, nothing to display")
+            # e.g. the end of a stream of objects that were already displayed
+            if fit:
+                self.fit()
             return
-            
+
+        t0 = perf_counter()
+
         context = self._get_context()
-        # 清除旧内容（不立即刷新）
-        context.EraseAll(True)
-        
-        # 显示新对象
-        for i, ais in enumerate(ais_list):
-            print(f"[DEBUG] Processing ais {i}:", type(ais))
-            try:
-                if isinstance(ais, AIS_InteractiveObject):
-                    print(f"[DEBUG] Displaying AIS_InteractiveObject {i}")
-                    context.Display(ais, True)
-                else:
-                    print(f"[DEBUG] Creating AIS for object {i}")
-                    ais_obj, _ = make_AIS(ais)
-                    print(f"[DEBUG] Created AIS object {i}:", type(ais_obj))
-                    context.Display(ais_obj, True)
-            except Exception as e:
-                print(f"[DEBUG] Error displaying object {i}:", e)
-                import traceback
-                traceback.print_exc()
-        
-        # 强制刷新视图
-        self.view.Redraw()
-        self.view.Update()
-        
-        # 自动缩放视图
-        if self.preferences["Fit automatically"] and fit is None:
-            print("[DEBUG] Auto-fitting view")
-            self.fit()
-        elif fit:
-            print("[DEBUG] Manual fitting view")
-            self.fit()
-        
-        print("[DEBUG] display_many completed")
+        progressive = self.preferences["Progressive tessellation"]
+
+        # 显示新对象, the viewer is not updated per object
+        with PROFILER.stage("display_many"):
+            for ais in ais_list:
+                try:
+                    if not isinstance(ais, AIS_InteractiveObject):
+                        ais, _ = make_AIS(ais)
+                    if progressive:
+                        self._start_lod(ais)
+                    context.Display(ais, False)
+                except Exception:
+                    self._logger.exception("Cannot display object")
+
+        # 自动缩放视图, FitAll redraws so no separate update is needed
+        with PROFILER.stage("fit/redraw"):
+            if fit or (fit is None and self.preferences["Fit automatically"]):
+                self._update_timer.stop()
+                self.fit()
+            else:
+                self._flush_update()
+
+        # refinement depends on the on-screen size, i.e. on the fitted view
+        if self._lod:
+            self._lod_timer.start()
+
+        self._logger.info(
+            f"Displayed {len(ais_list)} objects in {1e3 * (perf_counter() - t0):.1f} ms"
+        )
+
+    def _request_update(self):
+        """Coalesce all erase/display calls of the current event loop turn."""
+
+        self._update_timer.start()
+
+    @Slot()
+    def _flush_update(self):
+
+        self._update_timer.stop()
+        self._get_context().UpdateCurrentViewer()
 
     @Slot(QTreeWidgetItem, int)
     def update_item(self, item, col):
 
         ctx = self._get_context()
         if item.checkState(0):
-            ctx.Display(item.ais, True)
+            ctx.Display(item.ais, False)
         else:
-            ctx.Erase(item.ais, True)
+            ctx.Erase(item.ais, False)
+
+        self._request_update()
 
     @Slot(list)
     def remove_items(self, ais_items):
 
         ctx = self._get_context()
         for ais in ais_items:
-            ctx.Erase(ais, True)
+            ctx.Erase(ais, False)
+            self._lod.pop(ais, None)
+
+        self._request_update()
+
+    def _start_lod(self, ais):
+        """Display ais with the coarsest level, finer ones follow later."""
+
+        # colored shapes (assemblies) own several sub-shapes, skip them
+        if not isinstance(ais, AIS_Shape) or isinstance(ais, AIS_ColoredShape):
+            return
+
+        deviation = self.preferences["Deviation"]
+        angular_deviation = self.preferences["Angular deviation"]
+
+        shape = ais.Shape()
+
+        # e.g. a tessellation cache hit
+        if is_meshed(shape, deviation):
+            return
+
+        ais.SetOwnDeviationCoefficient(deviation * LOD_FACTORS[0])
+        ais.SetOwnDeviationAngle(lod_tolerances(0, deviation, angular_deviation)[1])
+
+        self._lod[ais] = SimpleNamespace(
+            base_shape=shape, size=bounding_size(shape), level=0, pending=None
+        )
+
+    def _view_size(self, ais):
+        """Extent of the view at the distance of ais, in model units."""
+
+        view = self._get_view()
+        size = max(view.Size())
+
+        camera = view.Camera()
+        if not camera.IsOrthographic():
+            center = ais.BoundingBox().Center()
+            size *= camera.Eye().Distance(center) / camera.Distance()
+
+        return size
+
+    @Slot()
+    def _refine_visible(self):
+        """Request finer levels for objects that grew on screen."""
+
+        deviation = self.preferences["Deviation"]
+        angular_deviation = self.preferences["Angular deviation"]
+
+        # callbacks of finished futures run right away and may modify _lod
+        for ais, state in list(self._lod.items()):
+            level = lod_level(state.size, self._view_size(ais))
+
+            if level <= state.level or state.pending is not None:
+                continue
+
+            # mesh a copy so that the displayed shape is never touched by the pool
+            shape = copy_geometry(state.base_shape)
+            future = executor().submit(
+                mesh_shape, shape, *lod_tolerances(level, deviation, angular_deviation)
+            )
+            state.pending = level
+
+            future.add_done_callback(
+                lambda f, ais=ais, shape=shape, level=level: self.sigMeshReady.emit(
+                    ais, shape, level, f
+                )
+            )
+
+    @Slot(object, object, int, object)
+    def _mesh_ready(self, ais, shape, level, future):
+
+        state = self._lod.get(ais)
+
+        # removed or superseded in the meantime
+        if state is None or state.pending != level:
+            return
+
+        state.pending = None
+
+        try:
+            ntriangles = future.result()
+        except Exception:
+            self._logger.exception("Cannot refine tessellation")
+            return
+
+        deviation, angular_deviation = lod_tolerances(
+            level, self.preferences["Deviation"], self.preferences["Angular deviation"]
+        )
+
+        ais.SetShape(shape)
+        ais.SetOwnDeviationCoefficient(deviation)
+        ais.SetOwnDeviationAngle(angular_deviation)
+
+        ctx = self._get_context()
+        if ctx.IsDisplayed(ais):
+            ctx.Redisplay(ais, False)
+            self._request_update()
+
+        state.level = level
+
+        if level == len(LOD_FACTORS) - 1:
+            TESSELLATION_CACHE.finish(state.base_shape, shape, ntriangles)
+            del self._lod[ais]
+
+    def wheelEvent(self, event):
+
+        super().wheelEvent(event)
+
+        if self._lod:
+            self._lod_timer.start()
+
+    def mouseReleaseEvent(self, event):
+
+        super().mouseReleaseEvent(event)
+
+        if self._lod:
+            self._lod_timer.start()
 
     @Slot()
     def redraw(self):
@@ -354,6 +535,9 @@ class OCCViewer(qtViewer3d, ComponentMixin):
     def fit(self):
         self.view.FitAll()
 
+        if self._lod:
+            self._lod_timer.start()
+
     def iso_view(self):
 
         v = self._get_view()
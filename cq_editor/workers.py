@@ -0,0 +1,259 @@
+"""Pool of pre-warmed worker processes used to run scripts out of process.
+
+Workers are plain multiprocessing processes talking over a pipe. They import
+cadquery once at start-up, so submitting a job does not pay the import cost.
+A job can be cancelled at any time, which terminates its worker and spawns a
+fresh replacement.
+"""
+
+import multiprocessing as mp
+import sys
+from time import monotonic
+
+from .execution import RemoteError
+
+# fork is not safe in a process running a Qt event loop
+_CONTEXT = mp.get_context("spawn")
+
+
+def _worker_main(conn):
+
+    # warm up
+    import cadquery
+    from . import execution
+
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if job is None:
+            break
+
+        func, args, kwargs = job
+
+        try:
+            rv = (True, func(*args, **kwargs))
+        except Exception:
+            rv = (False, RemoteError.from_exc_info(sys.exc_info()))
+
+        conn.send(rv)
+
+
+class _Worker(object):
+
+    def __init__(self):
+
+        self.conn, child_conn = _CONTEXT.Pipe()
+        self.process = _CONTEXT.Process(
+            target=_worker_main, args=(child_conn,), daemon=True
+        )
+        self.process.start()
+
+        child_conn.close()
+
+    def alive(self):
+
+        return self.process.is_alive()
+
+    def stop(self):
+
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+
+        self.kill()
+
+    def kill(self):
+
+        self.process.terminate()
+        self.process.join(1)
+        self.conn.close()
+
+
+class Job(object):
+
+    def __init__(self, pool, worker, func, args, kwargs):
+
+        self._pool = pool
+        self._worker = worker
+        self._result = None
+        self._done = False
+
+        self.started = monotonic()
+
+        worker.conn.send((func, args, kwargs))
+
+    def elapsed(self):
+
+        return monotonic() - self.started
+
+    def done(self):
+
+        if self._done:
+            return True
+
+        worker = self._worker
+
+        try:
+            ready = worker.conn.poll()
+        except (OSError, ValueError):
+            ready = False
+
+        if ready:
+            try:
+                self._result = worker.conn.recv()
+                self._pool._release(worker)
+            except (EOFError, OSError):
+                self._result = self._crashed()
+        elif not worker.alive():
+            self._result = self._crashed()
+        else:
+            return False
+
+        self._done = True
+        return True
+
+    def result(self):
+        """Value returned by the job; raises RemoteError if it failed."""
+
+        ok, rv = self._result
+
+        if not ok:
+            raise rv
+
+        return rv
+
+    def cancel(self):
+
+        if not self._done:
+            self._done = True
+            self._result = (False, RemoteError("Cancelled", "Job was cancelled"))
+            self._pool._discard(self._worker)
+
+    def _crashed(self):
+
+        code = self._worker.process.exitcode
+        self._pool._discard(self._worker)
+
+        return (
+            False,
+            RemoteError("WorkerCrashed", f"Worker process died (exit code {code})"),
+        )
+
+
+class WorkerPool(object):
+
+    def __init__(self, size=2):
+
+        self.size = max(1, size)
+
+        self._idle = []
+        self._busy = set()
+
+    def start(self):
+
+        while len(self._idle) + len(self._busy) < self.size:
+            self._idle.append(_Worker())
+
+    def submit(self, func, *args, **kwargs) -> Job:
+        """Run func(*args, **kwargs) in a worker; func must be importable."""
+
+        self.start()
+
+        while True:
+            worker = self._idle.pop(0) if self._idle else _Worker()
+            if worker.alive():
+                break
+            worker.kill()
+
+        self._busy.add(worker)
+
+        return Job(self, worker, func, args, kwargs)
+
+    def shutdown(self):
+
+        for worker in self._idle + list(self._busy):
+            worker.stop()
+
+        self._idle = []
+        self._busy = set()
+
+    def _release(self, worker):
+
+        self._busy.discard(worker)
+
+        if len(self._idle) < self.size:
+            self._idle.append(worker)
+        else:
+            worker.stop()
+
+    def _discard(self, worker):
+
+        self._busy.discard(worker)
+        worker.kill()
+
+        # keep the pool warm
+        self.start()
+
+
+class JobQueue(object):
+    """Runs many jobs on a WorkerPool, at most pool.size of them at a time.
+
+    jobs is an iterable of (tag, func, args) tuples, consumed only as workers
+    become free, so that a generator can defer building expensive arguments;
+    total is required if jobs has no length. poll() has to be called
+    periodically; it returns (tag, ok, value) for every job finished since the
+    last call, value being the return value or the RemoteError.
+    """
+
+    def __init__(self, pool, jobs, total=None):
+
+        self._pool = pool
+        self._pending = iter(jobs)
+        self._running = []
+
+        self.total = len(jobs) if total is None else total
+        self.submitted = 0
+        self.finished = 0
+        self.cancelled = False
+
+    def done(self):
+
+        return not self._running and (self.cancelled or self.submitted == self.total)
+
+    def poll(self):
+
+        rv = []
+
+        for tag, job in list(self._running):
+            if job.done():
+                self._running.remove((tag, job))
+                self.finished += 1
+                try:
+                    rv.append((tag, True, job.result()))
+                except RemoteError as e:
+                    rv.append((tag, False, e))
+
+        while (
+            not self.cancelled
+            and self.submitted < self.total
+            and len(self._running) < self._pool.size
+        ):
+            tag, func, args = next(self._pending)
+            self.submitted += 1
+            self._running.append((tag, self._pool.submit(func, *args)))
+
+        return rv
+
+    def cancel(self):
+
+        self.cancelled = True
+        self._pending = iter(())
+
+        for _, job in self._running:
+            job.cancel()
+
+        self._running = []
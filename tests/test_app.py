@@ -1710,3 +1710,1296 @@ def test_light_dark_mode(main):
 
     # Check that the dark mode stylesheet is different from the light mode stylesheet
     assert dark_bg != light_bg
+
+
+def test_tessellation_cache(main):
+
+    from cq_editor.tessellation import TESSELLATION_CACHE
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    viewer = win.components["viewer"]
+
+    editor.set_text(code_multi)
+    debugger._actions["Run"][0].triggered.emit()
+
+    # re-rendering unchanged geometry hits the cache for every object
+    hits, misses = TESSELLATION_CACHE.stats()
+    debugger._actions["Run"][0].triggered.emit()
+    assert TESSELLATION_CACHE.stats() == (hits + 2, misses)
+
+    # changing the tolerances invalidates the cached triangulation
+    viewer.preferences["Deviation"] = 1e-3
+    debugger._actions["Run"][0].triggered.emit()
+    assert TESSELLATION_CACHE.stats() == (hits + 2, misses + 2)
+
+    # disabling the cache drops all entries
+    viewer.preferences["Tessellation cache"] = False
+    assert len(TESSELLATION_CACHE) == 0
+
+
+code_infinite_loop = """while True:
+    pass
+"""
+
+
+def test_worker_pool(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    object_tree = win.components["object_tree"]
+    traceback_view = win.components["traceback_viewer"]
+
+    debugger.preferences["Execution backend"] = "Worker pool"
+    debugger.preferences["Worker pool size"] = 1
+
+    # shapes are transferred back from the worker as BREP
+    object_tree.removeObjects()
+    editor.set_text(code_multi)
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert debugger.is_running()
+    qtbot.waitUntil(lambda: object_tree.CQ.childCount() == 2, timeout=30000)
+    assert not debugger.is_running()
+
+    # errors are reported with the frames of the user script
+    editor.set_text(code_err1)
+    debugger._actions["Run"][0].triggered.emit()
+    qtbot.waitUntil(lambda: not debugger.is_running(), timeout=30000)
+    assert "SyntaxError" in traceback_view.current_exception.text()
+
+    # runaway scripts can be cancelled and the GUI stays responsive meanwhile
+    editor.set_text(code_infinite_loop)
+    debugger._actions["Run"][0].triggered.emit()
+    qtbot.wait(500)
+    assert debugger.is_running()
+
+    debugger._actions["Run"][-1].triggered.emit()
+    assert not debugger.is_running()
+
+    # ... or time out
+    debugger.preferences["Worker timeout (s)"] = 1
+    debugger._actions["Run"][0].triggered.emit()
+    qtbot.waitUntil(lambda: not debugger.is_running(), timeout=5000)
+    assert "TimeoutError" in traceback_view.current_exception.text()
+
+    debugger.preferences["Execution backend"] = "In-process"
+
+
+code_incremental = """import cadquery as cq
+base = cq.Workplane().box(1, 1, 1)
+result = base.edges("|Z").fillet(0.1)
+"""
+
+
+code_incremental_def = """import cadquery as cq
+def make(size):
+    box = cq.Workplane().box(size, size, size)
+    show_object(box, name="box")
+    log("made")
+make(1)
+"""
+
+
+code_incremental_assy = """import cadquery as cq
+assy = cq.Assembly()
+assy.add(cq.Workplane().box(1, 1, 1), name="a")
+parts = []
+parts.append(1)
+show_object(assy, name="assy")
+"""
+
+
+def test_incremental_execution(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    object_tree = win.components["object_tree"]
+    traceback_view = win.components["traceback_viewer"]
+
+    debugger.preferences["Incremental execution"] = True
+
+    editor.set_text(code_incremental)
+    debugger._actions["Run"][0].triggered.emit()
+    assert debugger._incremental.executed == 3
+
+    # nothing changed - only the import is redone
+    debugger._actions["Run"][0].triggered.emit()
+    assert debugger._incremental.executed == 1
+    assert debugger._incremental.reused == 2
+    assert object_tree.CQ.childCount() == 2
+
+    # only the edited statement and its dependents are re-executed
+    editor.set_text(code_incremental.replace("0.1", "0.2"))
+    debugger._actions["Run"][0].triggered.emit()
+    assert debugger._incremental.executed == 2
+    assert debugger._incremental.reused == 1
+    assert traceback_view.current_exception.text() == ""
+
+    # reused functions see the helpers injected into the current run
+    editor.set_text(code_incremental_def)
+    debugger._actions["Run"][0].triggered.emit()
+
+    editor.set_text(code_incremental_def.replace("make(1)", "make(2)"))
+    debugger._actions["Run"][0].triggered.emit()
+    assert traceback_view.current_exception.text() == ""
+    assert object_tree.CQ.child(0).properties["Name"] == "box"
+
+    # objects modified in place are rebuilt instead of being modified twice
+    editor.set_text(code_incremental_assy)
+    debugger._actions["Run"][0].triggered.emit()
+
+    editor.set_text(code_incremental_assy.replace('"assy"', '"assy2"'))
+    debugger._actions["Run"][0].triggered.emit()
+    assert traceback_view.current_exception.text() == ""
+    assert debugger._incremental.reused == 4
+
+    editor.set_text(
+        code_incremental_assy.replace("parts.append(1)", "parts.append(2)")
+        + 'assy.add(cq.Workplane().sphere(1), name="b")\n'
+    )
+    debugger._actions["Run"][0].triggered.emit()
+    editor.set_text(code_incremental_assy)
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert traceback_view.current_exception.text() == ""
+    assert debugger._incremental.reused == 0
+
+    assy = debugger._incremental._steps[-1].shown["assy"].shape
+    assert [child.name for child in assy.children] == ["a"]
+
+    debugger.preferences["Incremental execution"] = False
+
+
+def test_batch(tmp_path):
+
+    import json
+    from cq_editor.batch import main as batch_main
+
+    modify_file(code_show_Workplane_named, tmp_path.joinpath("good.py"))
+    modify_file(code_multi, tmp_path.joinpath("multi.py"))
+    modify_file(code_err2, tmp_path.joinpath("bad.py"))
+    modify_file("import os\nos._exit(3)\n", tmp_path.joinpath("crash.py"))
+
+    out = tmp_path.joinpath("out")
+    rv = batch_main(
+        [
+            str(tmp_path.joinpath("*.py")),
+            "-o",
+            str(out),
+            "-f",
+            "step",
+            "brep",
+            "-j",
+            "2",
+        ]
+    )
+
+    # failed scripts fail the run
+    assert rv == 1
+
+    with open(out.joinpath("manifest.json")) as f:
+        manifest = json.load(f)
+
+    results = {Path(r["script"]).name: r for r in manifest["scripts"]}
+
+    assert results["bad.py"]["status"] == "error"
+    assert "NameError" in results["bad.py"]["error"]
+
+    # a crashing worker only fails its own script
+    assert results["crash.py"]["status"] == "error"
+    assert "WorkerCrashed" in results["crash.py"]["error"]
+
+    assert results["good.py"]["status"] == "ok"
+    assert results["good.py"]["objects"][0]["name"] == "test"
+    assert "execute" in results["good.py"]["timings"]
+
+    # find_cq_objects fallback
+    assert len(results["multi.py"]["objects"]) == 2
+    assert out.joinpath("multi-result1.step").exists()
+    assert out.joinpath("multi-result2.brep").exists()
+
+    # scripts with the same name in different directories do not collide
+    for d in ("a", "b"):
+        tmp_path.joinpath(d).mkdir()
+        modify_file(code_show_Workplane_named, tmp_path.joinpath(d, "part.py"))
+
+    rv = batch_main([str(tmp_path.joinpath("*", "part.py")), "-o", str(out)])
+
+    assert rv == 0
+    assert out.joinpath("a", "part-test.step").exists()
+    assert out.joinpath("b", "part-test.step").exists()
+
+
+def test_export_each(main_multi, tmp_path):
+
+    qtbot, win = main_multi
+
+    obj_tree_comp = win.components["object_tree"]
+
+    # select all CQ objects and give one of them a custom STL tolerance
+    obj_tree_comp.tree.setCurrentItem(obj_tree_comp.CQ)
+    obj_tree_comp.CQ.child(0).properties["STL tolerance"] = 1e-3
+
+    obj_tree_comp.export_each("stl", str(tmp_path))
+    assert obj_tree_comp._export_progress is not None
+
+    qtbot.waitUntil(lambda: obj_tree_comp._export_queue is None, timeout=30000)
+
+    assert tmp_path.joinpath("result1.stl").exists()
+    assert tmp_path.joinpath("result2.stl").exists()
+
+    # the finer tolerance gives a bigger mesh
+    assert (
+        tmp_path.joinpath("result1.stl").stat().st_size
+        >= tmp_path.joinpath("result2.stl").stat().st_size
+    )
+
+    # names mapped to the same file do not overwrite each other
+    obj_tree_comp.CQ.child(0).properties["Name"] = "part/1"
+    obj_tree_comp.CQ.child(1).properties["Name"] = "part 1"
+
+    tmp_path.joinpath("same").mkdir()
+    obj_tree_comp.export_each("stl", str(tmp_path.joinpath("same")))
+    qtbot.waitUntil(lambda: obj_tree_comp._export_queue is None, timeout=30000)
+
+    assert tmp_path.joinpath("same", "part_1.stl").exists()
+    assert tmp_path.joinpath("same", "part_1_2.stl").exists()
+
+
+def test_export_each_error(main_multi, tmp_path, mocker):
+
+    qtbot, win = main_multi
+
+    obj_tree_comp = win.components["object_tree"]
+    log = win.components["log"]
+
+    mocker.patch(
+        "cq_editor.widgets.object_tree.to_brep", side_effect=ValueError("no BREP")
+    )
+
+    # a failure to build a job stops the export and is reported
+    obj_tree_comp.tree.setCurrentItem(obj_tree_comp.CQ)
+    obj_tree_comp.export_each("stl", str(tmp_path))
+
+    qtbot.waitUntil(lambda: obj_tree_comp._export_queue is None, timeout=30000)
+    assert "Export failed: ValueError: no BREP" in log.toPlainText()
+    assert obj_tree_comp._export_progress is None
+
+
+def test_display_many_batched(main_clean, mocker):
+
+    qtbot, win = main_clean
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    viewer = win.components["viewer"]
+    log = win.components["log"]
+
+    viewer.preferences["Fit automatically"] = False
+    flush = mocker.spy(viewer, "_flush_update")
+    fit = mocker.spy(viewer, "fit")
+
+    # 20 objects, but a single viewer update
+    editor.set_text(code_randcolor)
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert flush.call_count == 1
+    assert fit.call_count == 0
+
+    qtbot.wait(100)
+    assert "Displayed 20 objects" in log.toPlainText()
+
+    # with fitting the redraw is done by FitAll only
+    viewer.preferences["Fit automatically"] = True
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert flush.call_count == 1
+    assert fit.call_count == 1
+
+
+code_reconcile = """import cadquery as cq
+a = cq.Workplane().box(1, 1, 1)
+b = cq.Workplane().sphere(1)
+show_object(a, name="a")
+show_object(b, name="b", options=dict(color="red"))
+"""
+
+
+def test_reconcile_objects(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    obj_tree = win.components["object_tree"]
+
+    obj_tree.preferences["Reconcile objects on rerun"] = True
+
+    editor.set_text(code_reconcile)
+    debugger._actions["Run"][0].triggered.emit()
+
+    CQ = obj_tree.CQ
+    assert CQ.childCount() == 2
+    a, b = CQ.child(0), CQ.child(1)
+
+    # unchanged rerun keeps the items and their AIS objects
+    with qtbot.waitSignal(obj_tree.sigObjectsAdded) as blocker:
+        debugger._actions["Run"][0].triggered.emit()
+
+    assert blocker.args[0] == []
+    assert CQ.child(0) is a and CQ.child(1) is b
+
+    # options are updated in place
+    editor.set_text(code_reconcile.replace("red", "blue"))
+    with qtbot.waitSignal(obj_tree.sigObjectPropertiesChanged):
+        debugger._actions["Run"][0].triggered.emit()
+
+    assert CQ.child(1) is b
+    assert b.options == dict(color="blue")
+
+    # changed geometry replaces only the affected item
+    editor.set_text(code_reconcile.replace("box(1, 1, 1)", "box(2, 1, 1)"))
+    with qtbot.waitSignal(obj_tree.sigObjectsRemoved):
+        debugger._actions["Run"][0].triggered.emit()
+
+    assert CQ.childCount() == 2
+    assert CQ.child(0) is not a and CQ.child(1) is b
+
+
+def test_progressive_tessellation(main):
+
+    from cq_editor.tessellation import is_meshed
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    viewer = win.components["viewer"]
+    obj_tree = win.components["object_tree"]
+
+    viewer.preferences["Progressive tessellation"] = True
+    viewer.preferences["Fit automatically"] = True
+
+    editor.set_text("import cadquery as cq\nresult = cq.Workplane().sphere(10)")
+    debugger._actions["Run"][0].triggered.emit()
+
+    ais = obj_tree.CQ.child(0).ais
+    deviation = viewer.preferences["Deviation"]
+
+    # the fitted object fills the view, so the finest level is computed
+    qtbot.waitUntil(lambda: not viewer._lod, timeout=5000)
+    assert is_meshed(ais.Shape(), deviation)
+
+    viewer.preferences["Progressive tessellation"] = False
+
+
+def test_background_tessellation(main, mocker):
+
+    from cq_editor.tessellation import is_meshed
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    viewer = win.components["viewer"]
+    obj_tree = win.components["object_tree"]
+
+    viewer.preferences["Background tessellation"] = True
+    display_many = mocker.spy(viewer, "display_many")
+
+    editor.set_text(code_reconcile)
+    debugger._actions["Run"][0].triggered.emit()
+
+    # placeholders are shown first, the meshed objects follow
+    qtbot.waitUntil(lambda: not obj_tree._meshing, timeout=5000)
+
+    for i in range(obj_tree.CQ.childCount()):
+        ais = obj_tree.CQ.child(i).ais
+        assert is_meshed(ais.Shape(), viewer.preferences["Deviation"])
+        assert any(ais in call.args[0] for call in display_many.call_args_list)
+
+    viewer.preferences["Background tessellation"] = False
+
+
+def test_profiler(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    profiler = win.components["profiler"]
+
+    profiler.clear()
+    profiler.preferences["Profile user script (cProfile)"] = True
+
+    editor.set_text(code_reconcile)
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert len(profiler.runs) == 1
+
+    run = profiler.runs[0]
+    totals = run.totals()
+
+    for stage in ("compile_code", "_exec", "make_AIS", "display_many", "fit/redraw"):
+        assert stage in totals
+
+    assert run.total >= totals["_exec"]
+    assert run.stats and profiler.stats.rowCount() == len(run.stats)
+
+    # history is bounded
+    profiler.preferences["History length"] = 1
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert len(profiler.runs) == 1
+    assert profiler.history.rowCount() == 1
+
+    profiler.preferences["Profile user script (cProfile)"] = False
+    profiler.preferences["History length"] = 50
+
+
+def test_result_cache(tmp_path, main):
+
+    from cq_editor.result_cache import ResultCache, script_key
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    obj_tree = win.components["object_tree"]
+    log = win.components["log"]
+
+    # the key depends on the content of local imports
+    script = tmp_path.joinpath("main.py")
+    modify_file(code_import_module_makebox, script)
+    modify_file(code_module_makebox, tmp_path.joinpath("module_makebox.py"))
+
+    key = script_key(code_import_module_makebox, script)
+    assert key == script_key(code_import_module_makebox, script)
+
+    modify_file(code_module_makebox + "\n", tmp_path.joinpath("module_makebox.py"))
+    assert key != script_key(code_import_module_makebox, script)
+
+    # cached results are shown without running the script in-process
+    debugger._result_cache = ResultCache(tmp_path.joinpath("cache"))
+    debugger.preferences["Result cache"] = True
+
+    editor.set_text(code_reconcile)
+    debugger._actions["Run"][0].triggered.emit()
+    assert len(debugger._result_cache._entries()) == 1
+
+    entry = debugger._result_cache._entries()[0][0]
+    assert entry.name in debugger._result_cache
+    mtime = entry.joinpath("index.pickle").stat().st_mtime_ns
+
+    with qtbot.waitSignal(debugger.sigRendered):
+        debugger._actions["Run"][0].triggered.emit()
+
+    assert "Showing cached results" in log.toPlainText()
+    assert "revalidating" not in log.toPlainText()
+    assert obj_tree.CQ.childCount() == 2
+
+    # and revalidated with a background backend, without rewriting the entry
+    debugger.preferences["Execution backend"] = "Background thread"
+
+    with qtbot.waitSignals([debugger.sigRendered, debugger.sigRendered], timeout=30000):
+        debugger._actions["Run"][0].triggered.emit()
+
+    qtbot.waitUntil(lambda: not debugger.is_running(), timeout=30000)
+    assert "revalidating" in log.toPlainText()
+    assert obj_tree.CQ.childCount() == 2
+    assert entry.joinpath("index.pickle").stat().st_mtime_ns == mtime
+
+    debugger.preferences["Execution backend"] = "In-process"
+
+    debugger.purge_result_cache()
+    assert debugger._result_cache.size() == 0
+
+    debugger.preferences["Result cache"] = False
+
+
+code_memo = """import cadquery as cq
+
+@cache
+def tooth(h):
+    log("building tooth")
+    return cq.Workplane().box(1, 1, h)
+
+with cache("plate", 2) as c:
+    if not c.hit:
+        log("building plate")
+        c.value = cq.Workplane().box(2, 2, 0.1)
+
+result = tooth(2).union(c.value)
+"""
+
+
+def test_script_cache(main):
+
+    from cq_editor.execution import MEMO
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    log = win.components["log"]
+
+    debugger.clear_script_cache()
+
+    editor.set_text(code_memo)
+    debugger._actions["Run"][0].triggered.emit()
+
+    qtbot.wait(100)
+    assert log.toPlainText().count("building") == 2
+    assert len(MEMO) == 2
+
+    # the functions are redefined, but their code did not change
+    debugger._actions["Run"][0].triggered.emit()
+
+    qtbot.wait(100)
+    assert log.toPlainText().count("building") == 2
+
+    # different arguments miss
+    editor.set_text(code_memo.replace("tooth(2)", "tooth(3)"))
+    debugger._actions["Run"][0].triggered.emit()
+
+    qtbot.wait(100)
+    assert log.toPlainText().count("building") == 3
+
+    debugger.preferences["Script cache size (MB)"] = 0
+    assert len(MEMO) == 0
+    debugger.preferences["Script cache size (MB)"] = 512
+
+
+def test_background_thread(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    object_tree = win.components["object_tree"]
+    traceback_view = win.components["traceback_viewer"]
+    log = win.components["log"]
+
+    debugger.preferences["Execution backend"] = "Background thread"
+
+    # results are marshalled back to the GUI thread
+    object_tree.removeObjects()
+    editor.set_text(code_multi)
+    debugger._actions["Run"][0].triggered.emit()
+
+    qtbot.waitUntil(lambda: object_tree.CQ.childCount() == 2, timeout=30000)
+    assert not debugger.is_running()
+
+    editor.set_text(code_err2)
+    debugger._actions["Run"][0].triggered.emit()
+    qtbot.waitUntil(lambda: not debugger.is_running(), timeout=30000)
+    assert "NameError" in traceback_view.current_exception.text()
+
+    # runaway scripts are interrupted with an asynchronous exception
+    editor.set_text(code_infinite_loop)
+    debugger._actions["Run"][0].triggered.emit()
+    qtbot.wait(500)
+    assert debugger.is_running()
+
+    thread = debugger._thread_run.thread
+    debugger._actions["Run"][-1].triggered.emit()
+
+    assert not debugger.is_running()
+    qtbot.waitUntil(lambda: not thread.is_alive(), timeout=5000)
+    assert "Render cancelled" in log.toPlainText()
+
+    # a superseding render only starts once the previous thread is gone
+    editor.set_text(code_infinite_loop)
+    debugger._actions["Run"][0].triggered.emit()
+    qtbot.wait(500)
+
+    thread = debugger._thread_run.thread
+
+    object_tree.removeObjects()
+    editor.set_text(code_multi)
+    debugger._actions["Run"][0].triggered.emit()
+
+    assert debugger.is_running()
+    qtbot.waitUntil(lambda: object_tree.CQ.childCount() == 2, timeout=30000)
+    assert not thread.is_alive()
+    assert debugger._thread_run is None or debugger._thread_run.thread is not thread
+
+    debugger.preferences["Execution backend"] = "In-process"
+
+
+def test_autoreload_coalesce(editor):
+
+    qtbot, editor = editor
+
+    TIMEOUT = 500
+
+    editor.autoreload(True)
+
+    modify_file(code, "test_coalesce.py")
+    editor.load_from_file("test_coalesce.py")
+
+    # rewriting identical contents is not a change
+    with pytest.raises(pytestqt.exceptions.TimeoutError):
+        with qtbot.waitSignal(editor.triggerRerender, timeout=TIMEOUT):
+            modify_file(code, "test_coalesce.py")
+
+    # a burst of writes results in a single render
+    renders = []
+    editor.triggerRerender.connect(renders.append)
+
+    with qtbot.waitSignal(editor.triggerRerender, timeout=TIMEOUT):
+        modify_file(code_bigger_object, "test_coalesce.py")
+        modify_file(code, "test_coalesce.py")
+        modify_file(code_bigger_object, "test_coalesce.py")
+
+    qtbot.wait(TIMEOUT)
+    assert len(renders) == 1
+
+    # a change during a render cancels it
+    with qtbot.waitSignal(editor.sigCancelRender, timeout=TIMEOUT):
+        modify_file(code, "test_coalesce.py")
+
+    # the delay follows the duration of the last render, within bounds
+    scheduler = editor._autoreload
+    scheduler.last_duration = 1.0
+    assert scheduler.interval() == 250
+    scheduler.last_duration = 100.0
+    assert scheduler.interval() == editor.preferences["Autoreload: maximum delay"]
+    scheduler.last_duration = 0.0
+    assert scheduler.interval() == editor.preferences["Autoreload delay"]
+
+
+def test_import_graph(tmp_path, editor):
+
+    from cq_editor.import_graph import ImportGraph
+
+    qtbot, editor = editor
+
+    pkg = tmp_path.joinpath("pkg")
+    pkg.mkdir()
+    pkg.joinpath("__init__.py").touch()
+    pkg.joinpath("a.py").write_text("from . import b\nimport os\n")
+    pkg.joinpath("b.py").write_text("x = 1\n")
+
+    # a data folder is not mistaken for the data module
+    tmp_path.joinpath("data").mkdir()
+
+    script = tmp_path.joinpath("main.py")
+    script.write_text("import pkg.a\nimport c\nimport data\n")
+
+    graph = ImportGraph()
+    assert graph.update(script) == set()
+    assert graph.errors() == {}
+    assert graph.files() == [
+        str(pkg.joinpath(name)) for name in ("__init__.py", "a.py", "b.py")
+    ]
+    assert graph.module_name(str(pkg.joinpath("b.py"))) == "pkg.b"
+
+    # only modified files are reported
+    pkg.joinpath("b.py").write_text("x = 22\n")
+    assert graph.update(script) == {str(pkg.joinpath("b.py"))}
+    assert graph.update(script) == set()
+
+    # a change invalidates the modules importing it
+    assert graph.dependents([str(pkg.joinpath("b.py"))]) == {
+        str(pkg.joinpath("b.py")),
+        str(pkg.joinpath("a.py")),
+        str(script),
+    }
+
+    # missing modules are picked up once created
+    tmp_path.joinpath("c.py").touch()
+    graph.update(script)
+    assert str(tmp_path.joinpath("c.py")) in graph.files()
+
+    # the editor watches the directories of the imported modules
+    editor.autoreload(True)
+    editor.preferences["Autoreload: watch imported modules"] = True
+    editor.load_from_file(str(script))
+
+    assert str(pkg) in editor._autoreload._watcher.directories()
+    assert str(pkg.joinpath("b.py")) in editor._autoreload.files()
+
+    editor.preferences["Autoreload: watch imported modules"] = False
+
+
+def test_selective_module_reload(tmp_path, monkeypatch):
+
+    from cq_editor.execution import ModuleReloader
+
+    project = tmp_path.joinpath("project")
+    site = tmp_path.joinpath("site")
+    project.mkdir()
+    site.mkdir()
+
+    project.joinpath("local_mod.py").write_text("X = 1\n")
+    site.joinpath("resident_mod.py").write_text("Y = 1\n")
+
+    monkeypatch.syspath_prepend(str(project))
+    monkeypatch.syspath_prepend(str(site))
+
+    reloader = ModuleReloader()
+
+    for _ in range(2):
+        with reloader.manage(str(project)):
+            import local_mod, resident_mod
+
+        # local modules are unloaded, the others stay resident
+        assert "local_mod" not in sys.modules
+        assert "resident_mod" in sys.modules
+
+    assert reloader.last_reloaded == ["local_mod"]
+
+    # modules of a project root are reloaded as well
+    reloader.clear()
+    reloader.configure([str(site)])
+    with reloader.manage(str(project)):
+        import resident_mod
+    assert "resident_mod" not in sys.modules
+
+    # resident modules are reloaded once their source changes
+    reloader.configure()
+    with reloader.manage(str(project)):
+        import resident_mod
+
+    site.joinpath("resident_mod.py").write_text("Y = 22\n")
+    with reloader.manage(str(project)):
+        import resident_mod
+    assert resident_mod.Y == 22
+    assert "resident_mod" in reloader.last_reloaded
+
+    # local modules tracked by the import graph of the script stay loaded
+    # until they or the modules they import change
+    project.joinpath("base_mod.py").write_text("X = 1\n")
+    project.joinpath("mid_mod.py").write_text("from base_mod import X\nY = X + 1\n")
+    project.joinpath("other_mod.py").write_text("Z = 1\n")
+    script = project.joinpath("main.py")
+    script.write_text("import mid_mod, other_mod\n")
+
+    for _ in range(2):
+        with reloader.manage(str(project), str(script)):
+            import mid_mod, other_mod
+    assert reloader.last_reloaded == []
+
+    project.joinpath("base_mod.py").write_text("X = 10\n")
+    with reloader.manage(str(project), str(script)):
+        import mid_mod, other_mod
+    assert reloader.last_reloaded == ["base_mod", "mid_mod"]
+    assert mid_mod.Y == 11
+
+    # e.g. by the editor, when the content changed but the stat did not
+    reloader.invalidate([str(project.joinpath("other_mod.py"))])
+    with reloader.manage(str(project), str(script)):
+        import mid_mod, other_mod
+    assert reloader.last_reloaded == ["other_mod"]
+
+    reloader.clear()
+    assert "resident_mod" not in sys.modules
+    assert "mid_mod" not in sys.modules
+
+
+def test_reload_cq(tmp_path, monkeypatch):
+
+    from cq_editor.cq_utils import CQReloader
+
+    pkg = tmp_path.joinpath("cq_plugin")
+    pkg.mkdir()
+    pkg.joinpath("__init__.py").write_text("from .b import Y\n")
+    pkg.joinpath("a.py").write_text("X = 1\n")
+    pkg.joinpath("b.py").write_text("from .a import X\nY = X + 1\n")
+    pkg.joinpath("c.py").write_text("Z = 1\n")
+
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    import cq_plugin, cq_plugin.c
+
+    reloader = CQReloader(["cq_plugin"])
+
+    # nothing changed
+    assert reloader.reload() == []
+
+    # the changed module is reloaded with its dependents, dependencies first
+    pkg.joinpath("a.py").write_text("X = 10\n")
+    assert reloader.reload() == ["cq_plugin.a", "cq_plugin.b", "cq_plugin"]
+    assert cq_plugin.Y == 11
+
+    assert reloader.reload() == []
+
+    for name in ("cq_plugin", "cq_plugin.a", "cq_plugin.b", "cq_plugin.c"):
+        sys.modules.pop(name)
+
+
+def test_lazy_component(main):
+
+    from cq_editor.mixins import LazyComponent
+    from cq_editor.profiling import StartupProfile
+
+    qtbot, win = main
+
+    built = []
+
+    class Component(object):
+
+        name = "Lazy"
+        preferences = None
+
+        def __init__(self):
+            self.vars = {}
+            built.append(self)
+
+        def push_vars(self, d):
+            self.vars.update(d)
+
+    lazy = LazyComponent("lazy", Component, Component)
+    assert lazy.name == "Lazy"
+
+    # calls are deferred and merged until the component is built
+    push = lazy.slot("push_vars", merge=lambda old, new: ({**old[0], **new[0]},))
+    push({"a": 1})
+    push({"b": 2})
+    assert not built
+
+    # attribute access builds it
+    assert lazy.vars == {"a": 1, "b": 2}
+    assert len(built) == 1
+
+    push({"c": 3})
+    assert lazy.vars["c"] == 3
+
+    # the console preferences are available before it is built
+    from cq_editor.widgets.console_preferences import ConsolePreferences
+
+    lazy = LazyComponent("console", Component, ConsolePreferences)
+    assert lazy.name == "Console"
+    assert "Out-of-process kernel" in lazy.preferences.names
+    assert not lazy.built()
+
+    # lazily built components are fully functional
+    console = win.components["console"]
+    console.push_vars({"a": 1})
+    assert console.preferences is ConsolePreferences.preferences
+    console.start_kernel()
+    assert console.kernel_manager.kernel.shell.user_ns["a"] == 1
+
+    # startup report
+    profile = StartupProfile()
+    profile.track_imports()
+    with profile.stage("component"):
+        import cq_editor.batch
+    profile.finish()
+
+    report = profile.report()
+    assert "component" in report
+    assert report.startswith("Startup:")
+
+
+def test_lazy_kernel(main):
+
+    qtbot, win = main
+
+    console = win.components["console"]
+    console.shutdown_kernel()
+
+    # variables are queued until the kernel starts
+    a = []
+    console.push_vars({"a": a})
+    assert not console.kernel_started()
+
+    # the first command starts the kernel
+    console.execute_command("a.append(1)")
+    assert console.kernel_started()
+    assert a == [1]
+    assert "a" not in console._namespace
+
+    # switching the kind of kernel shuts the current one down
+    console.preferences["Out-of-process kernel"] = True
+    assert not console.kernel_started()
+    assert console._namespace["a"] is a
+    console.preferences["Out-of-process kernel"] = False
+
+    # focusing the console starts the kernel
+    from PySide6.QtCore import QEvent
+    from PySide6.QtGui import QFocusEvent
+    from PySide6.QtWidgets import QApplication
+
+    QApplication.sendEvent(console._control, QFocusEvent(QEvent.FocusIn))
+    assert console.kernel_started()
+    assert console.kernel_manager.kernel.shell.user_ns["a"] is a
+
+
+def test_locals_model(main):
+
+    from cq_editor.execution import preview
+
+    qtbot, win = main
+
+    debugger = win.components["debugger"]
+    variables = win.components["variables_viewer"]
+    model = variables.model()
+
+    big = list(range(100000))
+    a = object()
+
+    variables.update_frame({"a": a, "big": big, "_hidden": 1})
+    assert model.rowCount() == 2
+
+    # values are formatted on demand and previews are truncated
+    assert not model._text
+    assert model.data(model.index(1, 1), Qt.DisplayRole) == "list"
+    assert len(model.data(model.index(1, 2), Qt.DisplayRole)) < 100
+    assert len(preview("x" * 1000)) == 200
+
+    # updated in place, only the modified rows are formatted again
+    variables.update_frame({"a": a, "big": [1]})
+    assert variables.model() is model
+    assert 1 not in model._text
+    assert model.data(model.index(1, 2), Qt.DisplayRole) == "[1]"
+
+    # only modified names are pushed to the console
+    pushed = []
+    debugger.sigLocalsModified.connect(pushed.append)
+
+    debugger._emit_locals({"a": a, "b": 1})
+    debugger._emit_locals({"a": a, "b": 2})
+    assert pushed[-1] == {"b": 2}
+
+
+def test_preview_slow_types(monkeypatch):
+
+    from cq_editor import execution
+
+    class Slow(object):
+        pass
+
+    monkeypatch.setattr(execution, "SLOW_PREVIEW", -1)
+    monkeypatch.setattr(execution, "_slow_types", set())
+
+    # slow user types are not formatted again, builtin containers always are
+    assert execution.preview([1, 2]) == "[1, 2]"
+    assert execution.preview([3]) == "[3]"
+
+    execution.preview(Slow())
+    assert execution.preview(Slow()) == "<Slow object>"
+
+    # until the next run
+    execution.compile_script("")
+    assert execution.preview(Slow()) != "<Slow object>"
+
+    # CQ objects are summarized without calling repr
+    box = cq.Workplane().box(1, 1, 1)
+    assert execution.preview(box) == "<Workplane: 1 objects>"
+    assert execution.preview([box.val()]) == "[<Solid>]"
+
+
+def test_print_throttle(main):
+
+    from cq_editor.main_window import PRINT_REDIRECTOR
+
+    qtbot, win = main
+
+    log = win.components["log"]
+    log.clear_log()
+
+    # a flood of prints is shown as a single block
+    blocks = []
+    PRINT_REDIRECTOR.sigStdoutWrite.connect(blocks.append)
+
+    for i in range(5000):
+        PRINT_REDIRECTOR.write(f"line {i}\n")
+
+    qtbot.wait(100)
+    PRINT_REDIRECTOR.sigStdoutWrite.disconnect(blocks.append)
+
+    assert len(blocks) == 1
+    assert blocks[0].startswith("[4000 lines dropped]\n")
+    assert "line 4999\n" in log.toPlainText()
+    assert "line 3999\n" not in log.toPlainText()
+
+    # nothing is dropped below the limits
+    PRINT_REDIRECTOR.write("foo\n")
+    PRINT_REDIRECTOR.flush()
+    assert log.toPlainText().endswith("foo\n")
+
+
+def test_log_viewer(main, tmp_path):
+
+    from logbook import INFO, WARNING
+
+    qtbot, win = main
+
+    log = win.components["log"]
+    model = log.model
+    log.clear_log()
+
+    log.preferences["Log file"] = str(tmp_path / "cq-editor.log")
+    log.preferences["Log file size [MB]"] = 1
+    log.preferences["Log to file"] = True
+
+    for i in range(100000):
+        log.append_log(f"line {i}\n", WARNING if i % 1000 == 0 else INFO)
+    log.append_log("foo")
+    log.append_log("bar\n")
+
+    # the view is updated in batches
+    assert model.rowCount() == 0
+    qtbot.wait(100)
+    assert model.rowCount() == 100001
+    assert model.data(model.index(100000)) == "foobar"
+    assert log.toPlainText().endswith("line 99999\nfoobar\n")
+
+    # filters
+    log.level.setCurrentText("Warning")
+    assert model.rowCount() == 100
+    assert model.data(model.index(1)) == "line 1000"
+
+    log.append_log("line x\n", WARNING)
+    qtbot.wait(100)
+    assert model.rowCount() == 101
+
+    log.filter.setText("line 99")
+    qtbot.wait(300)
+    assert model.rowCount() == 1
+
+    log.level.setCurrentText("All")
+    log.filter.clear()
+    qtbot.wait(300)
+    assert model.rowCount() == 100002
+
+    # rotation of the log file
+    assert (tmp_path / "cq-editor.log.1").exists()
+    assert (tmp_path / "cq-editor.log").read_text().endswith("line x\n")
+
+    log.preferences["Log to file"] = False
+
+    # no line is lost while another thread appends during a sync
+    import threading
+
+    log.clear_log()
+    log.filter.setText("threaded")
+    qtbot.wait(300)
+
+    def append_lines():
+        for i in range(20000):
+            log.append_log(f"threaded {i}\n")
+
+    thread = threading.Thread(target=append_lines)
+    thread.start()
+    while thread.is_alive():
+        log.flush()
+    thread.join()
+
+    log.flush()
+    assert model.rowCount() == 20000
+    assert model.data(model.index(19999)) == "threaded 19999"
+
+    log.filter.clear()
+    qtbot.wait(300)
+
+    # oldest lines are dropped
+    log.preferences["Maximum lines"] = 1000
+    log.append_log("last\n")
+    qtbot.wait(100)
+    assert model.rowCount() < 1000
+    assert model.data(model.index(model.rowCount() - 1)) == "last"
+
+    log.preferences["Maximum lines"] = 1_000_000
+
+
+def test_highlighter(main):
+
+    from PySide6.QtGui import QTextCursor
+    from cq_editor.widgets.highlighter import NORMAL, IN_DOUBLE_TRIPLE
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    doc = editor.document()
+
+    editor.set_text('import cadquery as cq\n"""doc\nif\n"""\nif True: pass  # done\n')
+
+    def states():
+        return [doc.findBlockByNumber(i).userState() for i in range(5)]
+
+    def formats(i):
+        return [
+            (r.start, r.length, r.format.foreground().color().name())
+            for r in doc.findBlockByNumber(i).layout().formats()
+        ]
+
+    assert states() == [NORMAL, IN_DOUBLE_TRIPLE, IN_DOUBLE_TRIPLE, NORMAL, NORMAL]
+
+    # keywords, also those that used to be missed, strings and comments
+    assert formats(0) == [(0, 6, "#0077aa"), (16, 2, "#0077aa")]
+    assert formats(2) == [(0, 2, "#bb6600")]
+    assert formats(4) == [
+        (0, 2, "#0077aa"),
+        (3, 4, "#0077aa"),
+        (9, 4, "#0077aa"),
+        (15, 6, "#888888"),
+    ]
+
+    # closing the string updates the state of the following lines
+    cursor = QTextCursor(doc.findBlockByNumber(1))
+    cursor.movePosition(QTextCursor.EndOfBlock)
+    cursor.insertText('"""')
+
+    assert states()[:3] == [NORMAL, NORMAL, NORMAL]
+    assert formats(2) == [(0, 2, "#0077aa")]
+
+
+def test_highlighter_long_file(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    doc = editor.document()
+    n = 5000
+
+    editor.set_text(
+        "\n".join(
+            f"p_{i} = cq.Workplane('XY').box({i}, 2, 3)  # part {i}" for i in range(n)
+        )
+    )
+    editor.highlighter.rehighlight()
+
+    # below the large file threshold every line is highlighted
+    assert not editor.large_file
+    assert doc.blockCount() == n
+    last = doc.lastBlock()
+    assert [f.start for f in last.layout().formats()] == [
+        last.text().index("'XY'"),
+        last.text().index("#"),
+    ]
+
+
+@pytest.mark.benchmark
+@pytest.mark.skipif(
+    not os.environ.get("CQ_EDITOR_BENCHMARKS"),
+    reason="Benchmarks run with CQ_EDITOR_BENCHMARKS=1",
+)
+def test_highlighter_throughput(main, record_property, capsys):
+
+    from time import perf_counter
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    n = 5000
+
+    editor.set_text(
+        "\n".join(
+            f"p_{i} = cq.Workplane('XY').box({i}, 2, 3)  # part {i}" for i in range(n)
+        )
+    )
+
+    t0 = perf_counter()
+    editor.highlighter.rehighlight()
+    rate = n / (perf_counter() - t0)
+
+    # reported only, the rate depends on the machine
+    record_property("highlighting_lines_per_s", round(rate))
+    with capsys.disabled():
+        print(f"\nHighlighting: {rate:.0f} lines/s")
+
+
+def test_large_file_mode(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    doc = editor.document()
+    scrollbar = editor.verticalScrollBar()
+
+    editor.preferences["Large file mode: lines"] = 1000
+    editor.set_text("\n".join(f"x_{i} = {i}  # point" for i in range(5000)))
+
+    assert editor.large_file
+
+    # only the visible lines are highlighted
+    assert doc.firstBlock().layout().formats()
+    assert not doc.lastBlock().layout().formats()
+
+    scrollbar.setValue(scrollbar.maximum())
+    assert doc.lastBlock().layout().formats()
+
+    # the text is copied once per modification
+    text = editor.get_text_with_eol()
+    assert editor.get_text_with_eol() is text
+
+    editor.insertPlainText("y = 1\n")
+    assert editor.get_text_with_eol() is not text
+    assert "y = 1\n" in editor.get_text_with_eol()
+
+    editor.set_text("a = 1")
+    assert not editor.large_file
+    assert doc.firstBlock().userState() == 0
+
+    editor.preferences["Large file mode: lines"] = 20000
+
+
+code_stream = """import time
+import cadquery as cq
+
+show_object(cq.Workplane().box(1, 1, 1), name="a")
+show_object(cq.Workplane().box(2, 2, 2), name="b")
+time.sleep(1)
+show_object(cq.Workplane().sphere(1), name="b")
+show_object(cq.Workplane().sphere(2), name="c")
+"""
+
+
+def test_stream_objects(main):
+
+    qtbot, win = main
+
+    editor = win.components["editor"]
+    debugger = win.components["debugger"]
+    object_tree = win.components["object_tree"]
+    viewer = win.components["viewer"]
+
+    debugger.preferences["Execution backend"] = "Background thread"
+    debugger.preferences["Stream shown objects"] = True
+
+    fits = []
+    viewer.fit = lambda: fits.append(True)
+
+    object_tree.removeObjects()
+    editor.set_text(code_stream)
+    debugger._actions["Run"][0].triggered.emit()
+
+    # displayed while the script is running, without fitting the view
+    qtbot.waitUntil(lambda: object_tree.CQ.childCount() == 2, timeout=5000)
+    assert debugger.is_running()
+    assert not fits
+
+    first = object_tree.CQ.child(0)
+
+    qtbot.waitUntil(lambda: not debugger.is_running(), timeout=30000)
+
+    # objects shown again replace the previous ones, the view is fitted once
+    names = [
+        object_tree.CQ.child(i).properties["Name"]
+        for i in range(object_tree.CQ.childCount())
+    ]
+    assert names == ["a", "b", "c"]
+    assert object_tree.CQ.child(0) is first
+    assert fits == [True]
+
+    # objects shown right before an error are displayed as well
+    object_tree.removeObjects()
+    editor.set_text(code_stream.replace("time.sleep(1)", "1 / 0"))
+    debugger._actions["Run"][0].triggered.emit()
+
+    qtbot.waitUntil(lambda: not debugger.is_running(), timeout=30000)
+    assert object_tree.CQ.childCount() == 2
+
+    del viewer.fit
+    debugger.preferences["Stream shown objects"] = False
+    debugger.preferences["Execution backend"] = "In-process"